@@ -10,19 +10,10 @@ Modified By:
 Copyright (c) 2019 Stanford Intelligent Systems Lab - Stanford University
 License: MIT License
 '''
-import util.actor
-import util.client
-import util.world
 import ast_test as ast
-
-import carla
-import numpy as np
-import pandas
-from scipy import interpolate
+import run_scenarios
 
 import argparse
-import os
-import time
 
 
 def parse_arguments():
@@ -55,6 +46,12 @@ def parse_arguments():
         type=float,
         help='Timeout, in seconds, of the Carla client when contacting server'
     )
+    argparser.add_argument(
+        '--mode',
+        default='unpaced',
+        choices=ast.REPLAY_MODES,
+        help='How the replay is paced, see ast_test.REPLAY_MODES'
+    )
     argparser.add_argument(
         '-v',
         '--verbose',
@@ -73,87 +70,21 @@ def parse_arguments():
 def main():
     args = parse_arguments()
 
-    carla_client = util.client.create(
-        args.host,
-        args.port,
-        args.timeout,
-        'Town02'
-    )
-    carla_world = carla_client.get_world()
-
-    weather = carla.WeatherParameters(
-            cloudyness=0.0,
-            precipitation=0.0,
-            precipitation_deposits=0.0,
-            wind_intensity=0.0,
-            sun_azimuth_angle=130.0,
-            sun_altitude_angle=68.0)
-    carla_world.set_weather(weather)
-
-    orig_dt = 0.1
-    new_dt = 1.0/20.0
-
-    data_directory = '/home/akoufos/Development/SISL/LincolnLabExample1'
-
-    # AST 1
-    data = ast.parse_csv(
-        os.path.join(data_directory, 'sample_trajectory.csv'),
-        'step',
-        args.verbose
-    )
-    data = ast.interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-    ast.visualize_vehicle_and_walker(
-        carla_world,
-        data,
-        new_dt,
-        True,
-        args.verbose
+    manifest = run_scenarios.create_manifest(
+        map='Town02',
+        orig_dt=0.1,
+        new_dt=1.0/20.0,
+        with_noise=True,
+        directory='/home/akoufos/Development/SISL/LincolnLabExample1',
+        files=[
+            'sample_trajectory.csv',    # AST 1
+            'new_Traj.csv',             # AST 2
+            'no_crash_traj.csv',        # AST 3
+            'ped_fault_traj.csv'        # AST 4
+        ]
     )
 
-    # AST 2
-    data = ast.parse_csv(
-        os.path.join(data_directory, 'new_Traj.csv'),
-        'step',
-        args.verbose
-    )
-    data = ast.interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-    ast.visualize_vehicle_and_walker(
-        carla_world,
-        data,
-        new_dt,
-        True,
-        args.verbose
-    )
-
-    # AST 3
-    data = ast.parse_csv(
-        os.path.join(data_directory, 'no_crash_traj.csv'),
-        'step',
-        args.verbose
-    )
-    data = ast.interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-    ast.visualize_vehicle_and_walker(
-        carla_world,
-        data,
-        new_dt,
-        True,
-        args.verbose
-    )
-
-    # AST 4
-    data = ast.parse_csv(
-        os.path.join(data_directory, 'ped_fault_traj.csv'),
-        'step',
-        args.verbose
-    )
-    data = ast.interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-    ast.visualize_vehicle_and_walker(
-        carla_world,
-        data,
-        new_dt,
-        True,
-        args.verbose
-    )
+    run_scenarios.run(args, [manifest])
 
 
 if __name__ == "__main__":
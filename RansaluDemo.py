@@ -10,19 +10,10 @@ Modified By:
 Copyright (c) 2019 Stanford Intelligent Systems Lab - Stanford University
 License: MIT License
 '''
-import util.actor
-import util.client
-import util.world
 import ast_test as ast
-
-import carla
-import numpy as np
-import pandas
-from scipy import interpolate
+import run_scenarios
 
 import argparse
-import os
-import time
 
 
 def parse_arguments():
@@ -55,6 +46,12 @@ def parse_arguments():
         type=float,
         help='Timeout, in seconds, of the Carla client when contacting server'
     )
+    argparser.add_argument(
+        '--mode',
+        default='realtime',
+        choices=ast.REPLAY_MODES,
+        help='How the replay is paced, see ast_test.REPLAY_MODES'
+    )
     argparser.add_argument(
         '-v',
         '--verbose',
@@ -70,127 +67,20 @@ def parse_arguments():
     return args
 
 
-def initialize_two_cars(world, data, origin, verbose=False):
-    # Initialize the actors (two independent cars)
-    pos_c = data['car'][0][0:2]
-    car1 = ast.initialize_vehicle(world, pos_c, origin, 0.0, 'toyota', verbose)
-
-    pos_p = data['ped'][0][0:2]
-    car2 = ast.initialize_vehicle(world, pos_p, origin, 0.0, 'toyota', verbose)
-
-    return (car1, car2)
-
-
-def visualize_vehicles(
-    world,
-    data,
-    timestep=0.1,
-    with_noise=True,
-    verbose=False
-):
-    '''
-    Loads in the dataframe containing the first example for AST.
-    '''
-    car1 = None
-    car2 = None
-
-    # Location of origin for this project
-    new_origin = np.array([156.0, 110.0, 0.0])
-    origin = carla.Vector3D(156.0, 110.0, 0.0)
-    camera_offset = carla.Location(0.0, -20.0, 10.0)
-
-    try:
-        util.world.move_spectator(
-            world,
-            origin + camera_offset,
-            carla.Rotation(-25.0, 115.0, 0.0)
-        )
-
-        car1, car2 = initialize_two_cars(world, data, new_origin, verbose)
-
-        # Set world to synchronous mode
-        ast.set_carla_sync_mode(world, timestep, verbose)
-        world.tick()
-
-        # Move the actors
-        for i in range(len(data['car'])):
-            world.tick()
-
-            # Direct manipulation
-            ast.move_actor(
-                car1,
-                data['car'][i][0:2],
-                new_origin + [0.0, 0.0, 0.5],
-                data['car'][i][2:4],
-                verbose
-            )
-            ast.move_actor(
-                car2,
-                data['ped'][i][0:2],
-                new_origin + [0.0, 0.0, 0.5],
-                data['ped'][i][2:4],
-                verbose
-            )
-
-            # Visualize the sensor noise
-            if with_noise:
-                ast.display_sensor_noise(car2, data['ped'][i][4:], timestep)
-
-            time.sleep(timestep)
-
-        world.tick()
-
-        # Set world to non-synchronous mode
-        ast.unset_carla_sync_mode(world, verbose)
-
-    finally:
-        # Wait for a bit before destroying the actors
-        time.sleep(5.0)
-
-        if car1:
-            car1.destroy()
-        if car2:
-            car2.destroy()
-
-
 def main():
     args = parse_arguments()
 
-    carla_client = util.client.create(
-        args.host,
-        args.port,
-        args.timeout,
-        'Town02'
+    manifest = run_scenarios.create_manifest(
+        map='Town02',
+        orig_dt=0.25,
+        new_dt=1.0/60.0,
+        replay='vehicles',
+        with_noise=False,
+        directory='/home/akoufos/Development/SISL/RansaluExample',
+        files=['rans_pomdp1-edit.csv']
     )
-    carla_world = carla_client.get_world()
-
-    weather = carla.WeatherParameters(
-            cloudyness=0.0,
-            precipitation=0.0,
-            precipitation_deposits=0.0,
-            wind_intensity=0.0,
-            sun_azimuth_angle=130.0,
-            sun_altitude_angle=68.0)
-    carla_world.set_weather(weather)
-
-    orig_dt = 0.25
-    new_dt = 1.0/60.0
 
-    data_directory = '/home/akoufos/Development/SISL/RansaluExample'
-
-    data = ast.parse_csv(
-        os.path.join(data_directory, 'rans_pomdp1-edit.csv'),
-        'step',
-        args.verbose
-    )
-    data = ast.interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-    visualize_vehicles(
-        carla_world,
-        data,
-        new_dt,
-        False,
-        args.verbose
-    )
+    run_scenarios.run(args, [manifest])
 
 
 if __name__ == "__main__":
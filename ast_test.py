@@ -11,18 +11,35 @@ Copyright (c) 2019 Stanford Intelligent Systems Lab - Stanford University
 License: MIT License
 '''
 import util.actor
+import util.blueprint
+import util.catalog
 import util.client
+import util.common
+import util.trajectory
 import util.world
 
 import carla
 import numpy as np
-import pandas
-from scipy import interpolate
 
 import argparse
+import cProfile
+import itertools
+import pstats
 import time
 
 
+# Location of origin for this project
+ORIGIN = [156.0, 110.0, 0.0]
+
+# Height of each kind of actor above the origin while replaying
+ACTOR_HEIGHTS = {'car': 0.25, 'ped': 1.3}
+
+# Replay modes: 'unpaced' ticks as fast as the server allows and keeps the
+# final scene for a few seconds, 'realtime' also paces the ticks to the wall
+# clock and 'fast' neither paces nor keeps the final scene
+REPLAY_MODES = ['unpaced', 'realtime', 'fast']
+
+
 def parse_arguments():
     '''
     The argument parser used for the ast script.
@@ -43,6 +60,47 @@ def parse_arguments():
         metavar='F',
         help='The filename containing the movement for the actors'
     )
+    argparser.add_argument(
+        '--chunk-size',
+        metavar='N',
+        default=0,
+        type=int,
+        help='Stream the csv file in chunks of N rows (0 loads it at once)'
+    )
+    argparser.add_argument(
+        '--time-column',
+        metavar='C',
+        help='The column holding the time, in seconds, of irregular steps '
+        '(ignored with --chunk-size)'
+    )
+    argparser.add_argument(
+        '--rate',
+        metavar='R',
+        default=1.0,
+        type=float,
+        help='The trajectory time replayed per simulated second, negative '
+        'to replay backwards (ignored with --chunk-size)'
+    )
+    argparser.add_argument(
+        '--mode',
+        default='unpaced',
+        choices=REPLAY_MODES,
+        help='How the replay is paced, see ast_test.REPLAY_MODES'
+    )
+    argparser.add_argument(
+        '--no-cache',
+        dest='cache',
+        default=True,
+        action='store_false',
+        help='Disable the binary cache written next to the csv files'
+    )
+    argparser.add_argument(
+        '--profile',
+        dest='profile',
+        default=False,
+        action='store_true',
+        help='Profile the replay and print the most expensive functions'
+    )
     argparser.add_argument(
         '--map',
         '-m',
@@ -77,84 +135,224 @@ def parse_arguments():
     args = argparser.parse_args()
     args.description = argparser.description
 
+    if args.rate == 0.0:
+        argparser.error('--rate must not be zero')
+
     return args
 
 
-def parse_csv(filename, index_column, verbose=False):
-    df = pandas.read_csv(filename, index_col=index_column)
+def parse_csv(
+    filename,
+    index_column,
+    verbose=False,
+    cache=True,
+    time_column=None
+):
+    '''
+    Parses an AST csv file into the car and pedestrian state arrays.
+
+    On the first read the parsed table is written to a binary sidecar next
+    to the csv file. Later reads memory-map the sidecar instead of parsing
+    the csv again, as long as the csv file has not changed.
 
-    df.columns = df.columns.str.strip().str.lower().str.replace(
-        ' ',
-        '_'
-    ).str.replace(
-        '(',
-        ''
-    ).str.replace(
-        ')',
-        ''
+    With a time column, holding the time of every row in seconds, the
+    steps may be irregular and the car and pedestrian may be logged at
+    different rates, leaving their missing samples empty. Both are then
+    aligned on a common clock, returned as 'time', see
+    util.trajectory.align_clocks.
+    '''
+    table, columns = util.trajectory.load_table(
+        filename,
+        index_column,
+        (util.trajectory.CAR_COLUMNS, util.trajectory.PED_COLUMNS),
+        cache,
+        verbose
     )
 
-    if verbose:
-        print('Parsed dataframe information:')
-        print('-----------------------------')
-        print('First 5 rows (head)\n', df.head())
-        print('Dataframe keys:\n', df.keys())
-
-    car = df[[
-        'x_car',
-        'y_car',
-        'v_x_car',
-        'v_y_car'
-    ]].to_numpy()
-    ped = df[[
-        'x_ped_0',
-        'y_ped_0',
-        'v_x_ped_0',
-        'v_y_ped_0',
-        'noise_x_0',
-        'noise_y_0'
-    ]].to_numpy()
+    if time_column is not None:
+        clock, states = align_actors(
+            table,
+            columns,
+            [util.trajectory.CAR_COLUMNS, util.trajectory.PED_COLUMNS],
+            time_column,
+            ['car', 'ped']
+        )
+
+        return {
+            'car': states[0, :, :len(util.trajectory.CAR_COLUMNS)],
+            'ped': states[1],
+            'time': clock
+        }
+
+    car = util.trajectory.select_columns(
+        table,
+        columns,
+        util.trajectory.CAR_COLUMNS
+    )
+    ped = util.trajectory.select_columns(
+        table,
+        columns,
+        util.trajectory.PED_COLUMNS
+    )
 
     parsed = {'car': car, 'ped': ped}
 
     return parsed
 
 
-def interpolate_data(data, orig_step=0.1, new_step=1.0/60.0, verbose=False):
-    stop = len(data)*orig_step
+def align_actors(table, columns, actor_columns, time_column, actors):
+    '''
+    Aligns the samples of several actors, each with the times of the rows
+    where its state is not missing, on a common clock.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The common clock and the (actors, len(clock), channels) states.
+    '''
+    clocks, arrays = zip(*[
+        util.trajectory.actor_samples(
+            table,
+            columns,
+            names,
+            time_column,
+            actor=actor
+        )
+        for names, actor in zip(actor_columns, actors)
+    ])
+
+    return util.trajectory.align_clocks(clocks, arrays)
 
-    if verbose:
-        print('Stop:', stop)
 
-    t = np.arange(0.0, stop, orig_step)
-    pos = data[:, 0:2].transpose()
-    vel = data[:, 2:4].transpose()
+def parse_csv_chunks(
+    filename,
+    index_column,
+    chunk_size=10000,
+    verbose=False,
+    cache=True
+):
+    '''
+    Streams an AST csv file as chunks of car and pedestrian state arrays.
+
+    Unlike parse_csv, the file is never loaded as a whole, so memory stays
+    bounded by chunk_size for arbitrarily long trajectories.
+    '''
+    return util.trajectory.iter_chunks(
+        filename,
+        index_column,
+        {
+            'car': util.trajectory.CAR_COLUMNS,
+            'ped': util.trajectory.PED_COLUMNS
+        },
+        chunk_size,
+        cache,
+        verbose
+    )
 
-    has_error = data.shape[1] == 6
 
-    if has_error:
-        err = data[:, 4:6].transpose()
+def parse_csv_actors(
+    filename,
+    index_column,
+    verbose=False,
+    cache=True,
+    time_column=None
+):
+    '''
+    Parses an AST csv file with any number of cars and pedestrians.
+
+    The actors are discovered from the column names (see
+    util.trajectory.discover_actors) and returned in a struct-of-arrays
+    layout: a dict with the 'kinds' ('car' or 'ped'), 'names' and 'noise'
+    (whether sensor noise columns exist) of each actor, and their 'states'
+    as a single (actors, steps, channels) array.
+
+    With a time column, the actors are aligned on a common clock, returned
+    as 'time', like in parse_csv.
+    '''
+    table, columns = util.trajectory.load_table(
+        filename,
+        index_column,
+        (),
+        cache,
+        verbose
+    )
+    actors = util.trajectory.discover_actors(columns)
+
+    if verbose:
+        print('Discovered actors:')
+        for kind, index, names in actors:
+            print('   {}_{}:'.format(kind, index), names)
+
+    if time_column is None:
+        states = util.trajectory.stack_states([
+            util.trajectory.select_columns(table, columns, names)
+            for kind, index, names in actors
+        ])
     else:
-        err = np.full(pos.shape, 0.0)
+        clock, states = align_actors(
+            table,
+            columns,
+            [names for kind, index, names in actors],
+            time_column,
+            ['{}_{}'.format(kind, index) for kind, index, names in actors]
+        )
+
+    parsed = {
+        'kinds': [kind for kind, index, names in actors],
+        'names': [
+            '{}_{}'.format(kind, index)
+            for kind, index, names in actors
+        ],
+        'noise': [
+            len(names) == util.trajectory.STATE_CHANNELS
+            for kind, index, names in actors
+        ],
+        'states': states
+    }
+
+    if time_column is not None:
+        parsed['time'] = clock
+
+    return parsed
+
+
+def actors_from_car_and_ped(data):
+    '''
+    Converts a dict of car and pedestrian state arrays, as returned by
+    parse_csv, to the struct-of-arrays layout of parse_csv_actors.
+    '''
+    return {
+        'kinds': ['car', 'ped'],
+        'names': ['car_0', 'ped_0'],
+        'noise': [False, True],
+        'states': util.trajectory.stack_states([data['car'], data['ped']])
+    }
+
+
+def interpolate_data(
+    data,
+    orig_step=0.1,
+    new_step=1.0/60.0,
+    verbose=False,
+    times=None
+):
+    t, new_t = util.trajectory.resample_times(
+        len(data),
+        orig_step,
+        new_step,
+        times
+    )
 
     if verbose:
+        print('Stop:', len(data)*orig_step)
         print('Input to interpolate')
         print('--------------------')
         print('Time:\n', len(t), t)
-        print('Position:\n', len(pos[0]), pos)
-        print('Velocity:\n', len(vel[0]), vel)
-        print('Sensor Noise:\n', len(err[0]), err)
-
-    f_pos = interpolate.interp1d(t, pos)
-    f_vel = interpolate.interp1d(t, vel)
-    f_err = interpolate.interp1d(t, err)
+        print('Data:\n', len(data), data)
 
-    new_t = np.arange(0.0, stop - orig_step, new_step)
-
-    new_pos = f_pos(new_t)
-    new_vel = f_vel(new_t)
-    new_err = f_err(new_t)
-    new_data = np.concatenate((new_pos, new_vel, new_err))
+    states = util.trajectory.stack_states([data])
+    index, weight = util.trajectory.resample_weights(t, new_t)
+    new_data = util.trajectory.resample(states, index, weight)[0]
 
     if verbose:
         print('Interpolated data')
@@ -162,7 +360,7 @@ def interpolate_data(data, orig_step=0.1, new_step=1.0/60.0, verbose=False):
         print('New Time:\n', len(new_t), new_t)
         print('New Data:\n', new_data)
 
-    return new_data.transpose()
+    return new_data
 
 
 def interpolate_car_and_ped(
@@ -171,20 +369,166 @@ def interpolate_car_and_ped(
     new_step=1.0/60.0,
     verbose=False
 ):
-    car = interpolate_data(data['car'], orig_step, new_step, verbose)
-    ped = interpolate_data(data['ped'], orig_step, new_step, verbose)
+    '''
+    Interpolates the car and pedestrian states to a new timestep.
 
-    output = {'car': car, 'ped': ped}
+    Both actors are stacked into a single (actors, steps, channels) array
+    and resampled in one pass, sharing the interpolation indices and
+    weights. With the 'time' of parse_csv, the samples are taken at those
+    times instead of every orig_step seconds.
+    '''
+    t, new_t = util.trajectory.resample_times(
+        len(data['car']),
+        orig_step,
+        new_step,
+        data.get('time')
+    )
+    states = util.trajectory.stack_states([data['car'], data['ped']])
+    index, weight = util.trajectory.resample_weights(t, new_t)
+    new_data = util.trajectory.resample(states, index, weight)
+
+    output = {'car': new_data[0], 'ped': new_data[1]}
 
     if verbose:
         print('Final data after interpolation')
         print('------------------------------')
-        print('Car:\n', data['car'])
-        print('Pedestrian:\n', data['ped'])
+        print('Car:\n', output['car'])
+        print('Pedestrian:\n', output['ped'])
 
     return output
 
 
+def interpolate_actors(
+    data,
+    orig_step=0.1,
+    new_step=1.0/60.0,
+    verbose=False
+):
+    '''
+    Interpolates the states of all actors, as returned by
+    parse_csv_actors, to a new timestep in a single pass.
+    '''
+    t, new_t = util.trajectory.resample_times(
+        data['states'].shape[1],
+        orig_step,
+        new_step,
+        data.get('time')
+    )
+    index, weight = util.trajectory.resample_weights(t, new_t)
+
+    output = dict(data)
+    output['states'] = util.trajectory.resample(data['states'], index, weight)
+
+    if 'time' in data:
+        output['time'] = new_t
+
+    if verbose:
+        print('Final data after interpolation')
+        print('------------------------------')
+        for name, states in zip(output['names'], output['states']):
+            print(name + ':\n', states)
+
+    return output
+
+
+def interpolate_car_and_ped_chunks(
+    chunks,
+    orig_step=0.1,
+    new_step=1.0/60.0,
+    verbose=False
+):
+    '''
+    Lazily interpolates a stream of car and pedestrian chunks, as returned
+    by parse_csv_chunks, to a new timestep.
+    '''
+    for chunk in util.trajectory.resample_chunks(chunks, orig_step, new_step):
+        if verbose:
+            print('Interpolated chunk of', len(chunk['car']), 'steps')
+
+        yield chunk
+
+
+def lazy_car_and_ped(
+    data,
+    orig_step=0.1,
+    new_step=1.0/60.0,
+    rate=1.0,
+    chunk_steps=1000,
+    verbose=False
+):
+    '''
+    Lazily interpolates the car and pedestrian states to a new timestep.
+
+    Unlike interpolate_car_and_ped, the resampled states are never held as
+    a whole: they are evaluated from the original samples, see
+    util.trajectory.Trajectory, one chunk of chunk_steps steps at a time
+    while replaying. The rate is the trajectory time replayed per second
+    of simulation, negative to replay backwards.
+
+    The trajectory is built, and its samples, timestep and rate checked,
+    when called; only the chunks are evaluated lazily.
+    '''
+    trajectory = util.trajectory.Trajectory(
+        util.trajectory.stack_states([data['car'], data['ped']]),
+        orig_step,
+        data.get('time')
+    )
+    chunks = trajectory.chunks(new_step, rate=rate, chunk_steps=chunk_steps)
+
+    return (
+        {'car': states[0], 'ped': states[1]}
+        for states in log_chunks(chunks, verbose)
+    )
+
+
+def lazy_actors(
+    data,
+    orig_step=0.1,
+    new_step=1.0/60.0,
+    rate=1.0,
+    chunk_steps=1000,
+    verbose=False
+):
+    '''
+    Lazily interpolates the states of all actors, as returned by
+    parse_csv_actors, to a new timestep. See lazy_car_and_ped.
+    '''
+    trajectory = util.trajectory.Trajectory(
+        data['states'],
+        orig_step,
+        data.get('time')
+    )
+    chunks = trajectory.chunks(new_step, rate=rate, chunk_steps=chunk_steps)
+    names = {key: value for key, value in data.items() if key != 'time'}
+
+    return (
+        dict(names, states=states) for states in log_chunks(chunks, verbose)
+    )
+
+
+def log_chunks(chunks, verbose=False):
+    '''
+    Yields the interpolated state chunks of a Trajectory, printing their
+    number of steps if verbose.
+    '''
+    for states in chunks:
+        if verbose:
+            print('Interpolated chunk of', states.shape[1], 'steps')
+
+        yield states
+
+
+def iter_data_chunks(data):
+    '''
+    Returns an iterator of chunks over data that is either a single dict of
+    state arrays or already an iterable of such chunks.
+    '''
+    if isinstance(data, dict):
+        return iter([data])
+
+    return iter(data)
+
+
 def initialize_vehicle_and_walker(world, data, origin, verbose=False):
     # Initialize the actors (car and pedestrian)
     pos_c = data['car'][0][0:2]
@@ -202,6 +546,57 @@ def initialize_vehicle_and_walker(world, data, origin, verbose=False):
     return (car, ped, ped_control)
 
 
+def initialize_actors(
+    world,
+    data,
+    origin,
+    model='lincoln',
+    verbose=False,
+    size=None
+):
+    '''
+    Initializes one Carla actor per actor of the data, as returned by
+    parse_csv_actors, at its first state. Cars are spawned as vehicles of
+    the given model and size (see initialize_vehicle) and pedestrians as
+    walkers, which also get a walker control matching their first velocity.
+
+    Returns
+    -------
+    list of carla.Actor
+        The spawned actors, with None for the actors that failed to spawn.
+    '''
+    actors = []
+    first = data['states'][:, 0]
+    headings = np.arctan2(-first[:, 3], first[:, 2])*180.0/np.pi
+
+    for kind, state, heading in zip(data['kinds'], first, headings):
+        if kind == 'ped':
+            actor = initialize_walker(
+                world,
+                state[0:2],
+                origin,
+                heading,
+                verbose=verbose
+            )
+
+            if actor:
+                actor.apply_control(create_ped_control(state[2:4]))
+        else:
+            actor = initialize_vehicle(
+                world,
+                state[0:2],
+                origin,
+                heading,
+                model,
+                verbose=verbose,
+                size=size
+            )
+
+        actors.append(actor)
+
+    return actors
+
+
 def set_carla_sync_mode(world, timestep=0.1, verbose=False):
     settings = world.get_settings()
     settings.synchronous_mode = True
@@ -228,17 +623,85 @@ def visualize_vehicle_and_walker(
     data,
     timestep=0.1,
     with_noise=True,
-    verbose=False
+    verbose=False,
+    client=None,
+    mode='unpaced',
+    origin=ORIGIN,
+    size=None
 ):
     '''
     Loads in the dataframe containing the first example for AST.
+
+    The data is either a dict of the interpolated car and pedestrian state
+    arrays or an iterable of such chunks, as returned by
+    interpolate_car_and_ped_chunks, which are replayed as they arrive. When
+    a client is given, the actors are updated with one command batch per
+    tick. See visualize_actors for the replay modes.
+    '''
+    return visualize_actors(
+        world,
+        (actors_from_car_and_ped(chunk) for chunk in iter_data_chunks(data)),
+        timestep,
+        with_noise,
+        verbose,
+        client=client,
+        mode=mode,
+        origin=origin,
+        size=size
+    )
+
+
+def visualize_actors(
+    world,
+    data,
+    timestep=0.1,
+    with_noise=True,
+    verbose=False,
+    model='lincoln',
+    client=None,
+    mode='unpaced',
+    origin=ORIGIN,
+    size=None
+):
+    '''
+    Replays any number of cars and pedestrians in synchronous mode.
+
+    The data is either a dict of actor states, as returned by
+    interpolate_actors, or an iterable of such dicts holding consecutive
+    chunks of steps, which are replayed as they arrive. When a client is
+    given, the actors are updated with one command batch per tick.
+
+    In the default 'unpaced' mode the world is ticked back-to-back and the
+    final scene is kept for a few seconds before the actors are destroyed.
+    'realtime' mode also paces the ticks to the wall clock. 'fast' mode
+    does not keep the final scene either, for batch evaluation. The origin
+    is the location, in the Carla world, of the origin of the AST frame.
+    The size constrains the dimensions of the cars, see
+    initialize_vehicle.
+
+    Returns
+    -------
+    util.common.ReplayClock
+        The clock holding the number of ticks and the achieved simulation
+        to wall time ratio of the replay, or None if there was no data.
     '''
-    car = None
-    ped = None
+    if mode not in REPLAY_MODES:
+        raise ValueError(
+            'Unknown replay mode {}, options: {}'.format(mode, REPLAY_MODES)
+        )
+
+    actors = []
+    clock = util.common.ReplayClock(timestep, mode == 'realtime')
+    chunks = iter_data_chunks(data)
+    first = next(chunks, None)
 
-    # Location of origin for this project
-    new_origin = np.array([156.0, 110.0, 0.0])
-    origin = carla.Vector3D(156.0, 110.0, 0.0)
+    if first is None:
+        print('No data to visualize')
+        return
+
+    # Location of origin for this scenario
+    new_origin = np.array(origin, dtype=np.float64)
+    origin = carla.Vector3D(*new_origin.tolist())
     camera_offset = carla.Location(0.0, -20.0, 10.0)
 
     try:
@@ -254,67 +717,369 @@ def visualize_vehicle_and_walker(
             carla.Rotation(-25.0, 115.0, 0.0)
         )
 
-        car, ped, ped_control = initialize_vehicle_and_walker(
+        actors = initialize_actors(
+            world,
+            first,
+            new_origin,
+            model,
+            verbose,
+            size
+        )
+
+        world.tick()
+
+        # Move the actors
+        clock.start()
+        replay_actors(
+            world,
+            actors,
+            itertools.chain([first], chunks),
+            new_origin,
+            timestep,
+            with_noise,
+            verbose,
+            client,
+            clock
+        )
+        clock.report()
+
+        for actor, kind in zip(actors, first['kinds']):
+            if actor and kind == 'ped':
+                apply_ped_control(actor, [0.0, 0.0], verbose)
+
+        world.tick()
+
+        print('Final locations:')
+        for name, actor in zip(first['names'], actors):
+            if actor:
+                print(
+                    '   {}:'.format(name),
+                    actor.get_transform().location - origin
+                )
+
+    finally:
+        # Set world to non-synchronous mode
+        unset_carla_sync_mode(world, verbose)
+
+        # Wait for a bit before destroying the actors
+        if mode != 'fast':
+            time.sleep(5.0)
+
+        for actor in actors:
+            if actor:
+                actor.destroy()
+
+    return clock
+
+
+def initialize_vehicles(
+    world,
+    data,
+    origin,
+    model='toyota',
+    verbose=False,
+    size=None
+):
+    # Initialize the actors (every trajectory is an independent car, even
+    # the ones logged as pedestrians)
+    return [
+        initialize_vehicle(world, pos, origin, 0.0, model, verbose, size)
+        for pos in data['states'][:, 0, 0:2]
+    ]
+
+
+def visualize_vehicles(
+    world,
+    data,
+    timestep=0.1,
+    with_noise=True,
+    verbose=False,
+    client=None,
+    mode='unpaced',
+    origin=ORIGIN,
+    model='toyota',
+    size=None
+):
+    '''
+    Replays every trajectory of the data, as returned by interpolate_actors,
+    as an independent vehicle, pedestrians included. When a client is
+    given, the vehicles are moved with one command batch per tick. See
+    visualize_actors for the replay modes and initialize_vehicle for the
+    size.
+    '''
+    vehicles = []
+    clock = util.common.ReplayClock(timestep, mode == 'realtime')
+
+    # Location of origin for this scenario
+    new_origin = np.array(origin, dtype=np.float64)
+    origin = carla.Vector3D(*new_origin.tolist())
+    camera_offset = carla.Location(0.0, -20.0, 10.0)
+
+    states = data['states']
+    heights = [0.5]*len(states)
+    noisy = [i for i, noise in enumerate(data['noise']) if noise]
+
+    try:
+        util.world.move_spectator(
+            world,
+            origin + camera_offset,
+            carla.Rotation(-25.0, 115.0, 0.0)
+        )
+
+        vehicles = initialize_vehicles(
             world,
             data,
             new_origin,
-            verbose
+            model,
+            verbose,
+            size
         )
 
+        # Set world to synchronous mode
+        set_carla_sync_mode(world, timestep, verbose)
         world.tick()
 
-        # print('Initial locations:')
-        # print('   Car:', car.get_transform().location - origin)
-        # print('   Ped:', ped.get_transform().location - origin)
+        tables = compute_transform_tables(
+            states,
+            new_origin,
+            heights,
+            noisy=noisy
+        )
+        noisy_vehicles = [vehicles[j] for j in noisy]
+        vehicle_ids = [vehicle.id if vehicle else None for vehicle in vehicles]
 
         # Move the actors
-        for i in range(len(data['car'])):
-            # Direct manipulation
-            move_actor(
-                car,
-                data['car'][i][0:2],
-                new_origin + [0, 0, 0.25],
-                data['car'][i][2:4],
-                verbose
-            )
-            move_actor(
-                ped,
-                data['ped'][i][0:2],
-                new_origin + [0, 0, 1.3],
-                data['ped'][i][2:4],
-                verbose
-            )
+        clock.start()
+        for i in range(len(tables['yaws'])):
+            world.tick()
 
-            # Control-based
-            apply_ped_control(ped, data['ped'][i][2:4], verbose)
+            # Direct manipulation
+            if client and not verbose:
+                util.client.apply_batch(
+                    client,
+                    build_tick_commands(
+                        vehicle_ids,
+                        tables['positions'][i].tolist(),
+                        tables['yaws'][i].tolist()
+                    )
+                )
+            else:
+                set_actor_transforms(
+                    vehicles,
+                    tables['positions'][i].tolist(),
+                    tables['yaws'][i].tolist(),
+                    verbose
+                )
 
             # Visualize the sensor noise
             if with_noise:
-                display_sensor_noise(ped, data['ped'][i][4:], timestep)
+                for vehicle, noise in zip(
+                    noisy_vehicles,
+                    tables['noise'][i].tolist()
+                ):
+                    if vehicle:
+                        display_sensor_noise(vehicle, noise, timestep)
 
-            # print('   Ped:', ped.get_transform().location - origin)
-            # print('   Vel:', data['ped'][i][2:4])
-            world.tick()
-
-        apply_ped_control(ped, [0.0, 0.0], verbose)
+            clock.tick()
 
+        clock.report()
         world.tick()
 
-        print('Final locations:')
-        print('   Car:', car.get_transform().location - origin)
-        print('   Ped:', ped.get_transform().location - origin)
-
-    finally:
         # Set world to non-synchronous mode
         unset_carla_sync_mode(world, verbose)
 
+    finally:
         # Wait for a bit before destroying the actors
-        time.sleep(5.0)
+        if mode != 'fast':
+            time.sleep(5.0)
+
+        for vehicle in vehicles:
+            if vehicle:
+                vehicle.destroy()
+
+    return clock
+
+
+def replay_actors(
+    world,
+    actors,
+    chunks,
+    origin,
+    timestep=0.1,
+    with_noise=True,
+    verbose=False,
+    client=None,
+    clock=None
+):
+    '''
+    Moves spawned actors through chunks of states, ticking the world once
+    per step.
+
+    Without a client, every actor is updated with its own set_transform and
+    apply_control calls. With a client, all the transforms and walker
+    controls of a tick are submitted as a single command batch through
+    client.apply_batch_sync, so the number of round trips per tick does not
+    grow with the number of actors. The verbose output needs the per-actor
+    calls, so it always uses the first path.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world, in synchronous mode.
+    actors : list of carla.Actor
+        The spawned actors, in the order of the data, with None for the
+        actors that failed to spawn.
+    chunks : iterable of dict
+        Consecutive chunks of actor states, as returned by
+        interpolate_actors.
+    origin : numpy.ndarray
+        The location of the AST frame origin in the Carla world.
+    timestep : float, optional
+        The simulation time, in seconds, of each step.
+    with_noise : bool, optional
+        Whether the sensor noise of the actors should be displayed.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+    client : carla.Client, optional
+        The client used to submit command batches.
+    clock : util.common.ReplayClock, optional
+        The clock that paces and counts the ticks.
+
+    Returns
+    -------
+    int
+        The number of ticks replayed.
+    '''
+    batched = client is not None and not verbose
+    ticks = 0
+    heights = None
+
+    for chunk in chunks:
+        if heights is None:
+            heights = [ACTOR_HEIGHTS[kind] for kind in chunk['kinds']]
+            walkers = [
+                i for i, kind in enumerate(chunk['kinds']) if kind == 'ped'
+            ]
+            noisy = [i for i, noise in enumerate(chunk['noise']) if noise]
+            walker_actors = [actors[j] for j in walkers]
+            noisy_actors = [actors[j] for j in noisy]
+            actor_ids = [actor.id if actor else None for actor in actors]
+            walker_ids = [actor_ids[j] for j in walkers]
+
+        tables = compute_transform_tables(
+            chunk['states'],
+            origin,
+            heights,
+            walkers,
+            noisy
+        )
+
+        for i in range(len(tables['yaws'])):
+            if batched:
+                commands = build_tick_commands(
+                    actor_ids,
+                    tables['positions'][i].tolist(),
+                    tables['yaws'][i].tolist(),
+                    walker_ids,
+                    tables['directions'][i].tolist(),
+                    tables['speeds'][i].tolist()
+                )
+                util.client.apply_batch(client, commands)
+            else:
+                # Direct manipulation
+                set_actor_transforms(
+                    actors,
+                    tables['positions'][i].tolist(),
+                    tables['yaws'][i].tolist(),
+                    verbose
+                )
+
+                # Control-based
+                for actor, direction, speed in zip(
+                    walker_actors,
+                    tables['directions'][i].tolist(),
+                    tables['speeds'][i].tolist()
+                ):
+                    if actor:
+                        control = carla.WalkerControl(
+                            carla.Vector3D(*direction),
+                            speed
+                        )
+
+                        if verbose:
+                            print('Pedestrain speed:', control.speed)
+                            print('Pedestrain direction:', control.direction)
+
+                        actor.apply_control(control)
+
+            # Visualize the sensor noise
+            if with_noise:
+                for actor, noise in zip(
+                    noisy_actors,
+                    tables['noise'][i].tolist()
+                ):
+                    if actor:
+                        display_sensor_noise(actor, noise, timestep)
+
+            world.tick()
+            ticks += 1
 
-        if car:
-            car.destroy()
-        if ped:
-            ped.destroy()
+            if clock:
+                clock.tick()
+
+    return ticks
+
+
+def build_tick_commands(
+    actor_ids,
+    positions,
+    yaws,
+    walker_ids=(),
+    directions=(),
+    speeds=()
+):
+    '''
+    Builds the Carla command batch that moves actors for one tick.
+
+    Parameters
+    ----------
+    actor_ids : list of int
+        The id of each actor, None for actors that failed to spawn.
+    positions : list of list of float
+        The world-frame location of each actor.
+    yaws : list of float
+        The yaw, in degrees, of each actor.
+    walker_ids : list of int, optional
+        The id of each walker, None for walkers that failed to spawn.
+    directions : list of list of float, optional
+        The walker control direction of each walker.
+    speeds : list of float, optional
+        The walker control speed of each walker.
+
+    Returns
+    -------
+    list of carla.command
+        ApplyTransform commands for every actor followed by
+        ApplyWalkerControl commands for every walker.
+    '''
+    commands = [
+        carla.command.ApplyTransform(
+            actor_id,
+            carla.Transform(carla.Location(*position), carla.Rotation(yaw=yaw))
+        )
+        for actor_id, position, yaw in zip(actor_ids, positions, yaws)
+        if actor_id is not None
+    ]
+    commands += [
+        carla.command.ApplyWalkerControl(
+            walker_id,
+            carla.WalkerControl(carla.Vector3D(*direction), speed)
+        )
+        for walker_id, direction, speed in zip(walker_ids, directions, speeds)
+        if walker_id is not None
+    ]
+
+    return commands
 
 
 def display_sensor_noise(ped, pos, timestep=0.1):
@@ -361,11 +1126,18 @@ def initialize_vehicle(
     offset,
     heading,
     model='lincoln',
-    verbose=False
+    verbose=False,
+    size=None
 ):
     '''
     Initializes a Carla actor with the provided data and returns the created
     actor.
+
+    With a size, the [minimum, maximum] bounds of the vehicle's length,
+    width or height in meters, the blueprint is picked among the ones of the
+    model whose dimensions in the vehicle catalog (see vehicle_info.py)
+    match, before any spawn. If none match, a ValueError is raised, and a
+    FileNotFoundError if there is no catalog.
     '''
     position = carla.Vector3D(
         pos[0] + offset[0],
@@ -374,10 +1146,16 @@ def initialize_vehicle(
     )
     rotation = carla.Rotation(0.0, heading, 0.0)
 
-    blueprints = world.get_blueprint_library().filter(
-        'vehicle.' + model + '.*'
+    blueprints = util.catalog.select_blueprints(
+        world,
+        'vehicle.' + model + '.*',
+        size
     )
 
+    if not blueprints:
+        print('No', model, 'vehicle blueprint. Returning None')
+        return None
+
     bp = util.actor.create_random_blueprint(blueprints)
 
     actor = util.actor.initialize(
@@ -406,7 +1184,7 @@ def initialize_walker(world, pos, offset, heading, verbose=False):
     )
     rotation = carla.Rotation(0.0, heading, 0.0)
 
-    blueprints = world.get_blueprint_library().filter('walker.pedestrian.0002')
+    blueprints = util.blueprint.filter(world, 'walker.pedestrian.0002')
     ped_bp = util.actor.create_random_blueprint(blueprints)
 
     actor = util.actor.initialize(
@@ -448,6 +1226,116 @@ def move_actor(actor, pos, offset, vel, verbose):
             )
 
 
+def actor_poses(states, origin, heights):
+    '''
+    Computes the Carla world-frame poses of several actors at once.
+
+    Parameters
+    ----------
+    states : numpy.ndarray
+        The (actors, ..., channels) states of the actors, in the AST frame.
+    origin : numpy.ndarray
+        The location of the AST frame origin in the Carla world.
+    heights : sequence of float
+        The height, above the origin, of each actor.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The (actors, ..., 3) locations and the (actors, ...) yaws, in
+        degrees, of the actors.
+    '''
+    heights = np.asarray(heights, dtype=np.float64).reshape(
+        (-1,) + (1,)*(states.ndim - 2)
+    )
+
+    positions = np.empty(states.shape[:-1] + (3,))
+    positions[..., 0] = states[..., 0] + origin[0]
+    positions[..., 1] = -states[..., 1] + origin[1]
+    positions[..., 2] = heights + origin[2]
+
+    yaws = np.arctan2(-states[..., 3], states[..., 2])*180.0/np.pi
+
+    return (positions, yaws)
+
+
+def compute_transform_tables(states, origin, heights, walkers=(), noisy=()):
+    '''
+    Precomputes everything the replay loop sends to Carla for a sequence of
+    steps, so that the loop itself only indexes into arrays.
+
+    Parameters
+    ----------
+    states : numpy.ndarray
+        The (actors, steps, channels) states of the actors, in the AST frame.
+    origin : numpy.ndarray
+        The location of the AST frame origin in the Carla world.
+    heights : sequence of float
+        The height, above the origin, of each actor.
+    walkers : sequence of int, optional
+        The indices of the actors driven with a walker control.
+    noisy : sequence of int, optional
+        The indices of the actors whose sensor noise is displayed.
+
+    Returns
+    -------
+    dict of str to numpy.ndarray
+        Step-major tables: the world-frame 'positions' (steps, actors, 3)
+        and 'yaws' (steps, actors) of every actor, the walker control
+        'directions' (steps, walkers, 3) and 'speeds' (steps, walkers),
+        and the sensor 'noise' offsets (steps, noisy, 2).
+    '''
+    positions, yaws = actor_poses(states, origin, heights)
+
+    walker_states = states[list(walkers)]
+    directions = np.zeros(walker_states.shape[:-1] + (3,))
+    directions[..., 0] = walker_states[..., 2]
+    directions[..., 1] = -walker_states[..., 3]
+    speeds = np.hypot(walker_states[..., 2], walker_states[..., 3])
+
+    tables = {
+        'positions': positions.swapaxes(0, 1),
+        'yaws': yaws.swapaxes(0, 1),
+        'directions': directions.swapaxes(0, 1),
+        'speeds': speeds.swapaxes(0, 1),
+        'noise': states[list(noisy), :, 4:6].swapaxes(0, 1)
+    }
+
+    return tables
+
+
+def set_actor_transforms(actors, positions, yaws, verbose=False):
+    '''
+    Sets the transform of several Carla actors from lists of world-frame
+    positions and yaws.
+    '''
+    for actor, position, yaw in zip(actors, positions, yaws):
+        if actor:
+            actor.set_transform(
+                carla.Transform(
+                    carla.Location(*position),
+                    carla.Rotation(yaw=yaw)
+                )
+            )
+
+            if verbose:
+                util.actor.print_info(actor)
+                util.actor.draw_boundingbox(
+                    actor,
+                    life_time=0.05,
+                    thickness=0.02,
+                    offset=carla.Location(0.0, 0.0, -0.2)
+                )
+
+
+def move_actors(actors, states, origin, heights, verbose=False):
+    '''
+    Moves several Carla actors to the given (actors, channels) states.
+    '''
+    positions, yaws = actor_poses(states, origin, heights)
+    set_actor_transforms(actors, positions.tolist(), yaws.tolist(), verbose)
+
+
 def main():
     args = parse_arguments()
 
@@ -468,82 +1356,81 @@ def main():
             sun_altitude_angle=68.0)
     carla_world.set_weather(weather)
 
+    profiler = cProfile.Profile() if args.profile else None
+
+    if profiler:
+        profiler.enable()
+
     # First lets read in the csv file
     if args.filename:
         orig_dt = 0.1
         new_dt = 1.0/60.0
-        data = parse_csv(args.filename, 'step', args.verbose)
-        data = interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
+        if args.chunk_size:
+            data = parse_csv_chunks(
+                args.filename,
+                'step',
+                args.chunk_size,
+                args.verbose,
+                args.cache
+            )
+            data = interpolate_car_and_ped_chunks(
+                data,
+                orig_dt,
+                new_dt,
+                args.verbose
+            )
+        else:
+            data = parse_csv(
+                args.filename,
+                'step',
+                args.verbose,
+                args.cache,
+                args.time_column
+            )
+            data = lazy_car_and_ped(
+                data,
+                orig_dt,
+                new_dt,
+                args.rate,
+                verbose=args.verbose
+            )
         visualize_vehicle_and_walker(
             carla_world,
             data,
             new_dt,
             False,
-            args.verbose
+            args.verbose,
+            client=carla_client,
+            mode=args.mode
         )
     else:
-        orig_dt = 0.1
-        new_dt = 1.0/20.0
-
-        # AST 1
-        data = parse_csv(
-            "/home/akoufos/Development/SISL/LincolnLabExample1/sample_trajectory.csv",
-            'step',
-            args.verbose
+        # The runner imports this module, so import it only when needed
+        import run_scenarios
+
+        manifest = run_scenarios.create_manifest(
+            map=args.map,
+            orig_dt=0.1,
+            new_dt=1.0/20.0,
+            with_noise=False,
+            directory='/home/akoufos/Development/SISL/LincolnLabExample1',
+            files=[
+                'sample_trajectory.csv',    # AST 1
+                'new_Traj.csv',             # AST 2
+                'no_crash_traj.csv',        # AST 3
+                'ped_fault_traj.csv'        # AST 4
+            ]
         )
-        data = interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-        visualize_vehicle_and_walker(
-            carla_world,
-            data,
-            new_dt,
-            False,
+        results = run_scenarios.run_manifests(
+            carla_client,
+            [manifest],
+            args.mode,
             args.verbose
         )
+        run_scenarios.print_summary(results)
 
-        # AST 2
-        data = parse_csv(
-            "/home/akoufos/Development/SISL/LincolnLabExample1/new_Traj.csv",
-            'step',
-            args.verbose
-        )
-        data = interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-        visualize_vehicle_and_walker(
-            carla_world,
-            data,
-            new_dt,
-            False,
-            args.verbose
-        )
-
-        # AST 3
-        data = parse_csv(
-            "/home/akoufos/Development/SISL/LincolnLabExample1/no_crash_traj.csv",
-            'step',
-            args.verbose
-        )
-        data = interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-        visualize_vehicle_and_walker(
-            carla_world,
-            data,
-            new_dt,
-            False,
-            args.verbose
-        )
-
-        # AST 4
-        data = parse_csv(
-            "/home/akoufos/Development/SISL/LincolnLabExample1/ped_fault_traj.csv",
-            'step',
-            args.verbose
-        )
-        data = interpolate_car_and_ped(data, orig_dt, new_dt, args.verbose)
-        visualize_vehicle_and_walker(
-            carla_world,
-            data,
-            new_dt,
-            False,
-            args.verbose
-        )
+    if profiler:
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats('tottime').print_stats(25)
 
 
 if __name__ == "__main__":
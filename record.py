@@ -1,8 +1,8 @@
 import sensors.cameras
+import util.recorder
 
 import carla
 
-import time
 
 def main():
     client = carla.Client('localhost', 2000)
@@ -25,20 +25,16 @@ def main():
 
     # camera = sensors.cameras.create_camera(world, transform=view_trans)
 
-    # Timing variables
-    timeout = 60.0 * 0.2 # seconds * minutes
-    start_time = time.time()
-
-    # Start recording
+    # Record 12 s of simulation, following the ticks instead of polling
     outfile = "Test01.log"
-    print("Recording on file: %s" % client.start_recorder(outfile))
-    
-    # Do things during recording
-    while time.time() < start_time + timeout:
-        pass
-
-    # Stop recording
-    client.stop_recorder()
+    session = util.recorder.RecorderSession(
+        client,
+        world,
+        outfile,
+        duration=60.0 * 0.2, # seconds * minutes
+        verbose=True
+    )
+    session.run()
 
     # Replay the video
     # client.replay_file(outfile, 0.0, 100.0, camera.)
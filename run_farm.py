@@ -0,0 +1,420 @@
+'''
+File: run_farm.py
+Project: SISL-AV-AST
+-----
+Copyright (c) 2019 Stanford Intelligent Systems Lab - Stanford University
+License: MIT License
+'''
+import util.client
+import ast_test as ast
+import run_scenarios
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import os
+import time
+
+
+# The client of the endpoint owned by the current worker process
+_worker = {}
+
+
+def parse_arguments():
+    '''
+    The argument parser used for the scenario farm.
+    '''
+    argparser = argparse.ArgumentParser(
+        description='Adaptive Stress Testing Scenario Farm',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    argparser.add_argument(
+        'directory',
+        metavar='DIRECTORY',
+        help='The directory containing the trajectory files to replay'
+    )
+    argparser.add_argument(
+        '--endpoints',
+        '-e',
+        metavar='E',
+        default='127.0.0.1:2000',
+        help='Comma separated host:port simulator endpoints'
+    )
+    argparser.add_argument(
+        '--pattern',
+        metavar='GLOB',
+        default='*.csv',
+        help='The pattern of the trajectory files in the directory'
+    )
+    argparser.add_argument(
+        '--manifest',
+        '-m',
+        metavar='M',
+        help='A JSON manifest whose settings are used for every file'
+    )
+    argparser.add_argument(
+        '-t',
+        '--timeout',
+        metavar='T',
+        default=3.0,
+        type=float,
+        help='Timeout, in seconds, of the Carla client when contacting server'
+    )
+    argparser.add_argument(
+        '--mode',
+        default='fast',
+        choices=ast.REPLAY_MODES,
+        help='How the replay is paced, see ast_test.REPLAY_MODES'
+    )
+    argparser.add_argument(
+        '--batch-size',
+        metavar='N',
+        type=int,
+        help='The number of files handed out to an endpoint at a time '
+        '(default: about four batches per endpoint)'
+    )
+    argparser.add_argument(
+        '-v',
+        '--verbose',
+        dest='verbose',
+        default=False,
+        action='store_true',
+        help='Boolean to toggle the output of verbose information'
+    )
+
+    args = argparser.parse_args()
+    args.description = argparser.description
+
+    return args
+
+
+def parse_endpoints(endpoints):
+    '''
+    Parses a comma separated list of host:port endpoints.
+
+    Returns
+    -------
+    list of tuple
+        The (host, port) of every endpoint.
+    '''
+    parsed = []
+
+    for endpoint in endpoints.split(','):
+        host, _, port = endpoint.strip().rpartition(':')
+        parsed.append((host or '127.0.0.1', int(port)))
+
+    return parsed
+
+
+def initialize_worker(
+    endpoint,
+    timeout,
+    map_name,
+    create_client=util.client.create
+):
+    '''
+    Connects a new worker process to its endpoint.
+
+    Every worker owns exactly one endpoint for its whole life, so the
+    server behind it only ever runs one scenario at a time and the
+    connection is reused for all of the worker's scenarios. A connection
+    error is kept for check_worker rather than raised, which would break
+    the worker's pool.
+    '''
+    host, port = endpoint
+    _worker['endpoint'] = '{}:{}'.format(host, port)
+
+    try:
+        client = create_client(host, port, timeout, map_name)
+    except Exception as error:
+        _worker['error'] = repr(error)
+        return
+
+    _worker['client'] = client
+
+
+def check_worker():
+    '''
+    Returns the connection error of the current worker, if any.
+    '''
+    return _worker.get('error', '')
+
+
+def run_batch(manifest, filenames, mode='fast', verbose=False):
+    '''
+    Replays a batch of trajectory files on the endpoint of the current
+    worker.
+
+    The whole batch is replayed with a single manifest, so the map and
+    weather are set once and the next file is parsed while the current one
+    replays, see run_scenarios.run_manifests.
+
+    Returns
+    -------
+    list of dict
+        The scenario results, as returned by run_scenarios.run_manifests,
+        with the endpoint and the start and end times of the batch.
+    '''
+    manifest = dict(manifest)
+    manifest['directory'] = ''
+    manifest['files'] = list(filenames)
+
+    start = time.time()
+    results = run_scenarios.run_manifests(
+        _worker['client'],
+        [manifest],
+        mode,
+        verbose
+    )
+    end = time.time()
+
+    for result in results:
+        result['endpoint'] = _worker['endpoint']
+        result['start'] = start
+        result['end'] = end
+
+    return results
+
+
+def failed_result(filename, manifest, endpoint, error):
+    '''
+    Returns the result of a scenario that could not be replayed.
+    '''
+    return {
+        'file': filename,
+        'map': manifest['map'],
+        'endpoint': endpoint,
+        'load_time': 0.0,
+        'ticks': 0,
+        'sim_time': 0.0,
+        'wall_time': 0.0,
+        'start': 0.0,
+        'end': 0.0,
+        'error': error
+    }
+
+
+def connect_workers(executors, endpoints):
+    '''
+    Starts the worker of every endpoint and checks its connection.
+
+    Returns
+    -------
+    list of tuple
+        The (executor, endpoint name) of every worker that is connected.
+        The endpoints that could not be connected to are reported.
+    '''
+    checks = [executor.submit(check_worker) for executor in executors]
+    workers = []
+
+    for executor, (host, port), check in zip(executors, endpoints, checks):
+        name = '{}:{}'.format(host, port)
+
+        try:
+            error = check.result()
+        except Exception as failure:
+            error = repr(failure)
+
+        if error:
+            print('Endpoint', name, 'is unreachable:', error)
+        else:
+            workers.append((executor, name))
+
+    return workers
+
+
+def run_farm(
+    endpoints,
+    filenames,
+    manifest,
+    timeout=3.0,
+    mode='fast',
+    batch_size=None,
+    create_client=util.client.create,
+    verbose=False
+):
+    '''
+    Replays trajectory files across a pool of simulator endpoints.
+
+    One worker process is started per endpoint and the files are handed
+    out in small batches to whichever worker is free, which keeps every
+    endpoint busy until the work runs out even when scenarios have very
+    different lengths. Endpoints that cannot be connected to are reported
+    and left out, and their share of the files goes to the others.
+
+    Parameters
+    ----------
+    endpoints : list of tuple
+        The (host, port) of every simulator.
+    filenames : list of str
+        The trajectory files to replay.
+    manifest : dict
+        The manifest whose settings are used for every file.
+    timeout : float, optional
+        The time in which to wait for a response from the servers.
+    mode : str, optional
+        The replay mode, one of ast_test.REPLAY_MODES.
+    batch_size : int, optional
+        The number of files handed out at a time. By default, every
+        endpoint gets about four batches.
+    create_client : callable, optional
+        Connects to an endpoint in a worker process, with the same
+        arguments as util.client.create, which is the default. It must be
+        picklable where worker processes are spawned rather than forked.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    list of dict
+        The result of every scenario, in the order of the files.
+    '''
+    executors = [
+        concurrent.futures.ProcessPoolExecutor(
+            max_workers=1,
+            initializer=initialize_worker,
+            initargs=(endpoint, timeout, manifest['map'], create_client)
+        )
+        for endpoint in endpoints
+    ]
+    results = [None]*len(filenames)
+    running = {}
+
+    try:
+        workers = connect_workers(executors, endpoints)
+
+        if batch_size is None:
+            batch_size = max(len(filenames)//(4*max(len(workers), 1)), 1)
+
+        pending = collections.deque(
+            list(enumerate(filenames))[start:start + batch_size]
+            for start in range(0, len(filenames), batch_size)
+        )
+
+        def submit(worker):
+            if pending:
+                batch = pending.popleft()
+                future = worker[0].submit(
+                    run_batch,
+                    manifest,
+                    [filename for index, filename in batch],
+                    mode,
+                    verbose
+                )
+                running[future] = (worker, batch)
+
+        for worker in workers:
+            submit(worker)
+
+        while running:
+            done, _ = concurrent.futures.wait(
+                running,
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+
+            for future in done:
+                worker, batch = running.pop(future)
+
+                try:
+                    for (index, filename), result in zip(
+                        batch,
+                        future.result()
+                    ):
+                        results[index] = result
+                except Exception as error:
+                    for index, filename in batch:
+                        results[index] = failed_result(
+                            filename,
+                            manifest,
+                            worker[1],
+                            repr(error)
+                        )
+
+                    if isinstance(error, concurrent.futures.BrokenExecutor):
+                        print('Endpoint', worker[1], 'failed:', repr(error))
+                        continue
+
+                submit(worker)
+
+        for batch in pending:
+            for index, filename in batch:
+                results[index] = failed_result(
+                    filename,
+                    manifest,
+                    '',
+                    'No reachable endpoint'
+                )
+    finally:
+        # Batches not started yet are dropped when the farm is interrupted
+        for future in running:
+            future.cancel()
+
+        for executor in executors:
+            executor.shutdown(wait=True)
+
+    return results
+
+
+def print_farm_summary(results, wall_time):
+    '''
+    Prints the scenario results followed by the load of every endpoint.
+    '''
+    run_scenarios.print_summary(results)
+
+    endpoints = sorted(set(r['endpoint'] for r in results if r['endpoint']))
+
+    print('{:24}{:>11}{:>10}{:>13}'.format(
+        'Endpoint',
+        'Scenarios',
+        'Busy[s]',
+        'Utilization'
+    ))
+
+    for endpoint in endpoints:
+        ran = [r for r in results if r['endpoint'] == endpoint]
+        batches = set((r['start'], r['end']) for r in ran)
+        busy = sum(end - start for start, end in batches)
+
+        print('{:24}{:11d}{:10.2f}{:12.1f}%'.format(
+            endpoint,
+            len(ran),
+            busy,
+            100.0*busy/wall_time if wall_time > 0.0 else 0.0
+        ))
+
+    print('Farm wall time: {:.2f} s'.format(wall_time))
+
+
+def main():
+    args = parse_arguments()
+
+    if args.manifest:
+        manifest = run_scenarios.load_manifest(args.manifest)
+    else:
+        manifest = run_scenarios.create_manifest()
+
+    filenames = sorted(glob.glob(os.path.join(args.directory, args.pattern)))
+    endpoints = parse_endpoints(args.endpoints)
+
+    print(
+        'Replaying', len(filenames), 'scenarios on', len(endpoints),
+        'endpoints'
+    )
+
+    start = time.perf_counter()
+    results = run_farm(
+        endpoints,
+        filenames,
+        manifest,
+        args.timeout,
+        args.mode,
+        args.batch_size,
+        verbose=args.verbose
+    )
+
+    print_farm_summary(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+'''
+File: run_scenarios.py
+Project: SISL-AV-AST
+-----
+Copyright (c) 2019 Stanford Intelligent Systems Lab - Stanford University
+License: MIT License
+'''
+import util.client
+import ast_test as ast
+
+import carla
+
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+
+
+DEFAULT_WEATHER = {
+    'cloudyness': 0.0,
+    'precipitation': 0.0,
+    'precipitation_deposits': 0.0,
+    'wind_intensity': 0.0,
+    'sun_azimuth_angle': 130.0,
+    'sun_altitude_angle': 68.0
+}
+
+MANIFEST_DEFAULTS = {
+    'map': 'Town03',
+    'orig_dt': 0.1,
+    'new_dt': 1.0/20.0,
+    'origin': ast.ORIGIN,
+    'replay': 'vehicle_and_walker',
+    'with_noise': True,
+    'index_column': 'step',
+    'directory': '',
+    'files': [],
+    'weather': DEFAULT_WEATHER,
+    'vehicle_size': None,
+    'rate': 1.0,
+    'time_column': None
+}
+
+
+def parse_arguments():
+    '''
+    The argument parser used for the scenario runner.
+    '''
+    argparser = argparse.ArgumentParser(
+        description='Adaptive Stress Testing Scenario Runner',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    argparser.add_argument(
+        'manifests',
+        metavar='MANIFEST',
+        nargs='+',
+        help='JSON manifests describing the scenarios to replay'
+    )
+    argparser.add_argument(
+        '--host',
+        metavar='H',
+        default='127.0.0.1',
+        help='The ip address of the host server'
+    )
+    argparser.add_argument(
+        '--port',
+        metavar='P',
+        default=2000,
+        type=int,
+        help='TCP port used for listening'
+    )
+    argparser.add_argument(
+        '-t',
+        '--timeout',
+        metavar='T',
+        default=3.0,
+        type=float,
+        help='Timeout, in seconds, of the Carla client when contacting server'
+    )
+    argparser.add_argument(
+        '--mode',
+        default='unpaced',
+        choices=ast.REPLAY_MODES,
+        help='How the replay is paced, see ast_test.REPLAY_MODES'
+    )
+    argparser.add_argument(
+        '-v',
+        '--verbose',
+        dest='verbose',
+        default=False,
+        action='store_true',
+        help='Boolean to toggle the output of verbose information'
+    )
+
+    args = argparser.parse_args()
+    args.description = argparser.description
+
+    return args
+
+
+def load_car_and_ped(filename, manifest, verbose=False):
+    data = ast.parse_csv(
+        filename,
+        manifest['index_column'],
+        verbose,
+        time_column=manifest['time_column']
+    )
+    return ast.lazy_car_and_ped(
+        data,
+        manifest['orig_dt'],
+        manifest['new_dt'],
+        manifest['rate'],
+        verbose=verbose
+    )
+
+
+def load_actors(filename, manifest, verbose=False):
+    data = ast.parse_csv_actors(
+        filename,
+        manifest['index_column'],
+        verbose,
+        time_column=manifest['time_column']
+    )
+    return ast.interpolate_actors(
+        data,
+        manifest['orig_dt'],
+        manifest['new_dt'],
+        verbose
+    )
+
+
+def load_actors_lazy(filename, manifest, verbose=False):
+    data = ast.parse_csv_actors(
+        filename,
+        manifest['index_column'],
+        verbose,
+        time_column=manifest['time_column']
+    )
+    return ast.lazy_actors(
+        data,
+        manifest['orig_dt'],
+        manifest['new_dt'],
+        manifest['rate'],
+        verbose=verbose
+    )
+
+
+# The loading and replay functions of each replay type of a manifest
+REPLAYS = {
+    'vehicle_and_walker': (
+        load_car_and_ped,
+        ast.visualize_vehicle_and_walker
+    ),
+    'actors': (load_actors_lazy, ast.visualize_actors),
+    'vehicles': (load_actors, ast.visualize_vehicles)
+}
+
+
+def create_manifest(**kwargs):
+    '''
+    Creates a manifest from keyword arguments, filling in the defaults.
+
+    Parameters
+    ----------
+    map : str, optional
+        The Carla map the scenarios are replayed in.
+    orig_dt : float, optional
+        The timestep, in seconds, of the trajectory files.
+    new_dt : float, optional
+        The timestep, in seconds, of the replay.
+    origin : list of float, optional
+        The location, in the Carla world, of the AST frame origin.
+    replay : str, optional
+        The replay function, one of the keys of REPLAYS.
+    with_noise : bool, optional
+        Whether the sensor noise should be displayed.
+    index_column : str, optional
+        The index column of the trajectory files.
+    time_column : str, optional
+        The column holding the time, in seconds, of every row of the
+        trajectory files, for irregular steps or actors logged at
+        different rates. Without it, the rows are orig_dt seconds apart.
+    directory : str, optional
+        The directory the trajectory files are relative to.
+    files : list of str
+        The trajectory files, replayed in order.
+    weather : dict, optional
+        The keyword arguments of the carla.WeatherParameters to use.
+    vehicle_size : dict, optional
+        The [minimum, maximum] bounds, in meters, of the length, width or
+        height of the replayed vehicles, picked from the vehicle catalog.
+    rate : float, optional
+        The trajectory time replayed per simulated second, negative to
+        replay backwards. The 'vehicles' replay ignores it.
+
+    Returns
+    -------
+    dict
+        The manifest.
+    '''
+    unknown = set(kwargs) - set(MANIFEST_DEFAULTS)
+
+    if unknown:
+        raise ValueError('Unknown manifest keys: {}'.format(sorted(unknown)))
+
+    manifest = dict(MANIFEST_DEFAULTS)
+    manifest.update(kwargs)
+
+    if manifest['replay'] not in REPLAYS:
+        raise ValueError(
+            'Unknown replay {}, options: {}'.format(
+                manifest['replay'],
+                sorted(REPLAYS)
+            )
+        )
+
+    if manifest['rate'] == 0.0:
+        raise ValueError('The manifest rate must not be zero')
+
+    return manifest
+
+
+def load_manifest(filename):
+    '''
+    Loads a JSON manifest. A relative directory is relative to the
+    manifest file itself.
+    '''
+    with open(filename) as f:
+        manifest = create_manifest(**json.load(f))
+
+    manifest['directory'] = os.path.normpath(
+        os.path.join(
+            os.path.dirname(os.path.abspath(filename)),
+            manifest['directory']
+        )
+    )
+
+    return manifest
+
+
+def load_scenario(filename, manifest, verbose=False):
+    '''
+    Parses one trajectory file of a manifest. The 'vehicles' replay is
+    interpolated at once, the others lazily while they are replayed.
+
+    Returns
+    -------
+    tuple
+        The data ready to replay and the time, in seconds, spent loading it.
+    '''
+    start = time.perf_counter()
+    load, replay = REPLAYS[manifest['replay']]
+    data = load(filename, manifest, verbose)
+
+    return (data, time.perf_counter() - start)
+
+
+def run_manifests(client, manifests, mode='unpaced', verbose=False):
+    '''
+    Replays the scenarios of several manifests with a single client.
+
+    The scenarios run in series on the same world, but the next scenario is
+    parsed and its trajectory built and checked in a background thread
+    while the current one replays, which hides the ingest time behind the
+    simulation time. Lazy replays interpolate their chunks as they replay.
+    The map and weather are only changed between manifests that need it.
+
+    Parameters
+    ----------
+    client : carla.Client
+        The Carla client connected to the server.
+    manifests : list of dict
+        The manifests, as returned by create_manifest or load_manifest.
+    mode : str, optional
+        The replay mode, one of ast_test.REPLAY_MODES.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    list of dict
+        The result of each scenario: its file, map, load time, number of
+        ticks, simulation and wall times, and error message if it failed.
+    '''
+    scenarios = [
+        (manifest, os.path.join(manifest['directory'], filename))
+        for manifest in manifests
+        for filename in manifest['files']
+    ]
+    results = []
+    world = None
+    current = None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        def prefetch(index):
+            if index < len(scenarios):
+                manifest, filename = scenarios[index]
+                return executor.submit(
+                    load_scenario,
+                    filename,
+                    manifest,
+                    verbose
+                )
+            return None
+
+        pending = prefetch(0)
+
+        for index, (manifest, filename) in enumerate(scenarios):
+            result = {
+                'file': filename,
+                'map': manifest['map'],
+                'load_time': 0.0,
+                'ticks': 0,
+                'sim_time': 0.0,
+                'wall_time': 0.0,
+                'error': ''
+            }
+            results.append(result)
+
+            try:
+                data, result['load_time'] = pending.result()
+            except Exception as error:
+                result['error'] = repr(error)
+                print('Unable to load', filename, ':', result['error'])
+                continue
+            finally:
+                pending = prefetch(index + 1)
+
+            new_map = current is None or manifest['map'] != current['map']
+
+            if new_map:
+                world = util.client.load_map(client, manifest['map'])
+            if new_map or manifest['weather'] != current['weather']:
+                world.set_weather(
+                    carla.WeatherParameters(**manifest['weather'])
+                )
+
+            current = manifest
+
+            print('Replaying', filename)
+            load, replay = REPLAYS[manifest['replay']]
+            start = time.perf_counter()
+
+            try:
+                clock = replay(
+                    world,
+                    data,
+                    manifest['new_dt'],
+                    manifest['with_noise'],
+                    verbose,
+                    client=client,
+                    mode=mode,
+                    origin=manifest['origin'],
+                    size=manifest['vehicle_size']
+                )
+            except Exception as error:
+                result['error'] = repr(error)
+                print('Unable to replay', filename, ':', result['error'])
+                clock = None
+
+            result['wall_time'] = time.perf_counter() - start
+
+            if clock:
+                result['ticks'] = clock.ticks
+                result['sim_time'] = clock.sim_time()
+
+    return results
+
+
+def print_summary(results):
+    '''
+    Prints one line per scenario result and the totals.
+    '''
+    print('{:40}{:>8}{:>10}{:>10}{:>10}  {}'.format(
+        'Scenario',
+        'Ticks',
+        'Load[s]',
+        'Sim[s]',
+        'Wall[s]',
+        'Error'
+    ))
+
+    for result in results:
+        print('{:40}{:8d}{:10.2f}{:10.2f}{:10.2f}  {}'.format(
+            os.path.basename(result['file'])[:39],
+            result['ticks'],
+            result['load_time'],
+            result['sim_time'],
+            result['wall_time'],
+            result['error']
+        ))
+
+    sim_time = sum(result['sim_time'] for result in results)
+    wall_time = sum(result['wall_time'] for result in results)
+    failed = sum(1 for result in results if result['error'])
+
+    print(
+        '{} scenarios, {} failed, {:.2f} s of simulation in {:.2f} s'.format(
+            len(results),
+            failed,
+            sim_time,
+            wall_time
+        )
+    )
+
+
+def run(args, manifests):
+    '''
+    Connects once to the server given by the command line arguments and
+    replays the manifests.
+    '''
+    client = util.client.create(
+        args.host,
+        args.port,
+        args.timeout,
+        manifests[0]['map']
+    )
+
+    results = run_manifests(client, manifests, args.mode, args.verbose)
+    print_summary(results)
+
+    return results
+
+
+def main():
+    args = parse_arguments()
+    manifests = [load_manifest(filename) for filename in args.manifests]
+
+    run(args, manifests)
+
+
+if __name__ == "__main__":
+    main()
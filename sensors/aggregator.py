@@ -0,0 +1,200 @@
+import collections
+import queue
+import threading
+import time
+
+
+class FrameAggregator:
+    '''
+    Bundles the data of several sensors by simulation frame.
+
+    Every sensor listens through its own callback, which stores its data
+    under the frame number. Once all sensors delivered a frame, the frame
+    is emitted as one bundle, oldest frame first. At most max_frames
+    incomplete frames are buffered and a frame still incomplete timeout
+    seconds after its first data arrived is evicted, as is the oldest
+    frame when the buffer is full, so a missing or late sensor only costs
+    its frames and never stalls the others. Data arriving for a frame
+    older than the last emitted one is discarded.
+
+    Bundles go to the on_bundle function when given, called in the thread
+    of the sensor completing the frame, or otherwise to a bounded queue
+    read with get, which drops its oldest bundle when full.
+
+    Parameters
+    ----------
+    names: list of str
+        The names of the aggregated sensors
+    timeout: float
+        The time, in seconds, after which an incomplete frame is evicted
+    max_frames: int
+        The maximum number of incomplete frames buffered
+    on_bundle: function
+        Called with every bundle instead of queueing it
+    max_bundles: int
+        The maximum number of bundles waiting in the queue
+    clock: function
+        Returns the current time, in seconds, used for the timeouts
+    '''
+    def __init__(
+        self,
+        names,
+        timeout=1.0,
+        max_frames=16,
+        on_bundle=None,
+        max_bundles=16,
+        clock=time.monotonic
+    ):
+        self.names = list(names)
+        self.timeout = timeout
+        self.max_frames = max_frames
+        self.on_bundle = on_bundle
+        self.clock = clock
+        self.bundles = queue.Queue(maxsize=max_bundles)
+        self.pending = collections.OrderedDict()
+        self.last_frame = None
+        self.lock = threading.Lock()
+        self.emitted = 0
+        self.evicted = 0
+        self.late = 0
+        self.overflowed = 0
+
+    def callback(self, name, convert=None):
+        '''
+        Creates the listen callback of a sensor.
+
+        Parameters
+        ----------
+        name: str
+            The name of the sensor, one of names
+        convert: function
+            Applied to the sensor data before it is buffered, e.g.
+            sensors.cameras.image_to_array
+
+        Returns
+        -------
+        function
+            The function to pass to carla.Sensor.listen
+        '''
+        if name not in self.names:
+            raise ValueError('Unknown sensor: ' + name)
+
+        def aggregate(data):
+            value = data if convert is None else convert(data)
+            self.add(name, data.frame_number, data.timestamp, value)
+
+        return aggregate
+
+    def add(self, name, frame_number, timestamp, value):
+        '''
+        Stores the data of a sensor for a frame and emits the frame if it
+        is complete.
+        '''
+        bundles = []
+
+        with self.lock:
+            now = self.clock()
+            self._evict(now)
+
+            if self.last_frame is not None and frame_number <= self.last_frame:
+                self.late += 1
+                return
+
+            if frame_number not in self.pending:
+                # Frames usually arrive in order, so keep the buffer sorted
+                # by only moving the rare out of order frame
+                self.pending[frame_number] = {
+                    'frame': frame_number,
+                    'timestamp': timestamp,
+                    'arrival': now,
+                    'sensors': {}
+                }
+
+                if any(frame > frame_number for frame in self.pending):
+                    for frame in sorted(self.pending):
+                        self.pending.move_to_end(frame)
+
+            self.pending[frame_number]['sensors'][name] = value
+
+            # A complete frame is emitted with any older frames evicted, so
+            # bundles always leave in frame order
+            if len(self.pending[frame_number]['sensors']) == len(self.names):
+                while True:
+                    frame, bundle = self.pending.popitem(last=False)
+
+                    if frame == frame_number:
+                        break
+
+                    self.evicted += 1
+
+                del bundle['arrival']
+                self.last_frame = frame_number
+                self.emitted += 1
+                bundles.append(bundle)
+
+            while len(self.pending) > self.max_frames:
+                self.pending.popitem(last=False)
+                self.evicted += 1
+
+        for bundle in bundles:
+            self._emit(bundle)
+
+    def _evict(self, now):
+        while self.pending:
+            frame, bundle = next(iter(self.pending.items()))
+
+            if now - bundle['arrival'] < self.timeout:
+                break
+
+            self.pending.popitem(last=False)
+            self.evicted += 1
+
+    def _emit(self, bundle):
+        if self.on_bundle is not None:
+            self.on_bundle(bundle)
+            return
+
+        while True:
+            try:
+                self.bundles.put_nowait(bundle)
+                return
+            except queue.Full:
+                try:
+                    self.bundles.get_nowait()
+
+                    with self.lock:
+                        self.overflowed += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        '''
+        Returns the next bundle, waiting up to timeout seconds for it.
+
+        Returns
+        -------
+        dict
+            The bundle: the frame number, the timestamp and a dictionary of
+            the data of every sensor, or None if no bundle arrived in time
+        '''
+        try:
+            return self.bundles.get(timeout=timeout)
+        except queue.Empty:
+            with self.lock:
+                self._evict(self.clock())
+
+            return None
+
+    def stats(self):
+        '''
+        Returns the number of frames emitted, evicted incomplete, discarded
+        late and dropped from the full queue, and of frames buffered.
+        '''
+        with self.lock:
+            return {
+                'emitted': self.emitted,
+                'evicted': self.evicted,
+                'late': self.late,
+                'overflowed': self.overflowed,
+                'pending': len(self.pending)
+            }
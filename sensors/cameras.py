@@ -1,6 +1,11 @@
+import util.blueprint
+import util.client
+
 import carla
+import numpy as np
 
 import enum
+import threading
 
 
 class SensorTypeEnum(enum.Enum):
@@ -14,6 +19,180 @@ class SensorTypeEnum(enum.Enum):
             print(name)
 
 
+class FrameRing:
+    '''
+    A preallocated ring buffer of the latest frames of a camera.
+
+    Every frame is copied once, from a numpy view over the image's raw
+    data, into the next of a fixed number of (height, width, 4) uint8 BGRA
+    slots, so capturing allocates no memory per frame and memory use stays
+    flat however long the capture runs.
+
+    The arrays returned without an out argument are views of the slots,
+    which are overwritten once the ring wraps around; pass an out array to
+    get a stable copy instead.
+
+    Parameters
+    ----------
+    height: int
+        The number of vertical pixels of the camera
+    width: int
+        The number of horizontal pixels of the camera
+    slots: int
+        The number of frames kept
+    '''
+    def __init__(self, height, width, slots=8):
+        self.buffer = np.zeros((slots, height, width, 4), dtype=np.uint8)
+        self.frame_numbers = np.full(slots, -1, dtype=np.int64)
+        self.timestamps = np.zeros(slots)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, len(self.buffer))
+
+    def push(self, image):
+        '''
+        Copies a carla.Image into the next slot. Can be passed directly to
+        carla.Sensor.listen.
+        '''
+        with self.lock:
+            slot = self.count % len(self.buffer)
+            np.copyto(self.buffer[slot], image_to_array(image))
+            self.frame_numbers[slot] = image.frame_number
+            self.timestamps[slot] = image.timestamp
+            self.count += 1
+
+    def _read(self, slot, out):
+        # Called with the lock held, so push cannot overwrite the slot
+        # between it being found and copied
+        if out is None:
+            return self.buffer[slot]
+
+        np.copyto(out, self.buffer[slot])
+
+        return out
+
+    def latest(self, out=None):
+        '''
+        Returns the most recent frame, or None before the first frame.
+        '''
+        with self.lock:
+            if self.count == 0:
+                return None
+
+            return self._read((self.count - 1) % len(self.buffer), out)
+
+    def get(self, frame_number, out=None):
+        '''
+        Returns the frame with the given frame number, or None if it is not
+        in the ring (anymore).
+        '''
+        with self.lock:
+            slots = np.flatnonzero(self.frame_numbers == frame_number)
+
+            if len(slots) == 0:
+                return None
+
+            return self._read(slots[0], out)
+
+    def recent(self, n):
+        '''
+        Returns views of the n most recent frames, oldest first.
+        '''
+        with self.lock:
+            n = min(n, len(self))
+
+            return [
+                self.buffer[index % len(self.buffer)]
+                for index in range(self.count - n, self.count)
+            ]
+
+
+def image_to_array(image):
+    '''
+    Returns a numpy view over the raw data of a Carla camera image, without
+    copying it. The view is only valid while the image is referenced.
+
+    Parameters
+    ----------
+    image: carla.Image
+        The image received from a camera
+
+    Returns
+    -------
+    numpy.ndarray
+        The (height, width, 4) uint8 BGRA pixels of the image
+    '''
+    return np.frombuffer(image.raw_data, dtype=np.uint8).reshape(
+        image.height,
+        image.width,
+        4
+    )
+
+
+def create_blueprint(world, sensor_type, height, width, fov, capture_rate):
+    '''
+    Creates the Carla blueprint of a camera of any of the sensor types.
+
+    Parameters
+    ----------
+    world: carla.World
+        The Carla world in which to find the blueprint type
+    sensor_type: SensorTypeEnum
+        The type of sensor of the camera
+    height: int
+        The number of vertical pixels of the camera
+    width: int
+        The number of horizontal pixels of the camera
+    fov: int
+        The Field of View (FOV) of the camera
+    capture_rate: int
+        The rate in which the camera captures images (Hz)
+
+    Returns
+    -------
+    carla.ActorBlueprint
+        A Carla actor blueprint for the camera sensor
+
+    Raises
+    ------
+    ValueError
+        If the sensor type is not a SensorTypeEnum
+    '''
+    if sensor_type == SensorTypeEnum.DEPTH:
+        return create_blueprint_depth(
+            world,
+            height,
+            width,
+            fov,
+            capture_rate
+        )
+    elif sensor_type == SensorTypeEnum.RGB:
+        return create_blueprint_rgb(
+            world,
+            height,
+            width,
+            fov,
+            capture_rate
+        )
+    elif sensor_type == SensorTypeEnum.SEGMENTATION:
+        return create_blueprint_segmentation(
+            world,
+            height,
+            width,
+            fov,
+            capture_rate
+        )
+
+    raise ValueError(
+        'Unknown sensor type {!r}, options: {}'.format(
+            sensor_type,
+            [member.name for member in SensorTypeEnum]
+        )
+    )
+
+
 def create_blueprint_depth(world, height, width, fov, capture_rate):
     '''
     Creates the Carla blueprint necessary for generating a depth type camera.
@@ -36,7 +215,7 @@ def create_blueprint_depth(world, height, width, fov, capture_rate):
     carla.ActorBlueprint
         A Carla actor blueprint for a depth camera sensor
     '''
-    blueprint = world.get_blueprint_library().find('sensor.camera.depth')
+    blueprint = util.blueprint.find(world, 'sensor.camera.depth')
 
     set_blueprint_attribute(blueprint, height, width, fov, capture_rate)
     # blueprint.set_attribute('convert', 'Depth')
@@ -66,7 +245,7 @@ def create_blueprint_rgb(world, height, width, fov, capture_rate):
     carla.ActorBlueprint
         A Carla actor blueprint for an RGB camera sensor
     '''
-    blueprint = world.get_blueprint_library().find('sensor.camera.rgb')
+    blueprint = util.blueprint.find(world, 'sensor.camera.rgb')
 
     set_blueprint_attribute(blueprint, height, width, fov, capture_rate)
     blueprint.set_attribute('enable_postprocess_effects', 'True')
@@ -96,7 +275,8 @@ def create_blueprint_segmentation(world, height, width, fov, capture_rate):
     carla.ActorBlueprint
         A Carla actor blueprint for an RGB camera sensor
     '''
-    blueprint = world.get_blueprint_library().find(
+    blueprint = util.blueprint.find(
+        world,
         'sensor.camera.semantic_segmentation'
     )
 
@@ -143,43 +323,216 @@ def create_camera(
     carla.Sensor
         A Carla sensor of a specific camera type
     '''
-    blueprint = None
-    world = actor.get_world()
-
-    if isinstance(sensor_type, SensorTypeEnum):
-        if sensor_type == SensorTypeEnum.DEPTH:
-            blueprint = create_blueprint_depth(
-                world,
-                height,
-                width,
-                fov,
-                capture_rate
-            )
-        elif sensor_type == SensorTypeEnum.RGB:
-            blueprint = create_blueprint_rgb(
-                world,
-                height,
-                width,
-                fov,
-                capture_rate
-            )
-        elif sensor_type == SensorTypeEnum.SEGMENTATION:
-            blueprint = create_blueprint_segmentation(
-                world,
-                height,
-                width,
-                fov,
-                capture_rate
-            )
-    else:
-        print('The provided sensor type does not exist. Options:')
-        SensorTypeEnum.print_options
+    blueprint = create_blueprint(
+        actor.get_world(),
+        sensor_type,
+        height,
+        width,
+        fov,
+        capture_rate
+    )
 
-    camera = world.spawn_actor(blueprint, transform, attach_to=actor)
+    camera = actor.get_world().spawn_actor(
+        blueprint,
+        transform,
+        attach_to=actor
+    )
 
     return camera
 
 
+def create_capture(
+    actor,
+    sensor_type=SensorTypeEnum.RGB,
+    height=1080,
+    width=1920,
+    fov=110,
+    capture_rate=5,
+    transform=carla.Transform(
+        carla.Location(x=0.5, y=0.0, z=1.5),
+        carla.Rotation(pitch=0.0, yaw=0.0, roll=0.0)
+    ),
+    slots=8
+):
+    '''
+    Creates a Carla camera whose frames are captured in a ring buffer.
+
+    Parameters
+    ----------
+    actor: carla.Actor
+        The Carla actor in which to attach the camera
+    sensor_type: SensorTypeEnum
+        The type of sensor of the camera
+    height: int
+        The number of vertical pixels of the camera
+    width: int
+        The number of horizontal pixels of the camera
+    fov: int
+        The Field of View (FOV) of the camera
+    capture_rate: int
+        The rate in which the camera captures images (Hz)
+    transform: carla.Transform
+        The location in which to attach the camera relative to the actor
+    slots: int
+        The number of frames kept in the ring buffer
+
+    Returns
+    -------
+    tuple
+        The carla.Sensor of the camera, already listening, and the
+        FrameRing receiving its frames
+    '''
+    camera = create_camera(
+        actor,
+        sensor_type,
+        height,
+        width,
+        fov,
+        capture_rate,
+        transform
+    )
+    ring = FrameRing(height, width, slots)
+    camera.listen(ring.push)
+
+    return (camera, ring)
+
+
+def create_camera_spec(
+    name,
+    sensor_type=SensorTypeEnum.RGB,
+    height=1080,
+    width=1920,
+    fov=110,
+    capture_rate=5,
+    transform=carla.Transform(
+        carla.Location(x=0.5, y=0.0, z=1.5),
+        carla.Rotation(pitch=0.0, yaw=0.0, roll=0.0)
+    )
+):
+    '''
+    Creates the spec of one camera of a sensor rig. A rig is a list of
+    camera specs, with the same parameters as create_camera.
+
+    Parameters
+    ----------
+    name: str
+        The name of the camera in the rig, e.g. 'rgb'
+
+    Returns
+    -------
+    dict
+        The camera spec
+    '''
+    return {
+        'name': name,
+        'sensor_type': sensor_type,
+        'height': height,
+        'width': width,
+        'fov': fov,
+        'capture_rate': capture_rate,
+        'transform': transform
+    }
+
+
+def create_rig(client, actors, rig, verbose=False):
+    '''
+    Attaches a sensor rig to many actors with a single spawn batch.
+
+    The blueprint of every camera spec is created once, from the cached
+    blueprint library, and one SpawnActor command per actor and camera is
+    applied in one round trip. The spawned cameras are then fetched with
+    one more call.
+
+    Parameters
+    ----------
+    client: carla.Client
+        The Carla client used to apply the command batch
+    actors: list of carla.Actor
+        The Carla actors in which to attach the rig
+    rig: list of dict
+        The camera specs of the rig, from create_camera_spec
+    verbose: bool
+        Used to determine whether some information should be displayed
+
+    Returns
+    -------
+    list of dict
+        For every actor, its cameras (carla.Sensor) by spec name. Cameras
+        that could not be spawned are missing.
+    '''
+    if not actors:
+        return []
+
+    world = actors[0].get_world()
+    commands = []
+    keys = []
+
+    # SpawnActor copies the blueprint, so the shared cached blueprint can be
+    # reconfigured for the next spec once its commands are created
+    for spec in rig:
+        blueprint = create_blueprint(
+            world,
+            spec['sensor_type'],
+            spec['height'],
+            spec['width'],
+            spec['fov'],
+            spec['capture_rate']
+        )
+
+        for index, actor in enumerate(actors):
+            commands.append(
+                carla.command.SpawnActor(
+                    blueprint,
+                    spec['transform'],
+                    actor.id
+                )
+            )
+            keys.append((index, spec['name']))
+
+    responses = util.client.apply_batch(client, commands, verbose)
+    spawned = {
+        response.actor_id: key
+        for key, response in zip(keys, responses)
+        if not response.has_error()
+    }
+    cameras = [{} for _ in actors]
+
+    for camera in world.get_actors(list(spawned)):
+        index, name = spawned[camera.id]
+        cameras[index][name] = camera
+
+    if verbose:
+        print(
+            'Spawned', len(spawned), 'of', len(commands),
+            'cameras on', len(actors), 'actors'
+        )
+
+    return cameras
+
+
+def destroy_rig(client, cameras, verbose=False):
+    '''
+    Stops and destroys the cameras of create_rig in a single batch.
+
+    Parameters
+    ----------
+    client: carla.Client
+        The Carla client used to apply the command batch
+    cameras: list of dict
+        The cameras of every actor, as returned by create_rig
+    verbose: bool
+        Used to determine whether some information should be displayed
+    '''
+    commands = []
+
+    for actor_cameras in cameras:
+        for camera in actor_cameras.values():
+            camera.stop()
+            commands.append(carla.command.DestroyActor(camera.id))
+
+    util.client.apply_batch(client, commands, verbose)
+
+
 def set_blueprint_attribute(blueprint, height, width, fov, capture_rate):
     '''
     Sets the basic attributes used by all camera based sensors in Carla.
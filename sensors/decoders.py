@@ -0,0 +1,146 @@
+import numpy as np
+
+
+# The maximum depth, in meters, encoded by Carla depth cameras
+MAX_DEPTH = 1000.0
+
+# The scale turning the 24 bit depth code R + G*256 + B*256*256 into meters
+DEPTH_SCALE = np.float32(MAX_DEPTH/(256.0**3 - 1.0))
+
+# The RGB color of every class id of Carla segmentation cameras, as drawn
+# by carla.ColorConverter.CityScapesPalette
+CITYSCAPES_PALETTE = np.array(
+    [
+        [0, 0, 0],          # Unlabeled
+        [70, 70, 70],       # Building
+        [190, 153, 153],    # Fence
+        [250, 170, 160],    # Other
+        [220, 20, 60],      # Pedestrian
+        [153, 153, 153],    # Pole
+        [157, 234, 50],     # RoadLine
+        [128, 64, 128],     # Road
+        [244, 35, 232],     # Sidewalk
+        [107, 142, 35],     # Vegetation
+        [0, 0, 142],        # Car
+        [102, 102, 156],    # Wall
+        [220, 220, 0]       # TrafficSign
+    ],
+    dtype=np.uint8
+)
+
+# The constant of carla.ColorConverter.LogarithmicDepth
+LOG_DEPTH_SCALE = 5.70378
+
+
+def decode_depth(frame, out=None):
+    '''
+    Decodes a raw depth camera frame into distances.
+
+    Parameters
+    ----------
+    frame: numpy.ndarray
+        The (height, width, 4) uint8 BGRA pixels of a depth camera image,
+        e.g. from sensors.cameras.image_to_array
+    out: numpy.ndarray
+        A (height, width) float32 array to write the result to
+
+    Returns
+    -------
+    numpy.ndarray
+        The (height, width) float32 depth of every pixel, in meters
+    '''
+    # Read every BGRA pixel as one little-endian integer B | G<<8 | R<<16
+    # and swap the B and R bytes to get the depth code
+    pixels = np.ascontiguousarray(frame).view('<u4')[..., 0]
+    code = (pixels & 0xff) << 16
+    code |= pixels & 0xff00
+    code |= (pixels >> 16) & 0xff
+
+    return np.multiply(code, DEPTH_SCALE, out=out, dtype=np.float32)
+
+
+def decode_segmentation(frame, out=None):
+    '''
+    Decodes a raw segmentation camera frame into class ids.
+
+    Carla stores the class id in the red channel, so without out the
+    result is a view of the frame and nothing is copied.
+
+    Parameters
+    ----------
+    frame: numpy.ndarray
+        The (height, width, 4) uint8 BGRA pixels of a segmentation camera
+        image, e.g. from sensors.cameras.image_to_array
+    out: numpy.ndarray
+        A (height, width) uint8 array to copy the result to
+
+    Returns
+    -------
+    numpy.ndarray
+        The (height, width) uint8 class id of every pixel
+    '''
+    class_ids = frame[..., 2]
+
+    if out is None:
+        return class_ids
+
+    np.copyto(out, class_ids)
+
+    return out
+
+
+def palette_view(class_ids, palette=CITYSCAPES_PALETTE, out=None):
+    '''
+    Renders class ids with a color palette, like CityScapesPalette.
+
+    Parameters
+    ----------
+    class_ids: numpy.ndarray
+        The (height, width) uint8 class ids, from decode_segmentation
+    palette: numpy.ndarray
+        The (classes, 3) uint8 RGB color of every class id
+    out: numpy.ndarray
+        A (height, width, 3) uint8 array to write the result to
+
+    Returns
+    -------
+    numpy.ndarray
+        The (height, width, 3) uint8 RGB image; unknown ids are black
+    '''
+    if len(palette) < 256:
+        padded = np.zeros((256, 3), dtype=np.uint8)
+        padded[:len(palette)] = palette
+        palette = padded
+
+    return np.take(palette, class_ids, axis=0, out=out)
+
+
+def log_depth_view(depth, out=None):
+    '''
+    Renders distances on a logarithmic gray scale, like LogarithmicDepth.
+
+    Parameters
+    ----------
+    depth: numpy.ndarray
+        The (height, width) float32 depth, in meters, from decode_depth
+    out: numpy.ndarray
+        A (height, width) uint8 array to write the result to
+
+    Returns
+    -------
+    numpy.ndarray
+        The (height, width) uint8 gray level of every pixel, from black
+        (close) to white (MAX_DEPTH)
+    '''
+    with np.errstate(divide='ignore'):
+        gray = np.log(depth/np.float32(MAX_DEPTH))
+
+    gray /= np.float32(LOG_DEPTH_SCALE)
+    gray += np.float32(1.0)
+    np.clip(gray, 0.0, 1.0, out=gray)
+    gray *= np.float32(255.0)
+
+    if out is None:
+        out = np.empty(depth.shape, dtype=np.uint8)
+
+    return np.rint(gray, out=out, casting='unsafe')
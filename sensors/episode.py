@@ -0,0 +1,441 @@
+import sensors.cameras
+import sensors.writer
+
+import numpy as np
+
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+
+
+# The compression schemes of the frame chunks of an episode
+COMPRESSIONS = [None, 'zlib']
+
+# One index record per frame: frame number, timestamp, offset and size of
+# its chunk in the data file, and its position in the chunk
+INDEX_RECORD = struct.Struct('<qdQQI')
+
+EPISODE_FILE = 'episode.json'
+
+
+def sensor_paths(directory, name):
+    '''
+    Returns the data and index file paths of a sensor of an episode.
+    '''
+    return (
+        os.path.join(directory, name + '.frames'),
+        os.path.join(directory, name + '.index')
+    )
+
+
+class EpisodeWriter:
+    '''
+    Records the frames of several sensors in one episode directory.
+
+    Every sensor has an append-only data file, holding its frames in chunks
+    of a fixed number of frames, each optionally zlib compressed, and an
+    index file with one fixed-size record per frame. A chunk's records are
+    only appended once the chunk itself is on disk, so an EpisodeReader can
+    read the episode while it is still being recorded. Opening an existing
+    episode appends to it.
+
+    The sensor callbacks only copy their frames: full chunks are handed to
+    a background thread through a bounded queue and compressed and written
+    there (zlib and file writes release the GIL), in the order they were
+    filled. A callback only waits when max_queue chunks are already
+    waiting to be written.
+
+    Parameters
+    ----------
+    directory: str
+        The episode directory, created if needed
+    chunk_frames: int
+        The number of frames of each chunk
+    compression: str
+        The compression of the chunks, one of COMPRESSIONS
+    level: int
+        The zlib compression level
+    max_queue: int
+        The maximum number of chunks waiting to be written
+    '''
+    def __init__(
+        self,
+        directory,
+        chunk_frames=16,
+        compression='zlib',
+        level=1,
+        max_queue=8
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                'Unknown compression {}, options: {}'.format(
+                    compression,
+                    COMPRESSIONS
+                )
+            )
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.chunk_frames = chunk_frames
+        self.compression = compression
+        self.level = level
+        self.sensors = {}
+        self.metadata = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.errors = 0
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+        filename = os.path.join(directory, EPISODE_FILE)
+
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.metadata = json.load(f)['sensors']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add_sensor(self, name, shape, dtype=np.uint8):
+        '''
+        Adds a sensor whose frames all have the given shape and dtype. A
+        sensor already in the episode is appended to, with its original
+        compression.
+        '''
+        with self.lock:
+            if name in self.sensors:
+                raise ValueError('Sensor already in episode: ' + name)
+
+            self._add_sensor(name, shape, dtype)
+
+    def _add_sensor(self, name, shape, dtype):
+        info = self.metadata.setdefault(name, {
+            'shape': list(shape),
+            'dtype': np.dtype(dtype).str,
+            'compression': self.compression
+        })
+
+        if (
+            tuple(info['shape']) != tuple(shape) or
+            np.dtype(info['dtype']) != np.dtype(dtype)
+        ):
+            raise ValueError(
+                'Sensor {} already recorded with shape {} and dtype '
+                '{}'.format(name, info['shape'], info['dtype'])
+            )
+
+        data_path, index_path = sensor_paths(self.directory, name)
+        self.sensors[name] = {
+            'shape': tuple(shape),
+            'dtype': np.dtype(dtype),
+            'compression': info['compression'],
+            'data': open(data_path, 'ab'),
+            'index': open(index_path, 'ab'),
+            'pending': [],
+            'lock': threading.Lock()
+        }
+        self._write_metadata()
+
+    def _write_metadata(self):
+        metadata = {'sensors': self.metadata}
+        filename = os.path.join(self.directory, EPISODE_FILE)
+
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(metadata, f, indent=4)
+
+        os.replace(filename + '.tmp', filename)
+
+    def append(self, name, frame_number, timestamp, frame):
+        '''
+        Appends a frame of a sensor. The frame is copied, so the caller can
+        reuse its array.
+        '''
+        sensor = self.sensors[name]
+
+        with sensor['lock']:
+            sensor['pending'].append(
+                (frame_number, timestamp, np.array(frame, sensor['dtype']))
+            )
+
+            if len(sensor['pending']) >= self.chunk_frames:
+                self._queue_chunk(sensor)
+
+    def _queue_chunk(self, sensor):
+        if sensor['pending']:
+            self.queue.put((sensor, sensor['pending']))
+            sensor['pending'] = []
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                self.queue.task_done()
+                return
+
+            # Any failure only loses its chunk, the thread must keep emptying
+            # the queue or the callbacks and close would wait forever
+            try:
+                self._write_chunk(*item)
+            except Exception as error:
+                print('Unable to write episode chunk:', repr(error))
+
+                with self.lock:
+                    self.errors += 1
+            finally:
+                self.queue.task_done()
+
+    def _write_chunk(self, sensor, pending):
+        chunk = b''.join(frame.tobytes() for _, _, frame in pending)
+
+        if sensor['compression'] == 'zlib':
+            chunk = zlib.compress(chunk, self.level)
+
+        offset = sensor['data'].tell()
+        sensor['data'].write(chunk)
+        sensor['data'].flush()
+
+        sensor['index'].write(b''.join(
+            INDEX_RECORD.pack(
+                frame_number,
+                timestamp,
+                offset,
+                len(chunk),
+                slot
+            )
+            for slot, (frame_number, timestamp, _) in enumerate(pending)
+        ))
+        sensor['index'].flush()
+
+    def callback(self, name, converter=None):
+        '''
+        Creates a listen callback recording the images of a camera as a
+        sensor of the episode, added with the size of its first image.
+
+        Parameters
+        ----------
+        name: str
+            The name of the sensor in the episode, e.g. 'veh1_rgb'
+        converter: carla.ColorConverter
+            The converter applied to the images before they are recorded
+
+        Returns
+        -------
+        function
+            The function to pass to carla.Sensor.listen
+        '''
+        def record_image(image):
+            if converter is not None:
+                image.convert(converter)
+
+            if name not in self.sensors:
+                # Check again under the lock, another camera callback may be
+                # adding the sensor on its own thread
+                with self.lock:
+                    if name not in self.sensors:
+                        self._add_sensor(
+                            name,
+                            (image.height, image.width, 4),
+                            np.uint8
+                        )
+
+            self.append(
+                name,
+                image.frame_number,
+                image.timestamp,
+                sensors.cameras.image_to_array(image)
+            )
+
+        return record_image
+
+    def flush(self):
+        '''
+        Writes the frames of the incomplete chunks and waits for every
+        queued chunk to be written, making them readable.
+        '''
+        for sensor in list(self.sensors.values()):
+            with sensor['lock']:
+                self._queue_chunk(sensor)
+
+        self.queue.join()
+
+    def close(self):
+        '''
+        Flushes the pending frames, stops the background thread and closes
+        the files of the episode.
+        '''
+        self.flush()
+        self.queue.put(None)
+        self.worker.join()
+
+        for sensor in self.sensors.values():
+            sensor['data'].close()
+            sensor['index'].close()
+
+
+class EpisodeReader:
+    '''
+    Reads the frames of an episode, possibly while it is being recorded.
+
+    A frame is found through its index record in constant time and only
+    its chunk is read and decompressed; the last chunk of every sensor is
+    kept, so sequential reads decompress each chunk once. Call refresh to
+    see the frames recorded since the episode was opened.
+
+    Parameters
+    ----------
+    directory: str
+        The episode directory
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        self.sensors = {}
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Loads the sensors and index records added since the last refresh.
+        '''
+        with open(os.path.join(self.directory, EPISODE_FILE)) as f:
+            metadata = json.load(f)
+
+        for name, info in metadata['sensors'].items():
+            if name not in self.sensors:
+                self.sensors[name] = {
+                    'shape': tuple(info['shape']),
+                    'dtype': np.dtype(info['dtype']),
+                    'compression': info['compression'],
+                    'records': [],
+                    'positions': {},
+                    'read': 0,
+                    'chunk': (None, None)
+                }
+
+            self._load_index(name)
+
+    def _load_index(self, name):
+        sensor = self.sensors[name]
+        data_path, index_path = sensor_paths(self.directory, name)
+
+        with open(index_path, 'rb') as f:
+            f.seek(sensor['read'])
+            data = f.read()
+
+        # Ignore a record being written
+        count = len(data)//INDEX_RECORD.size
+        sensor['read'] += count*INDEX_RECORD.size
+
+        data = data[:count*INDEX_RECORD.size]
+
+        for record in INDEX_RECORD.iter_unpack(data):
+            sensor['positions'][record[0]] = len(sensor['records'])
+            sensor['records'].append(record)
+
+    def __len__(self):
+        return sum(len(sensor['records']) for sensor in self.sensors.values())
+
+    def index(self):
+        '''
+        Returns the frame index of the episode.
+
+        Returns
+        -------
+        list of tuple
+            The (frame number, timestamp, sensor) of every recorded frame,
+            sorted by frame number
+        '''
+        return sorted(
+            (record[0], record[1], name)
+            for name, sensor in self.sensors.items()
+            for record in sensor['records']
+        )
+
+    def frame_numbers(self, name):
+        '''
+        Returns the frame numbers recorded by a sensor, in order.
+        '''
+        return [record[0] for record in self.sensors[name]['records']]
+
+    def read(self, name, frame_number):
+        '''
+        Reads the frame of a sensor with the given frame number.
+
+        Returns
+        -------
+        tuple
+            The timestamp of the frame and its array
+        '''
+        sensor = self.sensors[name]
+
+        try:
+            position = sensor['positions'][frame_number]
+        except KeyError:
+            raise KeyError(
+                'Frame {} not recorded by {}'.format(frame_number, name)
+            )
+
+        frame_number, timestamp, offset, size, slot = sensor['records'][
+            position
+        ]
+        chunk_offset, chunk = sensor['chunk']
+
+        if chunk_offset != offset:
+            data_path, index_path = sensor_paths(self.directory, name)
+
+            with open(data_path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(size)
+
+            if sensor['compression'] == 'zlib':
+                chunk = zlib.decompress(chunk)
+
+            chunk = np.frombuffer(chunk, dtype=sensor['dtype']).reshape(
+                (-1,) + sensor['shape']
+            )
+            sensor['chunk'] = (offset, chunk)
+
+        return (timestamp, chunk[slot])
+
+    def export_png(self, name, path, writer=None):
+        '''
+        Writes the frames of a camera sensor as PNG images, one per frame,
+        e.g. to look at a recorded episode.
+
+        Parameters
+        ----------
+        name: str
+            The name of the camera sensor in the episode, e.g. 'veh1_rgb'
+        path: str
+            The path of the images, formatted with the frame number, e.g.
+            'output/veh1_rgb_%06d'. The '.png' extension is added.
+        writer: sensors.writer.FrameWriter
+            The writer of the images, left open. By default, a blocking
+            writer is created and closed once every image is written.
+
+        Returns
+        -------
+        int
+            The number of frames queued to the writer
+        '''
+        own_writer = writer is None
+        queued = 0
+
+        if own_writer:
+            writer = sensors.writer.FrameWriter()
+
+        try:
+            for frame_number in self.frame_numbers(name):
+                timestamp, frame = self.read(name, frame_number)
+                queued += writer.put(path % frame_number + '.png', frame)
+        finally:
+            if own_writer:
+                writer.close()
+
+        return queued
@@ -0,0 +1,303 @@
+import numpy as np
+
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+
+# What to do with a new frame when the queue of a FrameWriter is full
+WRITE_POLICIES = ['block', 'drop_newest', 'drop_oldest']
+
+
+def encode_png(frame, level=1):
+    '''
+    Encodes a BGRA camera frame as an RGB PNG image.
+
+    Parameters
+    ----------
+    frame: numpy.ndarray
+        The (height, width, 4) uint8 BGRA pixels, as sent by Carla cameras
+    level: int
+        The zlib compression level, from 0 (none) to 9 (smallest)
+
+    Returns
+    -------
+    bytes
+        The PNG file contents
+    '''
+    height, width = frame.shape[:2]
+    rows = np.empty((height, 1 + 3*width), dtype=np.uint8)
+    # Filter type 0 (none) for every row, followed by the RGB pixels
+    rows[:, 0] = 0
+    rows[:, 1:].reshape(height, width, 3)[...] = frame[:, :, 2::-1]
+
+    def chunk(kind, data):
+        return (
+            struct.pack('>I', len(data)) +
+            kind +
+            data +
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+        )
+
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(rows.tobytes(), level)),
+        chunk(b'IEND', b'')
+    ])
+
+
+class FrameWriter:
+    '''
+    Writes camera frames to disk without blocking the sensor callbacks.
+
+    The callbacks only copy the raw image buffer into a bounded queue;
+    PNG encoding and disk writes happen on a pool of worker threads (zlib
+    and file writes release the GIL). When the queue is full, the policy
+    decides whether the callback waits for room ('block'), the new frame is
+    dropped ('drop_newest') or the oldest queued frame is dropped
+    ('drop_oldest'). Dropped frames are counted, never silently lost.
+    Frames put once the writer is closing are dropped.
+
+    Parameters
+    ----------
+    workers: int
+        The number of threads encoding and writing frames
+    max_queue: int
+        The maximum number of frames waiting to be written
+    policy: str
+        What to do with a new frame when the queue is full, one of
+        WRITE_POLICIES
+    block_timeout: float
+        With the 'block' policy, the maximum time, in seconds, a callback
+        waits for room before dropping its frame. None waits indefinitely.
+    level: int
+        The zlib compression level of the PNG images
+    '''
+    def __init__(
+        self,
+        workers=2,
+        max_queue=32,
+        policy='block',
+        block_timeout=None,
+        level=1
+    ):
+        if policy not in WRITE_POLICIES:
+            raise ValueError(
+                'Unknown write policy {}, options: {}'.format(
+                    policy,
+                    WRITE_POLICIES
+                )
+            )
+
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.level = level
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        # Held while a frame is queued, so close cannot queue the stop
+        # sentinels of the workers before it or have them evicted
+        self.put_lock = threading.Lock()
+        self.closing = False
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.workers = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(workers)
+        ]
+
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def callback(self, path, converter=None):
+        '''
+        Creates a listen callback writing the images of a camera.
+
+        Parameters
+        ----------
+        path: str
+            The path of the images, formatted with the frame number, e.g.
+            'output/veh1_rgb_%06d'. The '.png' extension is added.
+        converter: carla.ColorConverter
+            The converter applied to the image before it is copied, e.g.
+            carla.ColorConverter.LogarithmicDepth
+
+        Returns
+        -------
+        function
+            The function to pass to carla.Sensor.listen
+        '''
+        def write_image(image):
+            if converter is not None:
+                image.convert(converter)
+
+            self.put(
+                path % image.frame_number + '.png',
+                np.frombuffer(image.raw_data, dtype=np.uint8).reshape(
+                    image.height,
+                    image.width,
+                    4
+                ).copy()
+            )
+
+        return write_image
+
+    def put(self, filename, frame):
+        '''
+        Queues a BGRA frame to be written, applying the write policy when
+        the queue is full.
+
+        Returns
+        -------
+        bool
+            True if the frame was queued, False if it was dropped
+        '''
+        item = (filename, frame, time.perf_counter())
+
+        with self.lock:
+            self.received += 1
+
+        try:
+            with self.put_lock:
+                if self.closing:
+                    raise queue.Full
+                elif self.policy == 'block':
+                    self.queue.put(item, timeout=self.block_timeout)
+                elif self.policy == 'drop_newest':
+                    self.queue.put_nowait(item)
+                else:
+                    self._put_evicting(item)
+        except queue.Full:
+            self._count_dropped()
+            return False
+
+        depth = self.queue.qsize()
+
+        with self.lock:
+            self.max_depth = max(self.max_depth, depth)
+
+        return True
+
+    def _put_evicting(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    self._count_dropped()
+                except queue.Empty:
+                    pass
+
+    def _count_dropped(self):
+        with self.lock:
+            self.dropped += 1
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                self.queue.task_done()
+                return
+
+            filename, frame, queued = item
+
+            # Any failure only loses its frame, the worker must keep
+            # emptying the queue or the callbacks and close would wait
+            try:
+                data = encode_png(frame, self.level)
+                directory = os.path.dirname(filename)
+
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+
+                with open(filename, 'wb') as f:
+                    f.write(data)
+            except Exception as error:
+                print('Unable to write', filename, ':', repr(error))
+
+                with self.lock:
+                    self.errors += 1
+            else:
+                latency = time.perf_counter() - queued
+
+                with self.lock:
+                    self.written += 1
+                    self.total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        '''
+        Returns the counters of the writer.
+
+        Returns
+        -------
+        dict
+            The frames received, written, dropped and failed, the current
+            and maximum queue depths, and the mean and maximum latencies,
+            in seconds, from a frame being queued to it being on disk
+        '''
+        with self.lock:
+            return {
+                'received': self.received,
+                'written': self.written,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'depth': self.queue.qsize(),
+                'max_depth': self.max_depth,
+                'mean_latency': (
+                    self.total_latency/self.written if self.written else 0.0
+                ),
+                'max_latency': self.max_latency
+            }
+
+    def print_stats(self):
+        '''
+        Prints the counters of the writer.
+        '''
+        stats = self.stats()
+
+        print(
+            'Frames: {received} received, {written} written, {dropped} '
+            'dropped, {errors} failed'.format(**stats)
+        )
+        print(
+            'Queue depth: {depth} (max {max_depth}), write latency: '
+            '{:.1f} ms (max {:.1f} ms)'.format(
+                stats['mean_latency']*1e3,
+                stats['max_latency']*1e3,
+                **stats
+            )
+        )
+
+    def close(self):
+        '''
+        Waits for the queued frames to be written and stops the workers.
+        '''
+        with self.put_lock:
+            self.closing = True
+
+        for _ in self.workers:
+            self.queue.put(None)
+
+        for worker in self.workers:
+            worker.join()
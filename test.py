@@ -1,4 +1,5 @@
 import sensors.cameras
+import sensors.episode
 
 import carla
 
@@ -37,35 +38,23 @@ def main():
 
     control = carla.WalkerControl()
 
+    episode = sensors.episode.EpisodeWriter('output/veh1')
     rgb = sensors.cameras.create_camera(
         vehicle,
         sensors.cameras.SensorTypeEnum.RGB
     )
-    rgb.listen(
-        lambda image: image.save_to_disk(
-            'output/veh1_rgb_%06d' % image.frame_number
-        )
-    )
+    rgb.listen(episode.callback('rgb'))
     depth = sensors.cameras.create_camera(
         vehicle,
         sensors.cameras.SensorTypeEnum.DEPTH
     )
-    depth.listen(
-        lambda image: image.save_to_disk(
-            'output/veh1_dep_%06d' % image.frame_number,
-            carla.libcarla.ColorConverter.LogarithmicDepth
-        )
-    )
+    # Depth and segmentation are recorded raw, see sensors.decoders
+    depth.listen(episode.callback('dep'))
     seg = sensors.cameras.create_camera(
         vehicle,
         sensors.cameras.SensorTypeEnum.SEGMENTATION
     )
-    seg.listen(
-        lambda image: image.save_to_disk(
-            'output/veh1_seg_%06d' % image.frame_number,
-            carla.libcarla.ColorConverter.CityScapesPalette
-        )
-    )
+    seg.listen(episode.callback('seg'))
 
     start_time = time.time()
     timeout = 10.0  # seconds
@@ -80,6 +69,7 @@ def main():
     rgb.destroy()
     depth.destroy()
     seg.destroy()
+    episode.close()
     vehicle.destroy()
     ped.destroy()
 
@@ -0,0 +1,452 @@
+'''
+File: benchmark.py
+Project: SISL-AV-AST
+-----
+Copyright (c) 2019 Stanford Intelligent Systems Lab - Stanford University
+License: MIT License
+'''
+import os
+import sys
+
+# The scripts and the util package live in the repository root, the
+# stand-in server next to this file
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recorder_logs
+import standin
+import util.map
+import util.recorder_log
+import util.trajectory
+
+import numpy as np
+from scipy import interpolate
+
+import argparse
+import glob
+import tempfile
+import time
+
+
+def parse_arguments():
+    '''
+    The argument parser used for the benchmark script.
+    '''
+    argparser = argparse.ArgumentParser(
+        description='SISL-AV-AST Benchmarks',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    argparser.add_argument(
+        'benchmark',
+        choices=sorted(BENCHMARKS),
+        help='The benchmark to run'
+    )
+    argparser.add_argument(
+        '--filename',
+        '-f',
+        metavar='F',
+        help='An AST csv file to use instead of a synthetic trajectory'
+    )
+    argparser.add_argument(
+        '--rows',
+        metavar='N',
+        default=100000,
+        type=int,
+        help='The number of rows of the synthetic trajectory'
+    )
+    argparser.add_argument(
+        '--actors',
+        metavar='A',
+        default='1,10,50,100,200',
+        help='Comma separated actor counts of the replay and spawn '
+        'benchmarks'
+    )
+    argparser.add_argument(
+        '--steps',
+        metavar='S',
+        default=200,
+        type=int,
+        help='The number of replayed ticks per measurement'
+    )
+    argparser.add_argument(
+        '--latency',
+        metavar='L',
+        default=0.0002,
+        type=float,
+        help='The simulated round trip time, in seconds, of the stand-in '
+        'server'
+    )
+    argparser.add_argument(
+        '--frames',
+        metavar='F',
+        default=20000,
+        type=int,
+        help='The number of frames of each synthetic recorder log'
+    )
+    argparser.add_argument(
+        '--repeat',
+        metavar='R',
+        default=5,
+        type=int,
+        help='The number of times each measurement is repeated'
+    )
+
+    args = argparser.parse_args()
+    args.description = argparser.description
+
+    return args
+
+
+def write_synthetic_csv(filename, rows, seed=0):
+    '''
+    Writes a random AST csv file with one car and one pedestrian.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the csv file to write.
+    rows : int
+        The number of steps of the trajectory.
+    seed : int, optional
+        The seed of the random number generator.
+    '''
+    rng = np.random.default_rng(seed)
+    columns = util.trajectory.CAR_COLUMNS + util.trajectory.PED_COLUMNS
+    values = np.cumsum(rng.normal(size=(rows, len(columns))), axis=0)
+    step = np.arange(rows).reshape(-1, 1)
+
+    np.savetxt(
+        filename,
+        np.hstack((step, values)),
+        fmt=['%d'] + ['%.6f']*len(columns),
+        delimiter=',',
+        header=','.join(['step'] + columns),
+        comments=''
+    )
+
+
+def timed(function, repeat):
+    '''
+    Returns the best wall time, in seconds, of several calls to a function.
+    '''
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def benchmark_cache(args, directory):
+    '''
+    Compares cold (csv) and warm (memory-mapped) trajectory load times.
+    '''
+    filename = args.filename
+
+    if not filename:
+        filename = os.path.join(directory, 'trajectory.csv')
+        write_synthetic_csv(filename, args.rows)
+
+    groups = (util.trajectory.CAR_COLUMNS, util.trajectory.PED_COLUMNS)
+
+    def load(cache):
+        table, columns = util.trajectory.load_table(
+            filename,
+            'step',
+            groups,
+            cache
+        )
+        # Touch the data so the memory-mapped path pays for its page reads
+        for group in groups:
+            util.trajectory.select_columns(table, columns, group).sum()
+
+    def cold():
+        for path in util.trajectory.cache_paths(filename):
+            if os.path.exists(path):
+                os.remove(path)
+        load(True)
+
+    cold_time = timed(cold, args.repeat)
+    csv_time = timed(lambda: load(False), args.repeat)
+    warm_time = timed(lambda: load(True), args.repeat)
+
+    print('File:', filename)
+    print('   csv only:          {:10.3f} ms'.format(csv_time*1e3))
+    print('   cold (csv+cache):  {:10.3f} ms'.format(cold_time*1e3))
+    print('   warm (mmap):       {:10.3f} ms'.format(warm_time*1e3))
+    print('   speedup:           {:10.1f} x'.format(csv_time/warm_time))
+
+    if args.filename:
+        for path in util.trajectory.cache_paths(filename):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def legacy_interpolate_data(data, orig_step, new_step):
+    '''
+    The original interp1d based interpolation of a single actor.
+    '''
+    stop = len(data)*orig_step
+    t = np.arange(len(data))*orig_step
+    pos = data[:, 0:2].transpose()
+    vel = data[:, 2:4].transpose()
+
+    if data.shape[1] == 6:
+        err = data[:, 4:6].transpose()
+    else:
+        err = np.full(pos.shape, 0.0)
+
+    f_pos = interpolate.interp1d(t, pos)
+    f_vel = interpolate.interp1d(t, vel)
+    f_err = interpolate.interp1d(t, err)
+
+    new_t = np.arange(0.0, stop - orig_step, new_step)
+    new_data = np.concatenate((f_pos(new_t), f_vel(new_t), f_err(new_t)))
+
+    return new_data.transpose()
+
+
+def benchmark_resample(args, directory):
+    '''
+    Compares the interp1d per actor interpolation with the single-pass
+    vectorized resampler at 20, 25 and 60 Hz.
+    '''
+    rng = np.random.default_rng(0)
+    orig_step = 0.1
+    car = rng.normal(size=(args.rows, 4))
+    ped = rng.normal(size=(args.rows, 6))
+
+    print('Rows:', args.rows, 'at', 1.0/orig_step, 'Hz')
+
+    for rate in [20.0, 25.0, 60.0]:
+        new_step = 1.0/rate
+
+        def legacy():
+            return [
+                legacy_interpolate_data(car, orig_step, new_step),
+                legacy_interpolate_data(ped, orig_step, new_step)
+            ]
+
+        t, new_t = util.trajectory.resample_times(
+            args.rows,
+            orig_step,
+            new_step
+        )
+        states = util.trajectory.stack_states([car, ped])
+        out = np.empty((2, len(new_t), util.trajectory.STATE_CHANNELS))
+        scratch = np.empty_like(out)
+
+        def vectorized():
+            index, weight = util.trajectory.resample_weights(t, new_t)
+            return util.trajectory.resample(
+                states,
+                index,
+                weight,
+                out,
+                scratch
+            )
+
+        expected = np.stack(legacy())
+        error = np.abs(vectorized() - expected).max()
+        legacy_time = timed(legacy, args.repeat)
+        vectorized_time = timed(vectorized, args.repeat)
+
+        print('{:5.0f} Hz:'.format(rate))
+        print('   interp1d:    {:10.3f} ms'.format(legacy_time*1e3))
+        print('   vectorized:  {:10.3f} ms'.format(vectorized_time*1e3))
+        print('   speedup:     {:10.1f} x'.format(legacy_time/vectorized_time))
+        print('   max error:   {:10.3g}'.format(error))
+
+
+def benchmark_replay(args, directory):
+    '''
+    Compares the ticks per second of per-actor calls and of one command
+    batch per tick against the number of replayed actors, using a stand-in
+    server with a simulated round trip latency.
+    '''
+    # The replay engine builds Carla commands, which the stand-in server
+    # only understands as stand-in commands, even where Carla is installed
+    standin.install_carla(replace=True)
+    import ast_test
+
+    rng = np.random.default_rng(0)
+    origin = np.array([156.0, 110.0, 0.0])
+
+    print('Round trip latency:', args.latency*1e3, 'ms')
+    print('{:>8}{:>16}{:>16}{:>10}'.format(
+        'Actors',
+        'Per-actor [t/s]',
+        'Batched [t/s]',
+        'Speedup'
+    ))
+
+    for count in [int(value) for value in args.actors.split(',')]:
+        kinds = ['car' if i % 2 == 0 else 'ped' for i in range(count)]
+        data = {
+            'kinds': kinds,
+            'names': ['{}_{}'.format(kind, i) for i, kind in enumerate(kinds)],
+            'noise': [False]*count,
+            'states': rng.normal(size=(count, args.steps, 6))
+        }
+        rates = []
+
+        for batched in [False, True]:
+            world = standin.World(args.latency)
+            client = standin.Client(world)
+            actors = ast_test.initialize_actors(world, data, origin)
+
+            start = time.perf_counter()
+            ticks = ast_test.replay_actors(
+                world,
+                actors,
+                [data],
+                origin,
+                with_noise=False,
+                client=client if batched else None
+            )
+            rates.append(ticks/(time.perf_counter() - start))
+
+        print('{:8d}{:16.1f}{:16.1f}{:10.1f}'.format(
+            count,
+            rates[0],
+            rates[1],
+            rates[1]/rates[0]
+        ))
+
+
+def benchmark_spawn(args, directory):
+    '''
+    Compares the actors spawned per second by one spawn_actor call per
+    actor and by a single spawn_actors batch, using a stand-in server where
+    a tenth of the spawn points are already occupied.
+    '''
+    # The spawner builds Carla commands, which the stand-in server only
+    # understands as stand-in commands, even where Carla is installed
+    standin.install_carla(replace=True)
+    import util.world
+
+    print('Round trip latency:', args.latency*1e3, 'ms')
+    print('{:>8}{:>16}{:>16}{:>10}{:>10}'.format(
+        'Actors',
+        'Per-actor [a/s]',
+        'Batched [a/s]',
+        'Speedup',
+        'Failed'
+    ))
+
+    for count in [int(value) for value in args.actors.split(',')]:
+        rates = []
+
+        for batched in [False, True]:
+            world = standin.World(args.latency, collisions=True)
+            client = standin.Client(world)
+            blueprints = world.get_blueprint_library().filter('vehicle.*')
+            spawn_points = util.map.get_map(world).get_spawn_points()
+
+            for transform in spawn_points[::10]:
+                world.add(blueprints[0], transform)
+
+            start = time.perf_counter()
+
+            if batched:
+                actor_ids, failures = util.world.spawn_actors(
+                    world,
+                    client,
+                    blueprints,
+                    spawn_points[:count],
+                    refill=True
+                )
+                spawned = len(actor_ids)
+            else:
+                spawned = 0
+                failed = 0
+
+                for transform in spawn_points:
+                    if spawned == count:
+                        break
+                    if util.world.spawn_actor(world, blueprints, transform):
+                        spawned += 1
+                    else:
+                        failed += 1
+
+                failures = [None]*failed
+
+            rates.append(spawned/(time.perf_counter() - start))
+
+        print('{:8d}{:16.1f}{:16.1f}{:10.1f}{:10d}'.format(
+            count,
+            rates[0],
+            rates[1],
+            rates[1]/rates[0],
+            len(failures)
+        ))
+
+
+def benchmark_recorder(args, directory):
+    '''
+    Measures the indexing of synthetic recorder logs, from the logs and
+    from their sidecar indexes, and the queries the indexes answer. Scanning
+    a log costs one step per packet while loading its index does not depend
+    on the length of the log, so the logs need many frames to show it.
+    '''
+    count = 10
+    frames = args.frames
+    actors = 10
+    filenames = [
+        os.path.join(directory, 'recording{:03d}.log'.format(i))
+        for i in range(count)
+    ]
+
+    for seed, filename in enumerate(filenames):
+        recorder_logs.write_synthetic_log(
+            filename,
+            frames,
+            actors,
+            seed
+        )
+
+    def cold():
+        for path in glob.glob(os.path.join(directory, '*.index.npz')):
+            os.remove(path)
+        return [util.recorder_log.RecorderLog(f) for f in filenames]
+
+    cold_time = timed(cold, args.repeat)
+    warm_time = timed(
+        lambda: [util.recorder_log.RecorderLog(f) for f in filenames],
+        args.repeat
+    )
+    log = util.recorder_log.RecorderLog(filenames[0])
+    seek_time = timed(lambda: log.read_frame(len(log) - 1), args.repeat)
+    tracks_time = timed(lambda: log.tracks([1, 2]), args.repeat)
+    collisions_time = timed(
+        lambda: util.recorder_log.find_collisions(filenames, 'vehicle.*'),
+        args.repeat
+    )
+
+    print(count, 'logs of', frames, 'frames and', actors, 'actors')
+    print('   scan and index:      {:10.3f} ms'.format(cold_time*1e3))
+    print('   load indexes:        {:10.3f} ms'.format(warm_time*1e3))
+    print('   seek last frame:     {:10.3f} ms'.format(seek_time*1e3))
+    print('   tracks of 2 actors:  {:10.3f} ms'.format(tracks_time*1e3))
+    print('   collision query:     {:10.3f} ms'.format(collisions_time*1e3))
+
+
+BENCHMARKS = {
+    'cache': benchmark_cache,
+    'recorder': benchmark_recorder,
+    'replay': benchmark_replay,
+    'resample': benchmark_resample,
+    'spawn': benchmark_spawn
+}
+
+
+def main():
+    args = parse_arguments()
+
+    with tempfile.TemporaryDirectory() as directory:
+        BENCHMARKS[args.benchmark](args, directory)
+
+
+if __name__ == "__main__":
+    main()
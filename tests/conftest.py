@@ -0,0 +1,42 @@
+import numpy as np
+import pandas
+import pytest
+
+import os
+import sys
+
+
+# The scripts and the util and sensors packages live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import standin
+
+# The replay, spawn and sensor code builds Carla commands and transforms,
+# run against the stand-in ones where Carla is not installed
+standin.install_carla()
+
+
+@pytest.fixture
+def write_trajectory(tmp_path):
+    '''
+    Returns a function writing a random AST csv file with one car and one
+    pedestrian, sampled every 0.1 s, and returning its path.
+    '''
+    rng = np.random.default_rng(0)
+
+    def write(name='trajectory.csv', steps=30):
+        import util.trajectory
+
+        columns = {'step': np.arange(steps)}
+
+        for column in (
+            util.trajectory.CAR_COLUMNS + util.trajectory.PED_COLUMNS
+        ):
+            columns[column] = np.cumsum(rng.normal(size=steps))
+
+        filename = str(tmp_path/name)
+        pandas.DataFrame(columns).to_csv(filename, index=False)
+
+        return filename
+
+    return write
@@ -0,0 +1,105 @@
+'''
+Synthetic Carla recorder logs for the tests and benchmarks.
+'''
+import util.recorder_log
+
+import numpy as np
+
+import struct
+
+
+def write_synthetic_log(filename, frames, actors, seed=0):
+    '''
+    Writes a random Carla recorder log in which vehicles are spawned in the
+    first frame, move every frame, the first two collide every hundred
+    frames, and all are destroyed in the last frame.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the log to write.
+    frames : int
+        The number of frames of the log.
+    actors : int
+        The number of vehicles.
+    seed : int, optional
+        The seed of the random number generator.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (frames, actors, 3) location, in Unreal units, of every vehicle
+        in every frame, in the order of their ids 1 to actors.
+    '''
+    log = util.recorder_log
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, actors + 1, dtype=np.uint32)
+    positions = np.zeros(actors, dtype=log.POSITION_DTYPE)
+    positions['id'] = ids
+    positions['location'] = rng.uniform(-1e4, 1e4, size=(actors, 3))
+    locations = np.empty((frames, actors, 3), dtype=np.float32)
+
+    def string(text):
+        data = text.encode('utf-8')
+        return struct.pack('<H', len(data)) + data
+
+    def packet(packet_id, data=bytes()):
+        return log.PACKET_HEADER.pack(packet_id, len(data)) + data
+
+    spawn = bytes().join(
+        log.EVENT_ADD_HEAD.pack(
+            actor_id,
+            1,
+            *positions['location'][i],
+            0.0,
+            0.0,
+            0.0,
+            0
+        ) +
+        string('vehicle.audi.tt') +
+        log.COUNT.pack(1) +
+        struct.pack('<B', 0) +
+        string('color') +
+        string('0,0,0')
+        for i, actor_id in enumerate(ids)
+    )
+
+    with open(filename, 'wb') as f:
+        f.write(
+            struct.pack('<H', 1) +
+            string(log.MAGIC) +
+            struct.pack('<q', 0) +
+            string('Town03')
+        )
+
+        for frame in range(frames):
+            f.write(packet(
+                log.FRAME_START,
+                log.FRAME.pack(frame + 1, 0.05, frame*0.05)
+            ))
+
+            if frame == 0:
+                f.write(packet(log.EVENT_ADD, log.COUNT.pack(actors) + spawn))
+
+            if frame % 100 == 99 and actors > 1:
+                f.write(packet(
+                    log.COLLISION,
+                    log.COUNT.pack(1) +
+                    log.COLLISION_RECORD.pack(frame, 1, 2, False, False)
+                ))
+
+            if frame == frames - 1:
+                f.write(packet(
+                    log.EVENT_DEL,
+                    log.COUNT.pack(actors) + ids.astype('<u4').tobytes()
+                ))
+
+            positions['location'] += rng.normal(size=(actors, 3))
+            locations[frame] = positions['location']
+            f.write(packet(
+                log.POSITION,
+                log.COUNT.pack(actors) + positions.tobytes()
+            ))
+            f.write(packet(log.FRAME_END))
+
+    return locations
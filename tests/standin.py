@@ -0,0 +1,662 @@
+'''
+Local stand-ins for the Carla client, world and actors.
+
+They implement the subset of the Carla API used by this project and keep
+all state in memory, so replay code and benchmarks can run without a
+simulator. Every call that would be a round trip to the server sleeps for
+a configurable latency and is counted.
+'''
+import fnmatch
+import importlib.util
+import itertools
+import math
+import sys
+import time
+import types
+
+
+# Episode ids of the stand-in worlds, renewed whenever a map is loaded
+_episodes = itertools.count(1)
+
+
+class Location:
+    '''
+    Stand-in for carla.Location and carla.Vector3D.
+    '''
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __add__(self, other):
+        return Location(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return Location(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def distance(self, other):
+        return math.sqrt(
+            (self.x - other.x)**2 +
+            (self.y - other.y)**2 +
+            (self.z - other.z)**2
+        )
+
+
+class Rotation:
+    '''
+    Stand-in for carla.Rotation.
+    '''
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch = pitch
+        self.yaw = yaw
+        self.roll = roll
+
+
+class Transform:
+    '''
+    Stand-in for carla.Transform.
+    '''
+    def __init__(self, location=None, rotation=None):
+        self.location = location if location is not None else Location()
+        self.rotation = rotation if rotation is not None else Rotation()
+
+
+class Command:
+    '''
+    Stand-in for the carla.command classes, keeping their arguments as
+    attributes named like the Carla ones. Subclasses list the argument
+    names in fields.
+    '''
+    fields = ('actor_id',)
+
+    def __init__(self, *args):
+        for name, value in zip(self.fields, args):
+            setattr(self, name, value)
+
+        self.chained = []
+
+    def then(self, command):
+        self.chained.append(command)
+        return self
+
+
+def command_class(name, *fields):
+    '''
+    Returns a Command subclass with the name of a carla.command class, which
+    the stand-in client recognizes commands by.
+    '''
+    return type(name, (Command,), {'fields': fields})
+
+
+def carla_module():
+    '''
+    Returns a module implementing the subset of the carla module the
+    project builds commands and transforms with, so the code using it can
+    run against the stand-ins where Carla is not installed.
+    '''
+    module = types.ModuleType('carla')
+    module.ActorBlueprint = Blueprint
+    module.BlueprintLibrary = BlueprintLibrary
+    module.Actor = Actor
+    module.Map = Map
+    module.World = World
+    module.Location = Location
+    module.Vector3D = Location
+    module.Vector2D = lambda x=0.0, y=0.0: types.SimpleNamespace(x=x, y=y)
+    module.BoundingBox = lambda location, extent: types.SimpleNamespace(
+        location=location,
+        extent=extent
+    )
+    module.Rotation = Rotation
+    module.Transform = Transform
+    module.Color = lambda r=0, g=0, b=0, a=255: types.SimpleNamespace(
+        r=r,
+        g=g,
+        b=b,
+        a=a
+    )
+    module.WalkerControl = (
+        lambda direction=None, speed=0.0, jump=False: types.SimpleNamespace(
+            direction=direction if direction is not None else Location(),
+            speed=speed,
+            jump=jump
+        )
+    )
+    module.WeatherParameters = lambda **kwargs: types.SimpleNamespace(
+        **kwargs
+    )
+    module.ColorConverter = types.SimpleNamespace(
+        Raw='Raw',
+        Depth='Depth',
+        LogarithmicDepth='LogarithmicDepth',
+        CityScapesPalette='CityScapesPalette'
+    )
+    module.command = types.SimpleNamespace(
+        FutureActor=0,
+        Response=Response,
+        SpawnActor=command_class(
+            'SpawnActor',
+            'blueprint',
+            'transform',
+            'parent_id'
+        ),
+        DestroyActor=command_class('DestroyActor', 'actor_id'),
+        ApplyTransform=command_class(
+            'ApplyTransform',
+            'actor_id',
+            'transform'
+        ),
+        ApplyWalkerControl=command_class(
+            'ApplyWalkerControl',
+            'actor_id',
+            'control'
+        ),
+        SetAutopilot=command_class('SetAutopilot', 'actor_id', 'enabled')
+    )
+
+    return module
+
+
+def install_carla(replace=False):
+    '''
+    Makes the stand-in carla module importable when Carla is not installed,
+    or in place of Carla when replace is set, e.g. for code that must only
+    build the stand-in commands the stand-in client understands.
+    '''
+    if replace:
+        sys.modules['carla'] = carla_module()
+    elif importlib.util.find_spec('carla') is None:
+        sys.modules.setdefault('carla', carla_module())
+
+
+class Response:
+    '''
+    Stand-in for carla.command.Response.
+    '''
+    def __init__(self, actor_id=0, error=''):
+        self.actor_id = actor_id
+        self.error = error
+
+    def has_error(self):
+        return bool(self.error)
+
+
+class Blueprint:
+    '''
+    Stand-in for carla.ActorBlueprint.
+    '''
+    def __init__(self, id, attributes=None):
+        self.id = id
+        self.tags = id.split('.')
+        self.attributes = dict(attributes or {})
+
+    def has_attribute(self, name):
+        return name in self.attributes
+
+    def get_attribute(self, name):
+        value = self.attributes[name]
+        return types.SimpleNamespace(
+            recommended_values=[value],
+            as_str=lambda: value
+        )
+
+    def set_attribute(self, name, value):
+        self.attributes[name] = value
+
+
+class BlueprintLibrary(list):
+    '''
+    Stand-in for carla.BlueprintLibrary.
+    '''
+    def filter(self, pattern):
+        return BlueprintLibrary(
+            blueprint
+            for blueprint in self
+            if fnmatch.fnmatch(blueprint.id, pattern) or
+            any(fnmatch.fnmatch(tag, pattern) for tag in blueprint.tags)
+        )
+
+    def find(self, id):
+        for blueprint in self:
+            if blueprint.id == id:
+                return blueprint
+
+        raise IndexError('Blueprint not found: ' + id)
+
+
+class ActorList(list):
+    '''
+    Stand-in for carla.ActorList.
+    '''
+    def filter(self, pattern):
+        return ActorList(
+            actor for actor in self if fnmatch.fnmatch(actor.type_id, pattern)
+        )
+
+    def find(self, id):
+        for actor in self:
+            if actor.id == id:
+                return actor
+
+        return None
+
+
+class Actor:
+    '''
+    Stand-in for carla.Actor, carla.Vehicle and carla.Walker.
+    '''
+    def __init__(self, world, blueprint, transform, parent=None):
+        self.world = world
+        self.id = next(world.ids)
+        self.type_id = blueprint.id
+        self.attributes = dict(blueprint.attributes)
+        self.parent = parent
+        self.transform = transform
+        self.control = None
+        self.autopilot = False
+        self.is_alive = True
+        self.bounding_box = types.SimpleNamespace(
+            location=types.SimpleNamespace(x=0.0, y=0.0, z=0.0),
+            extent=types.SimpleNamespace(x=2.0, y=1.0, z=0.75)
+        )
+
+    def get_world(self):
+        return self.world
+
+    def get_transform(self):
+        self.world.rpc()
+        return self.transform
+
+    def get_location(self):
+        self.world.rpc()
+        return getattr(self.transform, 'location', None)
+
+    def set_transform(self, transform):
+        self.world.rpc()
+        self.transform = transform
+
+    def get_control(self):
+        self.world.rpc()
+        return self.control
+
+    def apply_control(self, control):
+        self.world.rpc()
+        self.control = control
+
+    def set_simulate_physics(self, enabled=True):
+        self.world.rpc()
+
+    def set_autopilot(self, enabled=True):
+        self.world.rpc()
+        self.autopilot = enabled
+
+    def listen(self, callback):
+        self.world.rpc()
+        self.callback = callback
+
+    def stop(self):
+        self.callback = None
+
+    def destroy(self):
+        self.world.rpc()
+        return self.world.remove(self.id)
+
+
+class Map:
+    '''
+    Stand-in for carla.Map: a square grid of straight two-way roads.
+
+    Parameters
+    ----------
+    name : str
+        The name of the map.
+    size : float, optional
+        The length, in meters, of the side of the grid.
+    block : float, optional
+        The distance, in meters, between parallel roads.
+    '''
+    def __init__(self, name, size=400.0, block=50.0):
+        self.name = name
+        self.size = size
+        self.block = block
+
+    def _transform(self, x, y, yaw):
+        return types.SimpleNamespace(
+            location=types.SimpleNamespace(x=x, y=y, z=0.0),
+            rotation=types.SimpleNamespace(pitch=0.0, yaw=yaw, roll=0.0)
+        )
+
+    def generate_waypoints(self, distance):
+        waypoints = []
+        roads = [i*self.block for i in range(int(self.size/self.block) + 1)]
+        steps = [i*distance for i in range(int(self.size/distance) + 1)]
+
+        for road in roads:
+            for lane, offset, yaw in ((1, 1.75, 0.0), (-1, -1.75, 180.0)):
+                for step in steps:
+                    waypoints.append(types.SimpleNamespace(
+                        road_id=int(road/self.block),
+                        lane_id=lane,
+                        s=step,
+                        transform=self._transform(step, road + offset, yaw)
+                    ))
+                    waypoints.append(types.SimpleNamespace(
+                        road_id=1000 + int(road/self.block),
+                        lane_id=lane,
+                        s=step,
+                        transform=self._transform(
+                            road + offset,
+                            step,
+                            yaw + 90.0
+                        )
+                    ))
+
+        return waypoints
+
+    def get_waypoint(self, location):
+        return min(
+            self.generate_waypoints(2.0),
+            key=lambda waypoint: (
+                (waypoint.transform.location.x - location.x)**2 +
+                (waypoint.transform.location.y - location.y)**2
+            )
+        )
+
+    def get_spawn_points(self):
+        return [
+            waypoint.transform for waypoint in self.generate_waypoints(25.0)
+        ]
+
+
+class Snapshot:
+    '''
+    Stand-in for carla.WorldSnapshot, a copy of the actor transforms.
+    '''
+    def __init__(self, world):
+        self.frame = world.frame
+        self.timestamp = types.SimpleNamespace(
+            frame_count=world.frame,
+            elapsed_seconds=world.frame*world.delta_seconds(),
+            delta_seconds=world.delta_seconds()
+        )
+        self.actors = {
+            actor.id: types.SimpleNamespace(
+                id=actor.id,
+                get_transform=lambda transform=actor.transform: transform
+            )
+            for actor in world.actors.values()
+        }
+
+    def __iter__(self):
+        return iter(self.actors.values())
+
+    def find(self, actor_id):
+        return self.actors.get(actor_id)
+
+
+class World:
+    '''
+    Stand-in for carla.World.
+
+    Parameters
+    ----------
+    latency : float, optional
+        The simulated round trip time, in seconds, of every server call.
+    blueprints : list of str, optional
+        The ids of the blueprints in the library.
+    map_name : str, optional
+        The name of the loaded map.
+    collisions : bool, optional
+        Whether spawning a vehicle within a meter of another one fails.
+    '''
+    def __init__(
+        self,
+        latency=0.0,
+        blueprints=(
+            'vehicle.lincoln.mkz2017',
+            'vehicle.toyota.prius',
+            'vehicle.audi.tt',
+            'walker.pedestrian.0001',
+            'walker.pedestrian.0002',
+            'sensor.camera.rgb',
+            'sensor.camera.depth',
+            'sensor.camera.semantic_segmentation'
+        ),
+        map_name='Town03',
+        collisions=False
+    ):
+        self.latency = latency
+        self.collisions = collisions
+        self.calls = 0
+        self.id = next(_episodes)
+        self.frame = 0
+        self.ids = itertools.count(1)
+        self.actors = {}
+        self.callbacks = {}
+        self.callback_ids = itertools.count(1)
+        self.map_name = map_name
+        self.settings = types.SimpleNamespace(
+            synchronous_mode=False,
+            fixed_delta_seconds=None
+        )
+        self.library = BlueprintLibrary(
+            Blueprint(id, {'color': '0,0,0'} if 'vehicle' in id else {})
+            for id in blueprints
+        )
+        self.spectator = Actor(self, Blueprint('spectator'), None)
+        self.debug = types.SimpleNamespace(
+            draw_box=lambda *args, **kwargs: self.rpc(),
+            draw_string=lambda *args, **kwargs: self.rpc(),
+            draw_point=lambda *args, **kwargs: self.rpc()
+        )
+
+    def rpc(self):
+        self.calls += 1
+
+        if self.latency > 0.0:
+            time.sleep(self.latency)
+
+    def get_settings(self):
+        self.rpc()
+        return types.SimpleNamespace(**vars(self.settings))
+
+    def apply_settings(self, settings):
+        self.rpc()
+        self.settings = types.SimpleNamespace(**vars(settings))
+        return self.frame
+
+    def get_map(self):
+        self.rpc()
+        return Map(self.map_name)
+
+    def set_weather(self, weather):
+        self.rpc()
+        self.weather = weather
+
+    def get_spectator(self):
+        self.rpc()
+        return self.spectator
+
+    def get_blueprint_library(self):
+        self.rpc()
+        return BlueprintLibrary(self.library)
+
+    def get_actors(self, actor_ids=None):
+        self.rpc()
+
+        if actor_ids is None:
+            return ActorList(self.actors.values())
+
+        return ActorList(
+            self.actors[id] for id in actor_ids if id in self.actors
+        )
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None):
+        self.rpc()
+
+        if self.collides(blueprint, transform):
+            return None
+
+        return self.add(blueprint, transform, attach_to)
+
+    def spawn_actor(self, blueprint, transform, attach_to=None):
+        return self.try_spawn_actor(blueprint, transform, attach_to)
+
+    def collides(self, blueprint, transform):
+        if not self.collisions or not blueprint.id.startswith('vehicle'):
+            return False
+
+        location = transform.location
+
+        return any(
+            actor.type_id.startswith('vehicle') and
+            (actor.transform.location.x - location.x)**2 +
+            (actor.transform.location.y - location.y)**2 < 1.0
+            for actor in self.actors.values()
+        )
+
+    def add(self, blueprint, transform, parent=None):
+        actor = Actor(self, blueprint, transform, parent)
+        self.actors[actor.id] = actor
+        return actor
+
+    def remove(self, actor_id):
+        actor = self.actors.pop(actor_id, None)
+
+        if actor is None:
+            return False
+
+        actor.is_alive = False
+        return True
+
+    def delta_seconds(self):
+        return self.settings.fixed_delta_seconds or 0.05
+
+    def tick(self):
+        self.rpc()
+        self.frame += 1
+
+        for callback in list(self.callbacks.values()):
+            callback(Snapshot(self))
+
+        return self.frame
+
+    def on_tick(self, callback):
+        callback_id = next(self.callback_ids)
+        self.callbacks[callback_id] = callback
+        return callback_id
+
+    def remove_on_tick(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def get_snapshot(self):
+        self.rpc()
+        return Snapshot(self)
+
+    def wait_for_tick(self, seconds=10.0):
+        self.rpc()
+        return Snapshot(self)
+
+
+class Client:
+    '''
+    Stand-in for carla.Client, connected to a stand-in world.
+    '''
+    def __init__(self, world=None, host='127.0.0.1', port=2000):
+        self.world = world if world is not None else World()
+        self.host = host
+        self.port = port
+
+    def set_timeout(self, seconds):
+        pass
+
+    def get_server_version(self):
+        self.world.rpc()
+        return 'standin'
+
+    def get_world(self):
+        self.world.rpc()
+        return self.world
+
+    def load_world(self, map_name):
+        self.world.rpc()
+        self.world.map_name = map_name
+        self.world.id = next(_episodes)
+        return self.world
+
+    def start_recorder(self, filename):
+        self.world.rpc()
+        self.recording = filename
+        return filename
+
+    def stop_recorder(self):
+        self.world.rpc()
+        self.recording = None
+
+    def apply_batch(self, commands):
+        self.apply_batch_sync(commands)
+
+    def apply_batch_sync(self, commands, do_tick=False):
+        '''
+        Applies the commands in a single simulated round trip. Commands are
+        recognized by their attributes, like the transform of an
+        ApplyTransform or the control of an ApplyWalkerControl command.
+        Commands chained to a SpawnActor are not visible from Python, so
+        spawned vehicles are assumed to be put on autopilot.
+        '''
+        self.world.rpc()
+        responses = []
+
+        for command in commands:
+            if type(command).__name__ == 'SpawnActor':
+                if self.world.collides(command.blueprint, command.transform):
+                    responses.append(Response(
+                        0,
+                        'Spawn failed because of collision at spawn position'
+                    ))
+                else:
+                    actor = self.world.add(
+                        command.blueprint,
+                        command.transform,
+                        self.world.actors.get(
+                            getattr(command, 'parent_id', 0)
+                        )
+                    )
+                    actor.autopilot = actor.type_id.startswith('vehicle')
+                    responses.append(Response(actor.id))
+                continue
+
+            actor_id = getattr(command, 'actor_id', 0)
+            actor = self.world.actors.get(actor_id)
+
+            if actor is None:
+                responses.append(Response(actor_id, 'actor not found'))
+                continue
+
+            if type(command).__name__ == 'DestroyActor':
+                self.world.remove(actor_id)
+            if hasattr(command, 'transform'):
+                actor.transform = command.transform
+            if hasattr(command, 'control'):
+                actor.control = command.control
+
+            responses.append(Response(actor_id))
+
+        if do_tick:
+            self.world.frame += 1
+
+        return responses
+
+
+def create_client(
+    host='127.0.0.1',
+    port=2000,
+    timeout=3.0,
+    map_name='Town03',
+    latency=0.0
+):
+    '''
+    Stand-in for util.client.create, connected to a new stand-in world
+    with the given round trip latency, in seconds.
+    '''
+    return Client(World(latency, map_name=map_name), host, port)
@@ -0,0 +1,136 @@
+import sensors.aggregator
+
+import pytest
+
+import types
+
+
+class Clock:
+    '''
+    A clock only moving when told to.
+    '''
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def data(frame_number, value=None):
+    return types.SimpleNamespace(
+        frame_number=frame_number,
+        timestamp=frame_number*0.05,
+        value=value
+    )
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def aggregator(clock, **kwargs):
+    return sensors.aggregator.FrameAggregator(
+        ['rgb', 'depth'],
+        clock=clock,
+        **kwargs
+    )
+
+
+def test_complete_frames_are_bundled(clock):
+    frames = aggregator(clock)
+    rgb = frames.callback('rgb', lambda image: image.value)
+    depth = frames.callback('depth')
+
+    rgb(data(1, 'pixels'))
+
+    assert frames.get(timeout=0.0) is None
+
+    depth(data(1))
+    bundle = frames.get(timeout=0.0)
+
+    assert bundle['frame'] == 1
+    assert bundle['timestamp'] == 0.05
+    assert bundle['sensors']['rgb'] == 'pixels'
+    assert bundle['sensors']['depth'].frame_number == 1
+    assert frames.stats()['emitted'] == 1
+    assert frames.stats()['pending'] == 0
+
+
+def test_unknown_sensor_is_rejected(clock):
+    with pytest.raises(ValueError, match='Unknown sensor: lidar'):
+        aggregator(clock).callback('lidar')
+
+
+def test_incomplete_frames_time_out(clock):
+    frames = aggregator(clock, timeout=1.0)
+    frames.add('rgb', 1, 0.05, 'a')
+    clock.now = 0.5
+    frames.add('rgb', 2, 0.1, 'b')
+    clock.now = 1.2
+
+    assert frames.get(timeout=0.0) is None
+    assert frames.stats()['evicted'] == 1
+    assert frames.stats()['pending'] == 1
+
+    frames.add('depth', 2, 0.1, 'c')
+
+    assert frames.get(timeout=0.0)['frame'] == 2
+
+
+def test_late_frames_are_discarded(clock):
+    emitted = []
+    frames = aggregator(clock, on_bundle=emitted.append)
+    frames.add('rgb', 1, 0.05, 'a')
+    frames.add('rgb', 2, 0.1, 'b')
+    frames.add('depth', 2, 0.1, 'c')
+    frames.add('depth', 1, 0.05, 'd')
+
+    assert [bundle['frame'] for bundle in emitted] == [2]
+    assert frames.stats() == {
+        'emitted': 1,
+        'evicted': 1,
+        'late': 1,
+        'overflowed': 0,
+        'pending': 0
+    }
+
+
+def test_out_of_order_frames_are_emitted_in_order(clock):
+    emitted = []
+    frames = aggregator(clock, on_bundle=emitted.append)
+
+    for frame_number in [3, 1, 2]:
+        frames.add('rgb', frame_number, 0.0, None)
+
+    for frame_number in [1, 2, 3]:
+        frames.add('depth', frame_number, 0.0, None)
+
+    assert [bundle['frame'] for bundle in emitted] == [1, 2, 3]
+
+
+def test_pending_frames_are_bounded(clock):
+    frames = aggregator(clock, max_frames=3)
+
+    for frame_number in range(1, 11):
+        frames.add('rgb', frame_number, 0.0, None)
+
+    assert frames.stats()['pending'] == 3
+    assert frames.stats()['evicted'] == 7
+
+    frames.add('depth', 10, 0.0, None)
+
+    assert frames.get(timeout=0.0)['frame'] == 10
+    assert frames.stats()['evicted'] == 9
+
+
+def test_full_queue_drops_the_oldest_bundle(clock):
+    frames = aggregator(clock, max_bundles=2)
+
+    for frame_number in range(1, 5):
+        frames.add('rgb', frame_number, 0.0, None)
+        frames.add('depth', frame_number, 0.0, None)
+
+    assert frames.get(timeout=0.0)['frame'] == 3
+    assert frames.get(timeout=0.0)['frame'] == 4
+    assert frames.stats()['overflowed'] == 2
@@ -0,0 +1,31 @@
+import benchmark
+
+import pytest
+
+import subprocess
+import sys
+
+
+# Small enough for every benchmark to run in about a second
+ARGUMENTS = [
+    '--rows', '200',
+    '--actors', '2,4',
+    '--steps', '5',
+    '--latency', '0',
+    '--frames', '200',
+    '--repeat', '1'
+]
+
+
+@pytest.mark.parametrize('name', sorted(benchmark.BENCHMARKS))
+def test_benchmark_runs(name):
+    # A new process, so the benchmark sets up its own carla module
+    result = subprocess.run(
+        [sys.executable, benchmark.__file__, name] + ARGUMENTS,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        timeout=120
+    )
+
+    assert result.returncode == 0, result.stdout
@@ -0,0 +1,70 @@
+import standin
+import util.blueprint
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def session(monkeypatch):
+    monkeypatch.setattr(util.blueprint, '_caches', {})
+
+
+def test_library_is_fetched_once_per_world():
+    world = standin.World()
+    calls = world.calls
+
+    vehicles = util.blueprint.filter(world, 'vehicle.*')
+    util.blueprint.find(world, 'sensor.camera.rgb')
+    util.blueprint.filter(world, 'walker.*')
+
+    assert world.calls == calls + 1
+    assert [blueprint.id for blueprint in vehicles] == [
+        'vehicle.lincoln.mkz2017',
+        'vehicle.toyota.prius',
+        'vehicle.audi.tt'
+    ]
+
+
+def test_patterns_are_memoized_and_match_tags():
+    world = standin.World()
+    cache = util.blueprint.get_cache(world)
+
+    assert cache.filter('audi') is cache.filter('audi')
+    assert [blueprint.id for blueprint in cache.filter('audi')] == [
+        'vehicle.audi.tt'
+    ]
+    assert cache.filter('vehicle.bmw.*') == []
+
+
+def test_unknown_type_id_raises_index_error():
+    with pytest.raises(IndexError, match='vehicle.bmw.isetta'):
+        util.blueprint.find(standin.World(), 'vehicle.bmw.isetta')
+
+
+def test_worlds_and_episodes_are_cached_separately():
+    client = standin.Client()
+    first = util.blueprint.get_cache(client.world)
+    other = util.blueprint.get_cache(standin.World())
+
+    assert other is not first
+    assert util.blueprint.get_cache(client.world) is first
+
+    client.load_world('Town05')
+
+    assert util.blueprint.get_cache(client.world) is not first
+
+
+def test_invalidate_refetches_the_library():
+    world = standin.World()
+    other = standin.World()
+    first = util.blueprint.get_cache(world)
+    kept = util.blueprint.get_cache(other)
+
+    util.blueprint.invalidate(world)
+
+    assert util.blueprint.get_cache(world) is not first
+    assert util.blueprint.get_cache(other) is kept
+
+    util.blueprint.invalidate()
+
+    assert util.blueprint.get_cache(other) is not kept
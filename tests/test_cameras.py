@@ -0,0 +1,88 @@
+import carla
+import numpy as np
+import pytest
+
+import sensors.cameras
+import standin
+
+import types
+
+
+def test_unknown_sensor_type_names_the_type():
+    world = standin.World()
+    actor = world.spawn_actor(
+        world.get_blueprint_library().find('vehicle.audi.tt'),
+        carla.Transform(carla.Location(0.0, 0.0, 0.0))
+    )
+    rig = [
+        sensors.cameras.create_camera_spec(
+            'thermal',
+            'THERMAL',
+            600,
+            800,
+            90,
+            10,
+            carla.Transform()
+        )
+    ]
+
+    with pytest.raises(ValueError, match='THERMAL'):
+        sensors.cameras.create_rig(standin.Client(world), [actor], rig)
+
+
+def image(frame_number, height=2, width=3):
+    return types.SimpleNamespace(
+        raw_data=np.full(
+            (height, width, 4),
+            frame_number,
+            dtype=np.uint8
+        ).tobytes(),
+        height=height,
+        width=width,
+        frame_number=frame_number,
+        timestamp=frame_number*0.05
+    )
+
+
+def test_frame_ring_wraps_around():
+    ring = sensors.cameras.FrameRing(2, 3, slots=3)
+
+    assert ring.latest() is None
+
+    for frame_number in range(1, 6):
+        ring.push(image(frame_number))
+
+    assert len(ring) == 3
+    assert ring.latest()[0, 0, 0] == 5
+    assert [frame[0, 0, 0] for frame in ring.recent(5)] == [3, 4, 5]
+    assert ring.get(4)[0, 0, 0] == 4
+
+
+def test_frame_ring_evicted_frames_are_missing():
+    ring = sensors.cameras.FrameRing(2, 3, slots=2)
+
+    for frame_number in range(1, 4):
+        ring.push(image(frame_number))
+
+    assert ring.get(1) is None
+    assert ring.get(1, np.empty((2, 3, 4), dtype=np.uint8)) is None
+    assert ring.get(2)[0, 0, 0] == 2
+
+
+def test_frame_ring_out_copies_are_stable():
+    ring = sensors.cameras.FrameRing(2, 3, slots=2)
+    ring.push(image(1))
+    latest = np.empty((2, 3, 4), dtype=np.uint8)
+    first = np.empty((2, 3, 4), dtype=np.uint8)
+
+    assert ring.latest(latest) is latest
+    assert ring.get(1, first) is first
+
+    view = ring.get(1)
+
+    for frame_number in range(2, 4):
+        ring.push(image(frame_number))
+
+    np.testing.assert_array_equal(latest, 1)
+    np.testing.assert_array_equal(first, 1)
+    np.testing.assert_array_equal(view, 3)
@@ -0,0 +1,135 @@
+import pytest
+
+import standin
+import util.catalog
+import util.map
+
+import os
+
+
+@pytest.fixture
+def client():
+    return standin.Client(standin.World(collisions=True))
+
+
+def test_catalog_measures_every_vehicle(client, tmp_path):
+    filename = str(tmp_path/'catalog.json')
+    catalog = util.catalog.build_catalog(client, filename)
+
+    assert sorted(catalog['vehicles']) == [
+        'vehicle.audi.tt',
+        'vehicle.lincoln.mkz2017',
+        'vehicle.toyota.prius'
+    ]
+    assert util.catalog.load_catalog(filename, 'standin') == catalog
+
+
+def test_partial_catalog_is_not_written(client, tmp_path):
+    world = client.world
+    blueprint = world.get_blueprint_library().find('vehicle.audi.tt')
+
+    # Every spawn point is taken, so no vehicle can be measured
+    for transform in util.map.get_map(world).get_spawn_points():
+        world.add(blueprint, transform)
+
+    filename = str(tmp_path/'catalog.json')
+
+    with pytest.raises(RuntimeError, match='Unable to spawn 3 vehicles'):
+        util.catalog.build_catalog(client, filename)
+
+    assert not os.path.exists(filename)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(util.catalog, '_catalogs', {})
+    monkeypatch.setattr(util.catalog, '_selections', {})
+
+
+def test_select_blueprints_by_size(client, tmp_path, session):
+    filename = str(tmp_path/'catalog.json')
+    util.catalog.build_catalog(client, filename)
+
+    blueprints = util.catalog.select_blueprints(
+        client.world,
+        'vehicle.audi.*',
+        {'length': [3.0, 5.0]},
+        filename
+    )
+
+    assert [blueprint.id for blueprint in blueprints] == ['vehicle.audi.tt']
+
+    with pytest.raises(ValueError, match=r'vehicle\.audi\.\* with size'):
+        util.catalog.select_blueprints(
+            client.world,
+            'vehicle.audi.*',
+            {'length': [5.0, None]},
+            filename
+        )
+
+
+def test_size_without_catalog_raises(client, tmp_path, session):
+    filename = str(tmp_path/'missing.json')
+
+    assert len(util.catalog.select_blueprints(
+        client.world,
+        'vehicle.*',
+        filename=filename
+    )) == 3
+
+    with pytest.raises(FileNotFoundError, match='vehicle_info.py'):
+        util.catalog.select_blueprints(
+            client.world,
+            'vehicle.*',
+            {'length': [4.0, None]},
+            filename
+        )
+
+
+def test_catalog_built_later_is_used(client, tmp_path, session):
+    filename = str(tmp_path/'catalog.json')
+    size = {'length': [3.0, 5.0]}
+
+    with pytest.raises(FileNotFoundError):
+        util.catalog.select_blueprints(
+            client.world,
+            'vehicle.*',
+            size,
+            filename
+        )
+
+    util.catalog.build_catalog(client, filename)
+    blueprints = util.catalog.select_blueprints(
+        client.world,
+        'vehicle.*',
+        size,
+        filename
+    )
+
+    assert [blueprint.id for blueprint in blueprints] == [
+        'vehicle.audi.tt',
+        'vehicle.lincoln.mkz2017',
+        'vehicle.toyota.prius'
+    ]
+
+
+def test_vehicles_missing_from_the_world_are_left_out(tmp_path, session):
+    filename = str(tmp_path/'catalog.json')
+    util.catalog.build_catalog(
+        standin.Client(standin.World(collisions=True)),
+        filename
+    )
+    world = standin.World(blueprints=('vehicle.audi.tt', 'vehicle.bmw.isetta'))
+    size = {'length': [3.0, 5.0]}
+
+    blueprints = util.catalog.select_blueprints(
+        world,
+        'vehicle.*',
+        size,
+        filename
+    )
+
+    assert [blueprint.id for blueprint in blueprints] == ['vehicle.audi.tt']
+
+    with pytest.raises(ValueError, match='rebuild it'):
+        util.catalog.select_blueprints(world, 'vehicle.t*', size, filename)
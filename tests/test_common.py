@@ -0,0 +1,73 @@
+import ast_test
+import util.common
+
+import pytest
+
+
+# Time spent working in each tick, the second one longer than the timestep
+WORK = [0.03, 0.15, 0.02, 0.05]
+
+
+class FakeTime:
+    '''
+    A monotonic clock advanced by the work of each tick and by sleeps.
+    '''
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(util.common.time, 'monotonic', fake.monotonic)
+    monkeypatch.setattr(util.common.time, 'sleep', fake.sleep)
+
+    return fake
+
+
+@pytest.mark.parametrize('mode', ast_test.REPLAY_MODES)
+def test_replay_clock_sleeps(fake_time, mode):
+    # As visualize_actors and replay_as_vehicles create their clocks
+    clock = util.common.ReplayClock(0.1, mode == 'realtime')
+
+    for work in WORK:
+        fake_time.now += work
+        clock.tick()
+
+    assert clock.ticks == len(WORK)
+    assert clock.sim_time() == pytest.approx(0.4)
+
+    if mode == 'realtime':
+        # The late tick is not slept for and the next one catches up
+        assert fake_time.sleeps == pytest.approx([0.07, 0.03, 0.05])
+        assert clock.wall_time() == pytest.approx(0.4)
+        assert clock.ratio() == pytest.approx(1.0)
+    else:
+        assert fake_time.sleeps == []
+        assert clock.wall_time() == pytest.approx(sum(WORK))
+        assert clock.ratio() == pytest.approx(0.4/sum(WORK))
+
+
+def test_replay_clock_restarts(fake_time):
+    clock = util.common.ReplayClock(0.1)
+    fake_time.now += 5.0
+    clock.start()
+    clock.tick()
+
+    assert clock.ticks == 1
+    assert fake_time.sleeps == pytest.approx([0.1])
+
+
+def test_replay_clock_ratio_without_wall_time(fake_time):
+    clock = util.common.ReplayClock(0.1, realtime=False)
+    clock.tick()
+
+    assert clock.ratio() == float('inf')
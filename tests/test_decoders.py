@@ -0,0 +1,90 @@
+import sensors.decoders
+
+import numpy as np
+
+
+def bgra(pixels):
+    '''
+    Returns a (1, n, 4) BGRA frame of a list of (r, g, b) pixels.
+    '''
+    frame = np.full((1, len(pixels), 4), 255, dtype=np.uint8)
+    frame[0, :, 2::-1] = pixels
+
+    return frame
+
+
+def test_depth_is_r_plus_g_times_256_plus_b_times_65536():
+    pixels = [
+        (0, 0, 0),
+        (1, 0, 0),
+        (0, 1, 0),
+        (0, 0, 1),
+        (12, 34, 56),
+        (255, 255, 255)
+    ]
+    codes = np.array([r + g*256 + b*65536 for r, g, b in pixels])
+
+    depth = sensors.decoders.decode_depth(bgra(pixels))
+
+    assert depth.dtype == np.float32
+    np.testing.assert_allclose(
+        depth[0],
+        codes*1000.0/(256.0**3 - 1.0),
+        rtol=1e-6
+    )
+    assert depth[0, -1] == np.float32(1000.0)
+
+
+def test_depth_is_written_to_out():
+    frame = bgra([(1, 2, 3)]*4).reshape(2, 2, 4)
+    out = np.empty((2, 2), dtype=np.float32)
+
+    assert sensors.decoders.decode_depth(frame, out) is out
+    np.testing.assert_allclose(out, (1 + 2*256 + 3*65536)*1000.0/(256**3 - 1))
+
+
+def test_segmentation_is_the_red_channel():
+    frame = bgra([(4, 9, 9), (10, 0, 0), (7, 1, 2)])
+    out = np.empty((1, 3), dtype=np.uint8)
+
+    np.testing.assert_array_equal(
+        sensors.decoders.decode_segmentation(frame),
+        [[4, 10, 7]]
+    )
+    assert sensors.decoders.decode_segmentation(frame, out) is out
+    np.testing.assert_array_equal(out, [[4, 10, 7]])
+
+
+def test_palette_view_colors_the_classes():
+    class_ids = np.array([[4, 10, 200]], dtype=np.uint8)
+
+    np.testing.assert_array_equal(
+        sensors.decoders.palette_view(class_ids),
+        [[[220, 20, 60], [0, 0, 142], [0, 0, 0]]]
+    )
+
+
+def test_log_depth_view_matches_the_converter_constants():
+    # Gray levels of 0, 1/4, 3/4 and 1 of 1 + log(depth/1000)/5.70378
+    depth = np.array(
+        [[
+            1000.0*np.exp(-5.70378),
+            1000.0*np.exp(-0.75*5.70378),
+            1000.0*np.exp(-0.25*5.70378),
+            1000.0
+        ]],
+        dtype=np.float32
+    )
+
+    np.testing.assert_array_equal(
+        sensors.decoders.log_depth_view(depth),
+        [[0, 64, 191, 255]]
+    )
+
+
+def test_log_depth_view_clips_close_and_far_pixels():
+    depth = np.array([[0.0, 1.0, 2000.0]], dtype=np.float32)
+    out = np.empty((1, 3), dtype=np.uint8)
+
+    assert sensors.decoders.log_depth_view(depth, out) is out
+    np.testing.assert_array_equal(out, [[0, 0, 255]])
@@ -0,0 +1,157 @@
+import sensors.episode
+
+import numpy as np
+import pytest
+
+import os
+
+
+def frame(frame_number, shape=(2, 3, 4)):
+    return np.random.default_rng(frame_number).integers(
+        0,
+        256,
+        size=shape,
+        dtype=np.uint8
+    )
+
+
+def record(writer, name, frame_numbers):
+    for frame_number in frame_numbers:
+        writer.append(
+            name,
+            frame_number,
+            0.05*frame_number,
+            frame(frame_number)
+        )
+
+
+def check(reader, name, frame_numbers):
+    assert reader.frame_numbers(name) == list(frame_numbers)
+
+    # Out of order reads go across chunks
+    for frame_number in sorted(frame_numbers, key=lambda n: (n % 3, n)):
+        timestamp, array = reader.read(name, frame_number)
+
+        assert timestamp == 0.05*frame_number
+        np.testing.assert_array_equal(array, frame(frame_number))
+
+
+def test_failed_chunks_do_not_stop_the_writer(tmp_path):
+    writer = sensors.episode.EpisodeWriter(
+        str(tmp_path),
+        chunk_frames=1,
+        max_queue=1
+    )
+    writer.add_sensor('rgb', (2, 2, 4))
+    write_chunk = writer._write_chunk
+    failures = []
+
+    def fail_once(sensor, pending):
+        if not failures:
+            failures.append(pending[0][0])
+            raise KeyError('rgb')
+
+        write_chunk(sensor, pending)
+
+    writer._write_chunk = fail_once
+
+    # More chunks than the queue holds, so a dead thread would block here
+    for frame_number in range(4):
+        writer.append(
+            'rgb',
+            frame_number,
+            0.1*frame_number,
+            np.full((2, 2, 4), frame_number, dtype=np.uint8)
+        )
+
+    writer.close()
+
+    assert writer.errors == 1
+    assert len(sensors.episode.EpisodeReader(str(tmp_path))) == 3
+
+
+def test_export_png(tmp_path):
+    directory = str(tmp_path/'episode')
+
+    with sensors.episode.EpisodeWriter(directory, chunk_frames=2) as writer:
+        writer.add_sensor('rgb', (2, 3, 4))
+        record(writer, 'rgb', range(3))
+
+    reader = sensors.episode.EpisodeReader(directory)
+    path = str(tmp_path/'rgb_%06d')
+
+    assert reader.export_png('rgb', path) == 3
+    assert all(
+        os.path.exists(path % frame_number + '.png')
+        for frame_number in range(3)
+    )
+
+
+@pytest.mark.parametrize('compression', sensors.episode.COMPRESSIONS)
+def test_frames_round_trip(tmp_path, compression):
+    directory = str(tmp_path/'episode')
+
+    with sensors.episode.EpisodeWriter(
+        directory,
+        chunk_frames=4,
+        compression=compression
+    ) as writer:
+        writer.add_sensor('rgb', (2, 3, 4))
+        writer.add_sensor('depth', (2, 3, 4))
+        record(writer, 'rgb', range(10))
+        record(writer, 'depth', range(0, 10, 2))
+
+    reader = sensors.episode.EpisodeReader(directory)
+
+    assert len(reader) == 15
+    check(reader, 'rgb', range(10))
+    check(reader, 'depth', range(0, 10, 2))
+
+    with pytest.raises(KeyError, match='Frame 1 not recorded by depth'):
+        reader.read('depth', 1)
+
+
+def test_frames_are_read_while_recording(tmp_path):
+    directory = str(tmp_path/'episode')
+    writer = sensors.episode.EpisodeWriter(directory, chunk_frames=4)
+    writer.add_sensor('rgb', (2, 3, 4))
+    record(writer, 'rgb', range(6))
+    writer.flush()
+    reader = sensors.episode.EpisodeReader(directory)
+
+    check(reader, 'rgb', range(6))
+
+    record(writer, 'rgb', range(6, 9))
+    writer.flush()
+
+    assert reader.frame_numbers('rgb') == list(range(6))
+
+    reader.refresh()
+    check(reader, 'rgb', range(9))
+    writer.close()
+
+
+def test_reopened_episode_is_appended_to(tmp_path):
+    directory = str(tmp_path/'episode')
+
+    with sensors.episode.EpisodeWriter(
+        directory,
+        chunk_frames=3,
+        compression=None
+    ) as writer:
+        writer.add_sensor('rgb', (2, 3, 4))
+        record(writer, 'rgb', range(5))
+
+    # The sensor keeps its original compression
+    with sensors.episode.EpisodeWriter(directory, chunk_frames=2) as writer:
+        writer.add_sensor('rgb', (2, 3, 4))
+        record(writer, 'rgb', range(5, 8))
+
+    with sensors.episode.EpisodeWriter(directory) as writer:
+        with pytest.raises(ValueError, match='already recorded with shape'):
+            writer.add_sensor('rgb', (3, 3, 4))
+
+    reader = sensors.episode.EpisodeReader(directory)
+
+    assert reader.sensors['rgb']['compression'] is None
+    check(reader, 'rgb', range(8))
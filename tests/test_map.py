@@ -0,0 +1,42 @@
+import standin
+import util.map
+
+import numpy as np
+
+import types
+
+
+def location(x, y, z=0.0):
+    return types.SimpleNamespace(x=x, y=y, z=z)
+
+
+def test_index_finds_the_map_waypoints():
+    world = standin.World()
+    carla_map = util.map.get_map(world)
+    rng = np.random.default_rng(0)
+    locations = [
+        location(*point) for point in rng.uniform(0.0, 400.0, size=(5, 2))
+    ]
+
+    waypoints = util.map.get_waypoints(world, locations)
+
+    # The stand-in map looks waypoints up among those spaced 2 m apart
+    for point, waypoint in zip(locations, waypoints):
+        assert (
+            waypoint.transform.location ==
+            carla_map.get_waypoint(point).transform.location
+        )
+
+
+def test_index_is_built_once_per_world():
+    world = standin.World()
+    index = util.map.get_waypoint_index(world)
+    calls = world.calls
+
+    assert util.map.get_waypoint_index(world) is index
+    assert index.get_waypoint(location(1.0, 1.0)) is not None
+    assert world.calls == calls
+
+    util.map.invalidate(world)
+
+    assert util.map.get_waypoint_index(world) is not index
@@ -0,0 +1,102 @@
+import standin
+import util.recorder
+
+import pytest
+
+import threading
+
+
+def test_tick_timeout_stops_the_recording(capsys):
+    client = standin.Client()
+    world = client.world
+    ticks = iter(range(3))
+
+    def wait_for_tick(seconds=10.0):
+        if next(ticks, None) is None:
+            raise RuntimeError('time-out while waiting for the simulator')
+
+        world.tick()
+        return world.get_snapshot()
+
+    world.wait_for_tick = wait_for_tick
+    session = util.recorder.RecorderSession(
+        client,
+        world,
+        'Test01.log',
+        max_ticks=10,
+        on_tick=False
+    )
+
+    assert session.run(timeout=0.1) == ['Test01.log']
+    assert session.ticks == 3
+    assert 'No tick received' in capsys.readouterr().out
+    assert client.recording is None
+
+
+def test_segments_follow_the_ticks():
+    client = standin.Client()
+    world = client.world
+
+    def wait_for_tick(seconds=10.0):
+        world.tick()
+        return world.get_snapshot()
+
+    world.wait_for_tick = wait_for_tick
+    session = util.recorder.RecorderSession(
+        client,
+        world,
+        'Test01.log',
+        max_ticks=10,
+        segment_ticks=4,
+        on_tick=False
+    )
+
+    assert session.run() == [
+        'Test01_000.log',
+        'Test01_001.log',
+        'Test01_002.log'
+    ]
+    assert session.ticks == 10
+
+
+def test_tick_callback_is_removed():
+    client = standin.Client()
+    world = client.world
+    session = util.recorder.RecorderSession(
+        client,
+        world,
+        'Test01.log',
+        max_ticks=5
+    )
+    recorder = threading.Thread(target=session.run)
+    recorder.start()
+
+    # Tick once the session listens, until it has recorded enough
+    while recorder.is_alive():
+        if world.callbacks:
+            world.tick()
+
+    assert session.ticks >= 5
+    assert not world.callbacks
+
+
+def test_tick_callback_is_removed_when_the_recorder_fails():
+    client = standin.Client()
+    world = client.world
+
+    def start_recorder(filename):
+        raise RuntimeError('unable to open ' + filename)
+
+    client.start_recorder = start_recorder
+    session = util.recorder.RecorderSession(
+        client,
+        world,
+        'Test01.log',
+        max_ticks=5
+    )
+
+    with pytest.raises(RuntimeError, match='unable to open Test01.log'):
+        session.run()
+
+    assert not world.callbacks
+    assert not session.active
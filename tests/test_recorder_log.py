@@ -0,0 +1,145 @@
+import recorder_logs
+import util.recorder_log
+
+import numpy as np
+import pytest
+
+import os
+
+
+FRAMES = 250
+ACTORS = 4
+
+
+@pytest.fixture
+def recording(tmp_path):
+    filename = str(tmp_path/'recording.log')
+    locations = recorder_logs.write_synthetic_log(
+        filename,
+        FRAMES,
+        ACTORS
+    )
+
+    return (filename, locations)
+
+
+def test_scan_indexes_frames_and_events(recording):
+    filename, locations = recording
+    index = util.recorder_log.scan(filename)
+
+    assert index['header']['map'] == 'Town03'
+    assert len(index['offsets']) == FRAMES
+    assert np.all(np.diff(index['offsets']) > 0)
+    np.testing.assert_array_equal(index['frame_ids'], np.arange(1, FRAMES + 1))
+    np.testing.assert_allclose(index['elapsed'], np.arange(FRAMES)*0.05)
+
+    np.testing.assert_array_equal(index['spawns']['id'], np.arange(1, 5))
+    assert np.all(index['spawns']['frame'] == 0)
+    assert list(index['type_ids']) == ['vehicle.audi.tt']*ACTORS
+    assert index['attributes'] == [{'color': '0,0,0'}]*ACTORS
+
+    np.testing.assert_array_equal(index['destroys']['id'], np.arange(1, 5))
+    assert np.all(index['destroys']['frame'] == FRAMES - 1)
+
+    np.testing.assert_array_equal(index['collisions']['frame'], [99, 199])
+    assert np.all(index['collisions']['actor1'] == 1)
+    assert np.all(index['collisions']['actor2'] == 2)
+
+
+def test_index_is_reused(recording, monkeypatch):
+    filename, locations = recording
+    log = util.recorder_log.RecorderLog(filename)
+
+    assert os.path.exists(util.recorder_log.index_path(filename))
+
+    def scan(filename):
+        raise AssertionError('The log was scanned again')
+
+    monkeypatch.setattr(util.recorder_log, 'scan', scan)
+    cached = util.recorder_log.RecorderLog(filename)
+
+    assert len(cached) == len(log)
+    assert cached.header == log.header
+    assert cached.attributes == log.attributes
+    np.testing.assert_array_equal(cached.offsets, log.offsets)
+    np.testing.assert_array_equal(cached.spawns, log.spawns)
+    np.testing.assert_array_equal(cached.collisions, log.collisions)
+
+
+def test_index_is_invalidated(recording):
+    filename, locations = recording
+    util.recorder_log.RecorderLog(filename)
+
+    recorder_logs.write_synthetic_log(filename, 120, ACTORS, seed=1)
+
+    assert util.recorder_log.read_index(filename) is None
+    assert len(util.recorder_log.RecorderLog(filename)) == 120
+    assert util.recorder_log.read_index(filename) is not None
+
+    # Same size, newer modification time
+    status = os.stat(filename)
+    os.utime(filename, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+
+    assert util.recorder_log.read_index(filename) is None
+
+
+def test_frame_at(recording):
+    log = util.recorder_log.RecorderLog(recording[0])
+
+    assert log.frame_at(-1.0) == 0
+    assert log.frame_at(0.0) == 0
+    assert log.frame_at(0.07) == 1
+    assert log.frame_at(0.1) == 2
+    assert log.frame_at(1e6) == FRAMES - 1
+
+
+def test_read_frame(recording):
+    filename, locations = recording
+    log = util.recorder_log.RecorderLog(filename)
+
+    for frame in [0, 1, 137, FRAMES - 1]:
+        positions = log.read_frame(frame)
+
+        np.testing.assert_array_equal(positions['id'], np.arange(1, 5))
+        np.testing.assert_array_equal(positions['location'], locations[frame])
+
+    assert len(log.read_frame(FRAMES)) == 0
+
+
+def test_tracks(recording):
+    filename, locations = recording
+    log = util.recorder_log.RecorderLog(filename)
+    tracks = log.tracks([1, 3])
+
+    assert sorted(tracks) == [1, 3]
+
+    for actor_id, track in tracks.items():
+        assert track.shape == (FRAMES, 7)
+        np.testing.assert_allclose(track[:, 0], log.elapsed)
+        np.testing.assert_allclose(
+            track[:, 1:4],
+            locations[:, actor_id - 1]*util.recorder_log.LOCATION_SCALE,
+            rtol=1e-6
+        )
+
+    window = log.tracks(start=10, stop=20)
+
+    assert sorted(window) == [1, 2, 3, 4]
+    np.testing.assert_allclose(window[2][:, 0], log.elapsed[10:20])
+    assert log.tracks(start=FRAMES) == {}
+
+
+def test_find_collisions(tmp_path, recording):
+    other = str(tmp_path/'other.log')
+    recorder_logs.write_synthetic_log(other, 150, 2, seed=2)
+    filenames = [recording[0], other]
+
+    found = util.recorder_log.find_collisions(filenames, 'vehicle.*')
+
+    assert [(name, frame) for name, frame, *rest in found] == [
+        (recording[0], 99),
+        (recording[0], 199),
+        (other, 99)
+    ]
+    assert found[0][2:] == (4.95, 1, 2, 'vehicle.audi.tt', 'vehicle.audi.tt')
+    assert util.recorder_log.find_collisions(filenames, 'walker.*') == []
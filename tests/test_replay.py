@@ -0,0 +1,144 @@
+import carla
+import pytest
+
+import ast_test
+import run_scenarios
+import standin
+
+import numpy as np
+
+
+KINDS = ['car', 'ped', 'car', 'ped']
+
+
+def actor_data(steps=40, seed=0):
+    rng = np.random.default_rng(seed)
+    states = np.cumsum(rng.normal(size=(len(KINDS), steps, 6)), axis=1)
+    states[[0, 2], :, 4:] = 0.0
+
+    return {
+        'kinds': KINDS,
+        'names': ['{}_{}'.format(kind, i) for i, kind in enumerate(KINDS)],
+        'noise': [kind == 'ped' for kind in KINDS],
+        'states': states
+    }
+
+
+def spawn(world):
+    library = world.get_blueprint_library()
+    blueprints = {
+        'car': library.find('vehicle.audi.tt'),
+        'ped': library.find('walker.pedestrian.0001')
+    }
+
+    return [
+        world.spawn_actor(blueprints[kind], carla.Transform())
+        for kind in KINDS
+    ]
+
+
+def replay(client, chunks, batched=True):
+    world = client.get_world()
+    actors = spawn(world)
+    ticks = ast_test.replay_actors(
+        world,
+        actors,
+        chunks,
+        np.array(ast_test.ORIGIN),
+        with_noise=False,
+        client=client if batched else None
+    )
+
+    return (world, actors, ticks)
+
+
+def final_state(actor):
+    transform = actor.get_transform()
+    state = [
+        transform.location.x,
+        transform.location.y,
+        transform.location.z,
+        transform.rotation.yaw
+    ]
+
+    if actor.type_id.startswith('walker'):
+        control = actor.get_control()
+        state += [
+            control.direction.x,
+            control.direction.y,
+            control.direction.z,
+            control.speed
+        ]
+
+    return state
+
+
+@pytest.fixture
+def chunks():
+    data = ast_test.interpolate_actors(actor_data(), 0.1, 0.05)
+
+    # Replay the steps in two chunks
+    return [
+        dict(data, states=data['states'][:, :30]),
+        dict(data, states=data['states'][:, 30:])
+    ]
+
+
+def test_one_batch_per_tick(chunks):
+    client = standin.Client()
+    batches = []
+    apply_batch_sync = client.apply_batch_sync
+
+    def count(commands, *args, **kwargs):
+        batches.append(commands)
+        return apply_batch_sync(commands, *args, **kwargs)
+
+    client.apply_batch_sync = count
+    world, actors, ticks = replay(client, chunks)
+    steps = sum(chunk['states'].shape[1] for chunk in chunks)
+
+    assert ticks == steps
+    assert world.frame == steps
+    assert len(batches) == steps
+    # A transform for every actor and a control for every walker
+    assert all(len(commands) == 6 for commands in batches)
+
+
+def test_batches_match_per_actor_updates(chunks):
+    batched_world, batched, _ = replay(standin.Client(), chunks)
+    direct_world, direct, _ = replay(
+        standin.Client(),
+        chunks,
+        batched=False
+    )
+
+    # The per-actor path calls set_transform and apply_control directly
+    assert direct_world.calls > batched_world.calls
+
+    for batched_actor, direct_actor in zip(batched, direct):
+        assert final_state(batched_actor) == pytest.approx(
+            final_state(direct_actor)
+        )
+
+
+def test_actors_that_failed_to_spawn_are_skipped():
+    commands = ast_test.build_tick_commands(
+        [1, None, 3],
+        [[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [2.0, 2.0, 2.0]],
+        [0.0, 90.0, 180.0],
+        [None, 3],
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+        [1.5, 2.5]
+    )
+
+    assert [command.actor_id for command in commands] == [1, 3, 3]
+
+
+@pytest.mark.parametrize('replay', ['vehicle_and_walker', 'actors'])
+def test_lazy_loaders_check_the_trajectory(write_trajectory, replay):
+    filename = write_trajectory(steps=1)
+    manifest = run_scenarios.create_manifest(replay=replay)
+
+    # The checks must run in the loader, not on the first replayed chunk
+    with pytest.raises(ValueError, match='two samples'):
+        run_scenarios.load_scenario(filename, manifest)
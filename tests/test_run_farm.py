@@ -0,0 +1,86 @@
+import pytest
+
+import run_farm
+import run_scenarios
+import standin
+
+import functools
+
+
+ENDPOINTS = [('127.0.0.1', 2000), ('127.0.0.1', 2001), ('127.0.0.1', 2002)]
+
+
+def create_unreachable_client(host, port, timeout, map_name):
+    '''
+    Connects to stand-in servers, except to the one on port 2001, which
+    does not answer.
+    '''
+    if port == 2001:
+        raise RuntimeError('time-out while waiting for the simulator')
+
+    return standin.create_client(host, port, timeout, map_name)
+
+
+@pytest.fixture
+def filenames(write_trajectory):
+    return [write_trajectory('scenario_{}.csv'.format(i)) for i in range(8)]
+
+
+@pytest.fixture
+def manifest():
+    return run_scenarios.create_manifest(new_dt=0.1)
+
+
+def test_results_follow_the_files(filenames, manifest):
+    results = run_farm.run_farm(
+        ENDPOINTS[:2],
+        filenames,
+        manifest,
+        create_client=standin.create_client
+    )
+
+    assert [result['file'] for result in results] == filenames
+    assert all(not result['error'] for result in results)
+    assert all(result['ticks'] == 29 for result in results)
+    assert all(result['end'] >= result['start'] for result in results)
+
+
+def test_files_are_spread_over_the_endpoints(filenames, manifest):
+    results = run_farm.run_farm(
+        ENDPOINTS[:2],
+        filenames,
+        manifest,
+        batch_size=1,
+        create_client=functools.partial(standin.create_client, latency=0.001)
+    )
+    endpoints = [result['endpoint'] for result in results]
+
+    assert set(endpoints) == {'127.0.0.1:2000', '127.0.0.1:2001'}
+    assert all(endpoints.count(endpoint) >= 2 for endpoint in set(endpoints))
+
+
+def test_unreachable_endpoint_is_left_out(filenames, manifest, capsys):
+    results = run_farm.run_farm(
+        ENDPOINTS,
+        filenames,
+        manifest,
+        create_client=create_unreachable_client
+    )
+
+    assert 'Endpoint 127.0.0.1:2001 is unreachable' in capsys.readouterr().out
+    assert all(not result['error'] for result in results)
+    assert all(result['endpoint'] != '127.0.0.1:2001' for result in results)
+    assert [result['file'] for result in results] == filenames
+
+
+def test_no_reachable_endpoint(filenames, manifest):
+    results = run_farm.run_farm(
+        ENDPOINTS[1:2],
+        filenames,
+        manifest,
+        create_client=create_unreachable_client
+    )
+
+    assert all(
+        result['error'] == 'No reachable endpoint' for result in results
+    )
@@ -0,0 +1,554 @@
+import util.trajectory
+
+import numpy as np
+import pandas
+import pytest
+from scipy import interpolate
+
+import os
+
+
+COLUMNS = ['time', 'x_ped', 'y_ped', 'v_x_ped', 'v_y_ped']
+NAMES = COLUMNS[1:]
+
+
+def table(rows):
+    return np.array(rows, dtype=np.float64)
+
+
+def test_actor_samples_drop_missing_and_duplicate_rows():
+    times, states = util.trajectory.actor_samples(
+        table([
+            [0.2, 2.0, 2.0, 2.0, 2.0],
+            [0.0, 0.0, 0.0, 0.0, 0.0],
+            [0.1, np.nan, 1.0, 1.0, 1.0],
+            [0.2, 3.0, 3.0, 3.0, 3.0]
+        ]),
+        COLUMNS,
+        NAMES,
+        'time'
+    )
+
+    np.testing.assert_array_equal(times, [0.0, 0.2])
+    np.testing.assert_array_equal(states[:, 0], [0.0, 3.0])
+
+
+@pytest.mark.parametrize('rows', [
+    [[0.0, np.nan, 0.0, 0.0, 0.0], [0.1, np.nan, 1.0, 1.0, 1.0]],
+    [[0.0, 0.0, 0.0, 0.0, 0.0], [0.1, np.nan, 1.0, 1.0, 1.0]],
+    [[0.0, 0.0, 0.0, 0.0, 0.0], [0.0, 1.0, 1.0, 1.0, 1.0]]
+])
+def test_actor_samples_need_two_valid_samples(rows):
+    with pytest.raises(ValueError, match='Actor ped_0 has [01] valid'):
+        util.trajectory.actor_samples(
+            table(rows),
+            COLUMNS,
+            NAMES,
+            'time',
+            actor='ped_0'
+        )
+
+
+def resample_whole(arrays, orig_step, new_step):
+    t, new_t = util.trajectory.resample_times(
+        len(arrays[0]),
+        orig_step,
+        new_step
+    )
+    index, weight = util.trajectory.resample_weights(t, new_t)
+
+    return util.trajectory.resample(
+        util.trajectory.stack_states(arrays),
+        index,
+        weight
+    )
+
+
+@pytest.mark.parametrize('orig_step, new_step', [
+    (0.1, 1.0/60.0),
+    (0.1, 0.025),
+    (0.1, 0.03),
+    (0.05, 1.0/30.0)
+])
+@pytest.mark.parametrize('chunk_rows', [1, 2, 7, 64])
+def test_resample_chunks_match_whole_file(orig_step, new_step, chunk_rows):
+    rng = np.random.default_rng(0)
+
+    for length in range(2, 120):
+        car = rng.normal(size=(length, 4))
+        ped = rng.normal(size=(length, 6))
+        expected = resample_whole([car, ped], orig_step, new_step)
+
+        chunks = list(util.trajectory.resample_chunks(
+            (
+                {'car': car[row:row + chunk_rows],
+                 'ped': ped[row:row + chunk_rows]}
+                for row in range(0, length, chunk_rows)
+            ),
+            orig_step,
+            new_step
+        ))
+
+        for key, actor in (('car', 0), ('ped', 1)):
+            np.testing.assert_allclose(
+                np.concatenate([chunk[key] for chunk in chunks]),
+                expected[actor],
+                atol=1e-9,
+                err_msg='{} rows'.format(length)
+            )
+
+
+@pytest.fixture
+def trajectory():
+    states = np.arange(2*10*6, dtype=np.float64).reshape(2, 10, 6)
+
+    return util.trajectory.Trajectory(states, 0.1)
+
+
+@pytest.mark.parametrize('orig_step, new_step', [
+    (0.1, 1.0/60.0),
+    (0.1, 0.025),
+    (0.1, 0.03),
+    (0.05, 1.0/30.0),
+    (0.2, 0.07)
+])
+@pytest.mark.parametrize('rate', [0.5, 1.0, 1.5, 3.0])
+def test_trajectory_sample_times_match_resample_times(
+    orig_step,
+    new_step,
+    rate
+):
+    for length in range(2, 600):
+        states = np.zeros((1, length, 6))
+        trajectory = util.trajectory.Trajectory(states, orig_step)
+        t, new_t = util.trajectory.resample_times(
+            length,
+            orig_step,
+            new_step*rate
+        )
+
+        np.testing.assert_array_equal(
+            trajectory.sample_times(new_step, rate=rate),
+            new_t,
+            err_msg='{} samples'.format(length)
+        )
+
+
+@pytest.mark.parametrize('new_step', [1.0/60.0, 0.025, 0.03])
+def test_trajectory_chunks_match_resample(new_step):
+    rng = np.random.default_rng(0)
+
+    for length in range(2, 120):
+        trajectory = util.trajectory.Trajectory(
+            rng.normal(size=(2, length, 6)),
+            0.1
+        )
+        t, new_t = util.trajectory.resample_times(length, 0.1, new_step)
+        index, weight = util.trajectory.resample_weights(t, new_t)
+        expected = util.trajectory.resample(trajectory.states, index, weight)
+
+        chunks = list(trajectory.chunks(new_step, chunk_steps=7))
+
+        assert all(chunk.shape[1] <= 7 for chunk in chunks)
+        np.testing.assert_allclose(
+            np.concatenate(chunks, axis=1),
+            expected,
+            err_msg='{} samples'.format(length)
+        )
+
+
+def test_trajectory_sample_times_match_irregular_resample_times():
+    rng = np.random.default_rng(0)
+
+    for length in range(2, 200):
+        times = np.cumsum(rng.uniform(0.05, 0.15, size=length))
+        trajectory = util.trajectory.Trajectory(
+            np.zeros((1, length, 6)),
+            times=times
+        )
+        t, new_t = util.trajectory.resample_times(
+            length,
+            new_step=1.0/60.0,
+            times=times
+        )
+
+        np.testing.assert_array_equal(trajectory.sample_times(1.0/60.0), new_t)
+
+
+def test_trajectory_replays_backwards(trajectory):
+    forwards = trajectory.evaluate(trajectory.sample_times(0.05))
+    backwards = np.concatenate(
+        list(trajectory.chunks(0.05, rate=-1.0)),
+        axis=1
+    )
+
+    np.testing.assert_allclose(backwards[:, 1:], forwards[:, :0:-1])
+
+
+def test_trajectory_seek_is_clamped(trajectory):
+    states = trajectory.states
+
+    np.testing.assert_array_equal(trajectory.seek(-1.0), states[:, 0])
+    np.testing.assert_array_equal(trajectory.seek(5.0), states[:, -1])
+    np.testing.assert_allclose(
+        trajectory.advance(-0.05),
+        (states[:, -1] + states[:, -2])/2.0
+    )
+
+
+@pytest.mark.parametrize('new_step, rate', [(0.05, 0.0), (0.0, 1.0)])
+def test_trajectory_rejects_a_zero_step(trajectory, new_step, rate):
+    with pytest.raises(ValueError, match='must not be zero'):
+        trajectory.sample_times(new_step, rate=rate)
+
+    with pytest.raises(ValueError, match='must not be zero'):
+        trajectory.chunks(new_step, rate=rate)
+
+
+def test_non_numeric_columns_are_ignored(tmp_path):
+    filename = str(tmp_path/'labelled.csv')
+
+    with open(filename, 'w') as f:
+        f.write('step,label,x_car,y_car,v_x_car,v_y_car,stamp\n')
+        f.write('0,start,0.0,1.0,2.0,3.0,2019-06-06 10:00:00\n')
+        f.write('1,end,4.0,5.0,6.0,7.0,2019-06-06 10:00:01\n')
+
+    for cache in [True, False, True]:
+        table, columns = util.trajectory.load_table(
+            filename,
+            'step',
+            cache=cache
+        )
+
+        assert columns == util.trajectory.CAR_COLUMNS
+        np.testing.assert_array_equal(table, [[0, 1, 2, 3], [4, 5, 6, 7]])
+
+
+def test_actors_of_the_fixture_are_discovered(write_trajectory):
+    table, columns = util.trajectory.read_csv_table(
+        write_trajectory(),
+        'step'
+    )
+
+    assert table.shape == (30, 10)
+    assert util.trajectory.discover_actors(columns) == [
+        ('car', 0, util.trajectory.CAR_COLUMNS),
+        ('ped', 0, util.trajectory.PED_COLUMNS)
+    ]
+
+
+def test_many_actors_are_discovered():
+    columns = [
+        'x_ped_2', 'y_ped_2', 'v_x_ped_2', 'v_y_ped_2',
+        'x_car_1', 'y_car_1', 'v_x_car_1', 'v_y_car_1',
+        'noise_x_car_1', 'noise_y_car_1',
+        'x_car', 'y_car', 'v_x_car', 'v_y_car',
+        'x_ped_0', 'y_ped_0', 'v_x_ped_0', 'v_y_ped_0',
+        'noise_x_0', 'noise_y_0',
+        # Incomplete actors and unrelated columns are left out
+        'x_ped_3', 'y_ped_3', 'v_x_ped_3',
+        'noise_x_2',
+        'reward', 'x_cars'
+    ]
+
+    assert util.trajectory.discover_actors(columns) == [
+        ('car', 0, ['x_car', 'y_car', 'v_x_car', 'v_y_car']),
+        ('car', 1, [
+            'x_car_1', 'y_car_1', 'v_x_car_1', 'v_y_car_1',
+            'noise_x_car_1', 'noise_y_car_1'
+        ]),
+        ('ped', 0, [
+            'x_ped_0', 'y_ped_0', 'v_x_ped_0', 'v_y_ped_0',
+            'noise_x_0', 'noise_y_0'
+        ]),
+        ('ped', 2, ['x_ped_2', 'y_ped_2', 'v_x_ped_2', 'v_y_ped_2'])
+    ]
+
+
+def test_non_numeric_fixture_columns_are_dropped(write_trajectory):
+    filename = write_trajectory()
+    df = pandas.read_csv(filename)
+    df.insert(1, 'Label', ['step {}'.format(i) for i in range(len(df))])
+    df['Done (flag)'] = df['step'] == len(df) - 1
+    df.to_csv(filename, index=False)
+
+    table, columns = util.trajectory.read_csv_table(filename, 'step')
+
+    assert columns == (
+        util.trajectory.CAR_COLUMNS +
+        util.trajectory.PED_COLUMNS +
+        ['done_flag']
+    )
+    np.testing.assert_allclose(
+        table[:, :-1],
+        df[util.trajectory.CAR_COLUMNS + util.trajectory.PED_COLUMNS]
+    )
+    np.testing.assert_array_equal(table[-2:, -1], [0.0, 1.0])
+
+
+def load(filename, index_column='step'):
+    return util.trajectory.load_table(filename, index_column)
+
+
+def cached(filename, index_column='step'):
+    return util.trajectory.read_cache(filename, index_column) is not None
+
+
+def test_cache_is_written_and_memory_mapped(write_trajectory):
+    filename = write_trajectory()
+    table, columns = load(filename)
+
+    assert not isinstance(table, np.memmap)
+    assert all(os.path.exists(path) for path in (
+        util.trajectory.cache_paths(filename)
+    ))
+
+    cached_table, cached_columns = load(filename)
+
+    assert isinstance(cached_table, np.memmap)
+    assert cached_columns == columns
+    np.testing.assert_array_equal(cached_table, table)
+
+
+def test_changed_csv_rebuilds_the_cache(write_trajectory):
+    filename = write_trajectory()
+    table, columns = load(filename)
+
+    # Same size, different content and a later modification time
+    with open(filename) as f:
+        text = f.read()
+
+    lines = text.splitlines(True)
+    fields = lines[1].split(',')
+    fields[1] = fields[1][:-1] + ('2' if fields[1].endswith('1') else '1')
+    lines[1] = ','.join(fields)
+
+    with open(filename, 'w') as f:
+        f.write(''.join(lines))
+
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert not cached(filename)
+
+    reloaded, _ = load(filename)
+
+    assert not isinstance(reloaded, np.memmap)
+    assert reloaded[0, 0] != table[0, 0]
+    assert isinstance(load(filename)[0], np.memmap)
+
+
+def test_touched_csv_keeps_the_cache(write_trajectory):
+    filename = write_trajectory()
+    table, _ = load(filename)
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    reloaded, _ = load(filename)
+
+    assert isinstance(reloaded, np.memmap)
+    np.testing.assert_array_equal(reloaded, table)
+
+
+def test_cache_of_another_index_column_is_not_reused(write_trajectory):
+    filename = write_trajectory()
+    load(filename)
+
+    assert not cached(filename, 'x_car')
+
+    table, columns = load(filename, 'x_car')
+
+    assert 'x_car' not in columns
+    assert 'step' in columns
+    assert not isinstance(table, np.memmap)
+
+
+def test_time_column_reads_match_the_csv(tmp_path):
+    filename = str(tmp_path/'timed.csv')
+    pandas.DataFrame({
+        'step': np.arange(4),
+        'time': [0.0, 0.1, 0.25, 0.4],
+        'x_ped': [0.0, 1.0, 2.0, 3.0],
+        'y_ped': [0.0, 1.0, 2.0, 3.0],
+        'v_x_ped': [0.0, 1.0, 2.0, 3.0],
+        'v_y_ped': [0.0, 1.0, 2.0, 3.0]
+    }).to_csv(filename, index=False)
+
+    expected = util.trajectory.actor_samples(
+        *util.trajectory.load_table(filename, 'step', cache=False),
+        NAMES,
+        'time'
+    )
+
+    for _ in range(2):
+        times, states = util.trajectory.actor_samples(
+            *load(filename),
+            NAMES,
+            'time'
+        )
+
+        np.testing.assert_array_equal(times, expected[0])
+        np.testing.assert_array_equal(states, expected[1])
+
+    assert cached(filename)
+
+
+@pytest.mark.parametrize('damage', ['corrupt', 'truncate'])
+def test_damaged_cache_falls_back_to_the_csv(write_trajectory, damage):
+    filename = write_trajectory()
+    table, columns = load(filename)
+    table_path = util.trajectory.cache_paths(filename)[0]
+
+    if damage == 'corrupt':
+        with open(table_path, 'wb') as f:
+            f.write(b'not a numpy file')
+    else:
+        with open(table_path, 'r+b') as f:
+            f.truncate(os.path.getsize(table_path)//2)
+
+    assert not cached(filename)
+
+    reloaded, reloaded_columns = load(filename)
+
+    assert reloaded_columns == columns
+    np.testing.assert_array_equal(reloaded, table)
+    assert isinstance(load(filename)[0], np.memmap)
+
+
+def legacy_interpolate(data, t, new_t):
+    '''
+    The original interpolation of a single actor, with one interp1d per
+    group of columns, holding the first and last states outside of t.
+    '''
+    pos = data[:, 0:2].transpose()
+    vel = data[:, 2:4].transpose()
+
+    if data.shape[1] == 6:
+        err = data[:, 4:6].transpose()
+    else:
+        err = np.full(pos.shape, 0.0)
+
+    def hold(values):
+        return interpolate.interp1d(
+            t,
+            values,
+            bounds_error=False,
+            fill_value=(values[:, 0], values[:, -1])
+        )
+
+    new_data = np.concatenate(
+        (hold(pos)(new_t), hold(vel)(new_t), hold(err)(new_t))
+    )
+
+    return new_data.transpose()
+
+
+@pytest.mark.parametrize('length', [2, 3, 17, 250])
+@pytest.mark.parametrize('new_step', [1.0/60.0, 0.05, 0.3])
+def test_resample_matches_interp1d(length, new_step):
+    rng = np.random.default_rng(length)
+    car = rng.normal(size=(length, 4))
+    ped = rng.normal(size=(length, 6))
+    t, new_t = util.trajectory.resample_times(length, 0.1, new_step)
+    index, weight = util.trajectory.resample_weights(t, new_t)
+
+    resampled = util.trajectory.resample(
+        util.trajectory.stack_states([car, ped]),
+        index,
+        weight
+    )
+
+    np.testing.assert_allclose(
+        resampled[0],
+        legacy_interpolate(car, t, new_t),
+        atol=1e-12
+    )
+    np.testing.assert_allclose(
+        resampled[1],
+        legacy_interpolate(ped, t, new_t),
+        atol=1e-12
+    )
+
+
+def test_uneven_clocks_match_interp1d():
+    rng = np.random.default_rng(0)
+    clocks = [
+        np.cumsum(rng.uniform(0.05, 0.15, size=40)),
+        0.3 + np.cumsum(rng.uniform(0.1, 0.3, size=15))
+    ]
+    arrays = [
+        rng.normal(size=(len(clocks[0]), 4)),
+        rng.normal(size=(len(clocks[1]), 6))
+    ]
+
+    clock, states = util.trajectory.align_clocks(clocks, arrays)
+
+    for actor, (times, values) in enumerate(zip(clocks, arrays)):
+        np.testing.assert_allclose(
+            states[actor],
+            legacy_interpolate(values, times, clock),
+            atol=1e-12
+        )
+
+    t, new_t = util.trajectory.resample_times(
+        len(clock),
+        new_step=1.0/60.0,
+        times=clock
+    )
+    index, weight = util.trajectory.resample_weights(t, new_t)
+
+    np.testing.assert_allclose(
+        util.trajectory.resample(states, index, weight)[1],
+        legacy_interpolate(arrays[1], clocks[1], new_t),
+        atol=1e-12
+    )
+
+
+def test_one_sample_actors_cannot_be_resampled():
+    # interp1d returns NaN for a single sample, the resampler refuses it
+    data = np.zeros((1, 6))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        legacy = legacy_interpolate(data, np.zeros(1), np.zeros(1))
+
+    assert np.isnan(legacy).all()
+
+    with pytest.raises(ValueError, match='At least two samples'):
+        util.trajectory.resample_weights(np.zeros(1), np.zeros(1))
+
+    with pytest.raises(ValueError, match='At least two samples'):
+        util.trajectory.align_clocks(
+            [np.arange(3)*0.1, np.zeros(1)],
+            [np.zeros((3, 6)), data]
+        )
+
+    with pytest.raises(ValueError, match='At least two samples'):
+        util.trajectory.Trajectory(data[np.newaxis])
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 5, 16])
+def test_resample_chunks_match_interp1d_across_boundaries(chunk_rows):
+    rng = np.random.default_rng(chunk_rows)
+    length = 3*chunk_rows + 1
+    car = rng.normal(size=(length, 4))
+    ped = rng.normal(size=(length, 6))
+    t, new_t = util.trajectory.resample_times(length, 0.1, 0.03)
+
+    chunks = list(util.trajectory.resample_chunks(
+        (
+            {'car': car[row:row + chunk_rows],
+             'ped': ped[row:row + chunk_rows]}
+            for row in range(0, length, chunk_rows)
+        ),
+        0.1,
+        0.03
+    ))
+
+    assert len(chunks) > 1
+
+    for key, values in (('car', car), ('ped', ped)):
+        np.testing.assert_allclose(
+            np.concatenate([chunk[key] for chunk in chunks]),
+            legacy_interpolate(values, t, new_t),
+            atol=1e-12
+        )
@@ -0,0 +1,185 @@
+import carla
+import pytest
+
+import standin
+import util.map
+import util.world
+
+import numpy as np
+
+
+def spawn(world, x, y):
+    return world.spawn_actor(
+        world.get_blueprint_library().find('vehicle.audi.tt'),
+        carla.Transform(carla.Location(x, y, 0.0))
+    )
+
+
+def test_actors_missing_from_the_snapshot_are_located():
+    world = standin.World()
+    first = spawn(world, 1.0, 2.0)
+    snapshot = world.get_snapshot()
+    second = spawn(world, 3.0, 4.0)
+
+    locations = util.world.actor_locations(world, [first, second], snapshot)
+
+    np.testing.assert_array_equal(locations, [[1, 2, 0], [3, 4, 0]])
+
+
+def test_remove_distant_actors_in_one_batch():
+    client = standin.Client()
+    world = client.get_world()
+    near = spawn(world, 1.0, 0.0)
+    far = spawn(world, 500.0, 0.0)
+    calls = world.calls
+
+    removed = util.world.remove_distant_actors(
+        world,
+        carla.Location(0.0, 0.0, 0.0),
+        100.0,
+        client=client
+    )
+
+    assert removed == [far.id]
+    assert list(world.actors) == [near.id]
+    # The actor list, the snapshot and the destroy batch
+    assert world.calls - calls == 3
+
+
+
+def test_worlds_without_snapshots_are_rejected():
+    world = standin.World()
+    spawn(world, 1.0, 2.0)
+
+    # A world of Carla 0.9.5, without get_snapshot
+    class OldWorld:
+        def get_actors(self):
+            return world.get_actors()
+
+    with pytest.raises(RuntimeError, match='get_snapshot'):
+        util.world.actor_locations(OldWorld(), world.get_actors())
+
+
+@pytest.mark.parametrize('centers, distances, expected', [
+    ([(0.0, 0.0, 0.0)], 5.0, [True, True, False, False]),
+    ([(0.0, 0.0, 0.0)], [3.0], [True, False, False, False]),
+    ([(0.0, 0.0, 0.0), (100.0, 0.0, 0.0)], 25.0, [True, True, True, False]),
+    (
+        [(0.0, 0.0, 0.0), (100.0, 0.0, 0.0)],
+        [1.0, 30.0],
+        [True, False, True, False]
+    ),
+    ([(200.0, 0.0, 0.0)], 1.0, [False, False, False, False])
+])
+def test_in_range_mask(centers, distances, expected):
+    locations = [
+        (1.0, 0.0, 0.0),
+        (0.0, 4.0, 3.0),
+        (80.0, 0.0, 0.0),
+        (50.0, 50.0, 0.0)
+    ]
+
+    np.testing.assert_array_equal(
+        util.world.in_range_mask(locations, centers, distances),
+        expected
+    )
+
+
+def test_in_range_mask_includes_the_boundary():
+    assert util.world.in_range_mask([(3.0, 4.0, 0.0)], [(0.0, 0.0, 0.0)], 5.0)
+
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_remove_actors_outside_every_area(batched):
+    client = standin.Client()
+    world = client.get_world()
+    actors = [
+        spawn(world, x, y)
+        for x, y in [(1.0, 0.0), (40.0, 0.0), (95.0, 0.0), (300.0, 0.0)]
+    ]
+    walker = world.spawn_actor(
+        world.get_blueprint_library().find('walker.pedestrian.0001'),
+        carla.Transform(carla.Location(300.0, 0.0, 0.0))
+    )
+
+    removed = util.world.remove_distant_actors(
+        world,
+        [carla.Location(0.0, 0.0, 0.0), carla.Location(100.0, 0.0, 0.0)],
+        [10.0, 20.0],
+        client=client if batched else None
+    )
+
+    assert removed == [actors[1].id, actors[3].id]
+    assert sorted(world.actors) == sorted(
+        [actors[0].id, actors[2].id, walker.id]
+    )
+
+@pytest.mark.parametrize('refill', [False, True])
+def test_failed_spawns_are_retried_at_spare_points(refill):
+    client = standin.Client(standin.World(collisions=True))
+    world = client.world
+    blueprint = world.get_blueprint_library().find('vehicle.audi.tt')
+    points = util.map.get_map(world).get_spawn_points()[:10]
+
+    # The first three spawn points are taken
+    for transform in points[:3]:
+        world.add(blueprint, transform)
+
+    actor_ids, failures = util.world.spawn_actors(
+        world,
+        client,
+        world.get_blueprint_library().filter('vehicle.*'),
+        spawn_points=points,
+        count=6,
+        refill=refill
+    )
+
+    assert [transform for transform, error in failures] == points[:3]
+    assert all('collision' in error for transform, error in failures)
+    assert len(actor_ids) == (6 if refill else 3)
+    assert len(set(actor_ids)) == len(actor_ids)
+
+    locations = [
+        (world.actors[actor_id].transform.location.x,
+         world.actors[actor_id].transform.location.y)
+        for actor_id in actor_ids
+    ]
+    expected = [
+        (transform.location.x, transform.location.y)
+        for transform in points[3:6 + (3 if refill else 0)]
+    ]
+
+    assert sorted(locations) == sorted(expected)
+    assert all(world.actors[actor_id].autopilot for actor_id in actor_ids)
+
+
+@pytest.mark.parametrize('refill', [False, True])
+def test_actors_without_spawn_points_are_failures(refill):
+    client = standin.Client(standin.World(collisions=True))
+    world = client.world
+    blueprint = world.get_blueprint_library().find('vehicle.audi.tt')
+    points = util.map.get_map(world).get_spawn_points()
+    world.add(blueprint, points[0])
+
+    actor_ids, failures = util.world.spawn_actors(
+        world,
+        client,
+        world.get_blueprint_library().filter('vehicle.*'),
+        spawn_points=points[:5],
+        count=len(points) + 3,
+        refill=refill
+    )
+    missing = [error for transform, error in failures if transform is None]
+
+    if refill:
+        # Every other map point is used, and the taken one cannot be retried
+        assert len(actor_ids) == len(points) - 1
+        assert len(missing) == 4
+    else:
+        assert len(actor_ids) == 4
+        assert len(missing) == len(points) - 2
+
+    assert set(missing) == {'No spawn point left'}
+    assert len(actor_ids) + len(missing) + (0 if refill else 1) == (
+        len(points) + 3
+    )
@@ -0,0 +1,90 @@
+import sensors.writer
+
+import numpy as np
+
+import os
+import threading
+
+
+def frame(value=0):
+    return np.full((2, 3, 4), value, dtype=np.uint8)
+
+
+def test_failed_frames_do_not_stop_the_workers(tmp_path):
+    writer = sensors.writer.FrameWriter(workers=1, max_queue=1)
+
+    # A frame that cannot be encoded, then more frames than the queue holds
+    writer.put(str(tmp_path/'bad.png'), np.zeros(3, dtype=np.uint8))
+
+    for i in range(4):
+        writer.put(str(tmp_path/'{}.png'.format(i)), frame(i))
+
+    writer.close()
+    stats = writer.stats()
+
+    assert stats['errors'] == 1
+    assert stats['written'] == 4
+    assert sorted(os.listdir(str(tmp_path))) == [
+        '{}.png'.format(i) for i in range(4)
+    ]
+
+
+def flood_and_close(writer, directory):
+    '''
+    Puts frames from several threads while the writer is closed, and
+    returns the number of frames that were queued.
+    '''
+    stop = threading.Event()
+    queued = []
+
+    def flood():
+        count = 0
+
+        while not stop.is_set():
+            count += writer.put(str(directory/'frame.png'), frame())
+
+        queued.append(count)
+
+    threads = [threading.Thread(target=flood) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    closer = threading.Thread(target=writer.close)
+    closer.start()
+    closer.join(timeout=10.0)
+    stop.set()
+
+    for thread in threads:
+        thread.join(timeout=10.0)
+
+    assert not closer.is_alive()
+    assert not any(thread.is_alive() for thread in threads)
+    assert not writer.put(str(directory/'late.png'), frame())
+
+    return sum(queued)
+
+
+def test_drop_oldest_keeps_the_stop_sentinels(tmp_path):
+    writer = sensors.writer.FrameWriter(
+        workers=2,
+        max_queue=2,
+        policy='drop_oldest'
+    )
+
+    flood_and_close(writer, tmp_path)
+
+
+def test_blocked_frames_are_written_before_close(tmp_path):
+    writer = sensors.writer.FrameWriter(
+        workers=2,
+        max_queue=2,
+        policy='block'
+    )
+
+    queued = flood_and_close(writer, tmp_path)
+    stats = writer.stats()
+
+    assert queued > 0
+    assert stats['written'] == queued
+    assert stats['received'] == queued + stats['dropped']
@@ -1,3 +1,5 @@
+import util.map
+
 import carla
 
 import math
@@ -105,9 +107,13 @@ def print_info(actor):
     print("   Velocity:", actor.get_velocity())
     print("   Acceleration:", actor.get_acceleration())
     print("   Bounding box:", actor.bounding_box)
+    # The map's own projection onto the lane, not the nearest waypoint of
+    # util.map.WaypointIndex, so the road, lane and s are exact
     print(
         "   Waypoint:",
-        actor.get_world().get_map().get_waypoint(actor.get_location())
+        util.map.get_map(actor.get_world()).get_waypoint(
+            actor.get_location()
+        )
     )
 
 
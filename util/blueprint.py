@@ -0,0 +1,135 @@
+import fnmatch
+
+
+# Blueprint caches of the current session, keyed by world (episode) id
+_caches = {}
+
+
+class BlueprintCache:
+    '''
+    A local copy of a Carla world's blueprint library with lookup indexes.
+
+    The library is fetched from the server once; lookups by type id are
+    dictionary accesses and the result of each wildcard pattern is
+    computed once and reused.
+
+    Note that the blueprints are shared between lookups, so callers must
+    set every attribute they rely on before spawning, as the helpers of
+    this project already do.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose blueprint library is cached.
+    '''
+    def __init__(self, world):
+        self.world_id = getattr(world, 'id', None)
+        self.library = list(world.get_blueprint_library())
+        self.by_id = {blueprint.id: blueprint for blueprint in self.library}
+        self.patterns = {}
+
+    def filter(self, pattern):
+        '''
+        Returns the blueprints whose id or one of whose tags matches the
+        wildcard pattern, like carla.BlueprintLibrary.filter.
+        '''
+        if pattern not in self.patterns:
+            self.patterns[pattern] = [
+                blueprint
+                for blueprint in self.library
+                if fnmatch.fnmatchcase(blueprint.id, pattern) or
+                any(
+                    fnmatch.fnmatchcase(tag, pattern)
+                    for tag in blueprint.tags
+                )
+            ]
+
+        return self.patterns[pattern]
+
+    def find(self, type_id):
+        '''
+        Returns the blueprint with the given type id, like
+        carla.BlueprintLibrary.find.
+        '''
+        try:
+            return self.by_id[type_id]
+        except KeyError:
+            raise IndexError('Blueprint not found: ' + type_id)
+
+
+def get_cache(world):
+    '''
+    Returns the blueprint cache of a world, fetching the blueprint library
+    only the first time the world (or a new episode, after a map change) is
+    seen.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose blueprints are looked up.
+
+    Returns
+    -------
+    BlueprintCache
+        The cache of the world's blueprint library.
+    '''
+    world_id = getattr(world, 'id', None)
+    cache = _caches.get(world_id)
+
+    if cache is None:
+        cache = BlueprintCache(world)
+        _caches[world_id] = cache
+
+    return cache
+
+
+def filter(world, pattern):
+    '''
+    Returns the blueprints of a world matching a wildcard pattern, using
+    the session's blueprint cache.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose blueprints are looked up.
+    pattern : str
+        The wildcard pattern matched against blueprint ids and tags, e.g.
+        'vehicle.lincoln.*'.
+
+    Returns
+    -------
+    list of carla.ActorBlueprint
+        The matching blueprints.
+    '''
+    return get_cache(world).filter(pattern)
+
+
+def find(world, type_id):
+    '''
+    Returns the blueprint of a world with the given type id, using the
+    session's blueprint cache.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose blueprints are looked up.
+    type_id : str
+        The id of the blueprint, e.g. 'sensor.camera.rgb'.
+
+    Returns
+    -------
+    carla.ActorBlueprint
+        The blueprint with that id.
+    '''
+    return get_cache(world).find(type_id)
+
+
+def invalidate(world=None):
+    '''
+    Drops the cached blueprints of a world, or of every world if none is
+    given. Needed only when the library changes without a new episode.
+    '''
+    if world is None:
+        _caches.clear()
+    else:
+        _caches.pop(getattr(world, 'id', None), None)
@@ -0,0 +1,421 @@
+import util.blueprint
+import util.client
+import util.map
+
+import carla
+
+import csv
+import fnmatch
+import json
+import os
+
+
+# The default catalog file, as written by vehicle_info.py
+CATALOG_FILE = 'vehicle_catalog.json'
+
+# The dimensions a blueprint selection can be constrained on
+DIMENSIONS = ['length', 'width', 'height']
+
+# Catalogs and blueprint selections of the current session
+_catalogs = {}
+_selections = {}
+
+CATALOG_FIELDS = [
+    'type_id',
+    'version',
+    'length',
+    'width',
+    'height',
+    'extent_x',
+    'extent_y',
+    'extent_z',
+    'center_x',
+    'center_y',
+    'center_z'
+]
+
+
+def server_version(client):
+    '''
+    Returns the version of the simulator the client is connected to.
+    '''
+    if hasattr(client, 'get_server_version'):
+        return client.get_server_version()
+
+    return 'unknown'
+
+
+def measure_vehicles(client, world, blueprints, verbose=False):
+    '''
+    Measures the bounding boxes of vehicle blueprints by spawning them.
+
+    The blueprints are spawned in batches, one per spawn point of the map
+    so they cannot collide with each other, their bounding boxes are read
+    from one get_actors call per batch and they are destroyed in one more
+    batch. Blueprints whose spawn failed are retried in the next batch, at
+    other spawn points.
+
+    Parameters
+    ----------
+    client : carla.Client
+        The Carla client used to apply the command batches.
+    world : carla.World
+        The Carla world in which to spawn the vehicles.
+    blueprints : list of carla.ActorBlueprint
+        The vehicle blueprints to measure.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    dict
+        The carla.BoundingBox of every blueprint, by type id.
+
+    Raises
+    ------
+    RuntimeError
+        If some blueprints cannot be spawned at any spawn point, so that
+        an incomplete catalog is never written.
+    '''
+    spawn_points = util.map.get_map(world).get_spawn_points()
+
+    if not spawn_points:
+        raise RuntimeError('The map has no spawn points to measure vehicles')
+
+    pending = list(blueprints)
+    boxes = {}
+    start = 0
+
+    while pending:
+        batch = pending[:len(spawn_points)]
+        pending = pending[len(spawn_points):]
+        points = spawn_points[start:] + spawn_points[:start]
+        start = (start + len(batch)) % len(spawn_points)
+        responses = util.client.apply_batch(
+            client,
+            [
+                carla.command.SpawnActor(blueprint, transform)
+                for blueprint, transform in zip(batch, points)
+            ],
+            verbose
+        )
+        spawned = [
+            response.actor_id
+            for response in responses
+            if not response.has_error()
+        ]
+        failed = [
+            blueprint
+            for blueprint, response in zip(batch, responses)
+            if response.has_error()
+        ]
+
+        for vehicle in world.get_actors(spawned):
+            boxes[vehicle.type_id] = vehicle.bounding_box
+
+        util.client.apply_batch(
+            client,
+            [carla.command.DestroyActor(actor_id) for actor_id in spawned],
+            verbose
+        )
+
+        if verbose:
+            print('Measured', len(spawned), 'of', len(batch), 'vehicles')
+
+        if failed and not spawned:
+            raise RuntimeError(
+                'Unable to spawn {} vehicles: {}'.format(
+                    len(failed),
+                    [blueprint.id for blueprint in failed]
+                )
+            )
+
+        pending.extend(failed)
+
+    return boxes
+
+
+def create_catalog(boxes, version):
+    '''
+    Creates the dimension catalog of measured bounding boxes.
+
+    Returns
+    -------
+    dict
+        The catalog: the simulator version and, by type id, the length,
+        width and height of every vehicle, in meters, with the extent and
+        center of its bounding box.
+    '''
+    vehicles = {}
+
+    for type_id in sorted(boxes):
+        box = boxes[type_id]
+        vehicles[type_id] = {
+            'length': 2.0*box.extent.x,
+            'width': 2.0*box.extent.y,
+            'height': 2.0*box.extent.z,
+            'extent': [box.extent.x, box.extent.y, box.extent.z],
+            'center': [box.location.x, box.location.y, box.location.z]
+        }
+
+    return {'version': version, 'vehicles': vehicles}
+
+
+def write_catalog(catalog, filename):
+    '''
+    Writes a catalog as JSON, and as CSV next to it with one row per
+    vehicle keyed by type id and simulator version.
+    '''
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(catalog, f, indent=4, sort_keys=True)
+
+    os.replace(filename + '.tmp', filename)
+
+    with open(os.path.splitext(filename)[0] + '.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CATALOG_FIELDS)
+
+        for type_id, vehicle in sorted(catalog['vehicles'].items()):
+            writer.writerow(
+                [type_id, catalog['version']] +
+                [vehicle[key] for key in ['length', 'width', 'height']] +
+                vehicle['extent'] +
+                vehicle['center']
+            )
+
+
+def load_catalog(filename, version=None, type_ids=None):
+    '''
+    Loads a catalog if it is current.
+
+    Parameters
+    ----------
+    filename : str
+        The JSON catalog file.
+    version : str, optional
+        The simulator version the catalog must have been built with.
+    type_ids : list of str, optional
+        The type ids the catalog must contain.
+
+    Returns
+    -------
+    dict
+        The catalog, or None if it is missing or not current.
+    '''
+    try:
+        with open(filename) as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if version is not None and catalog.get('version') != version:
+        return None
+
+    if type_ids is not None and set(type_ids) - set(catalog['vehicles']):
+        return None
+
+    return catalog
+
+
+def build_catalog(client, filename, pattern='vehicle.*', verbose=False):
+    '''
+    Builds the vehicle dimension catalog of the simulator, unless a current
+    one already exists.
+
+    Parameters
+    ----------
+    client : carla.Client
+        The Carla client connected to the server.
+    filename : str
+        The JSON catalog file; the CSV file is written next to it.
+    pattern : str, optional
+        The pattern of the blueprints to measure.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    dict
+        The catalog, as returned by create_catalog.
+    '''
+    world = client.get_world()
+    version = server_version(client)
+    blueprints = util.blueprint.filter(world, pattern)
+    catalog = load_catalog(
+        filename,
+        version,
+        [blueprint.id for blueprint in blueprints]
+    )
+
+    if catalog is not None:
+        if verbose:
+            print('Catalog', filename, 'is current for version', version)
+
+        return catalog
+
+    catalog = create_catalog(
+        measure_vehicles(client, world, blueprints, verbose),
+        version
+    )
+    write_catalog(catalog, filename)
+
+    return catalog
+
+
+def get_catalog(filename=CATALOG_FILE):
+    '''
+    Returns a catalog file, loading it only the first time it is found in
+    the session. Returns None if the file does not exist (yet), so a
+    catalog built later in the session, e.g. by vehicle_info.py, is used.
+    '''
+    if filename not in _catalogs:
+        catalog = load_catalog(filename)
+
+        if catalog is None:
+            return None
+
+        _catalogs[filename] = catalog
+
+    return _catalogs[filename]
+
+
+def matches(vehicle, size):
+    '''
+    Checks if the dimensions of a catalog vehicle are within size, a dict of
+    [minimum, maximum] bounds, in meters, by dimension. A missing dimension
+    or a None bound is not constrained.
+    '''
+    for dimension, (minimum, maximum) in size.items():
+        if dimension not in DIMENSIONS:
+            raise ValueError(
+                'Unknown dimension {}, options: {}'.format(
+                    dimension,
+                    DIMENSIONS
+                )
+            )
+
+        value = vehicle[dimension]
+
+        if (
+            (minimum is not None and value < minimum) or
+            (maximum is not None and value > maximum)
+        ):
+            return False
+
+    return True
+
+
+def select_type_ids(pattern, size, filename=CATALOG_FILE):
+    '''
+    Returns the type ids of the catalog matching a pattern and a size.
+
+    The selection of every pattern and size is computed once per session,
+    so later selections are a dictionary lookup and need no server call.
+
+    Parameters
+    ----------
+    pattern : str
+        The wildcard pattern of the type ids, e.g. 'vehicle.lincoln.*'.
+    size : dict
+        The [minimum, maximum] bounds, in meters, of the length, width or
+        height of the vehicles.
+    filename : str, optional
+        The catalog file.
+
+    Returns
+    -------
+    list of str
+        The matching type ids.
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no catalog, so a size is never silently ignored.
+    ValueError
+        If the catalog has no vehicle matching the pattern and size.
+    '''
+    key = (
+        filename,
+        pattern,
+        tuple(sorted((name, tuple(bounds)) for name, bounds in size.items()))
+    )
+
+    if key not in _selections:
+        catalog = get_catalog(filename)
+
+        if catalog is None:
+            raise FileNotFoundError(
+                'No vehicle catalog {} to select vehicles by size, build it '
+                'with vehicle_info.py'.format(filename)
+            )
+
+        _selections[key] = [
+            type_id
+            for type_id, vehicle in sorted(catalog['vehicles'].items())
+            if fnmatch.fnmatchcase(type_id, pattern) and
+            matches(vehicle, size)
+        ]
+
+    if _selections[key] == []:
+        raise ValueError(
+            'No vehicle of catalog {} matches {} with size {}'.format(
+                filename,
+                pattern,
+                size
+            )
+        )
+
+    return _selections[key]
+
+
+def select_blueprints(world, pattern, size=None, filename=CATALOG_FILE):
+    '''
+    Returns the blueprints of a world matching a pattern and, using the
+    catalog, a size, without spawning anything.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose blueprints are looked up.
+    pattern : str
+        The wildcard pattern of the blueprints, e.g. 'vehicle.lincoln.*'.
+    size : dict, optional
+        The [minimum, maximum] bounds, in meters, of the length, width or
+        height of the vehicles, e.g. {'length': [4.5, 5.0]}.
+    filename : str, optional
+        The catalog file.
+
+    Returns
+    -------
+    list of carla.ActorBlueprint
+        The matching blueprints. Without a size, all the blueprints
+        matching the pattern. Catalog vehicles the world has no blueprint
+        of, e.g. from a catalog built with another simulator version, are
+        left out.
+
+    Raises
+    ------
+    FileNotFoundError
+        If a size is given and there is no catalog.
+    ValueError
+        If no vehicle of the catalog matching the pattern and size has a
+        blueprint in the world.
+    '''
+    blueprints = util.blueprint.filter(world, pattern)
+
+    if not size:
+        return blueprints
+
+    type_ids = select_type_ids(pattern, size, filename)
+    available = {blueprint.id: blueprint for blueprint in blueprints}
+    blueprints = [
+        available[type_id] for type_id in type_ids if type_id in available
+    ]
+
+    if not blueprints:
+        raise ValueError(
+            'No blueprint of the world matches the vehicles {} of catalog '
+            '{}, rebuild it with vehicle_info.py'.format(type_ids, filename)
+        )
+
+    return blueprints
@@ -1,3 +1,6 @@
+import util.blueprint
+import util.map
+
 import carla
 
 
@@ -28,9 +31,65 @@ def create(
     '''
     client = carla.Client(host, port)
     client.set_timeout(timeout)
+    load_map(client, map_name)
+
+    return client
+
+
+def load_map(client, map_name):
+    '''
+    Loads a map in the server's world unless it is already loaded.
+
+    Parameters
+    ----------
+    client : carla.Client
+        The Carla client connected to the server.
+    map_name : str
+        The name of the Carla map the world should load.
+
+    Returns
+    -------
+    carla.World
+        The world with the requested map loaded.
+    '''
     world = client.get_world()
 
-    if world.get_map().name != map_name:
+    if util.map.get_map(world).name != map_name:
         client.load_world(map_name)
+        world = client.get_world()
+        util.blueprint.invalidate()
+        util.map.invalidate()
 
-    return client
+    return world
+
+
+def apply_batch(client, commands, verbose=False):
+    '''
+    Applies a list of Carla commands in a single round trip to the server.
+
+    Parameters
+    ----------
+    client : carla.Client
+        The Carla client connected to the server.
+    commands : list of carla.command
+        The commands to apply, in order.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    list of carla.command.Response
+        The response of each command, in order.
+    '''
+    responses = client.apply_batch_sync(commands)
+
+    if verbose:
+        for command, response in zip(commands, responses):
+            if response.has_error():
+                print(
+                    'Command', type(command).__name__,
+                    'failed for actor', response.actor_id,
+                    ':', response.error
+                )
+
+    return responses
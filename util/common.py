@@ -34,3 +34,73 @@ def sleep_random_time(start=2.0, end=6.0, verbose=False):
         print('Sleeping for', sleep_time, 'seconds.')
 
     time.sleep(sleep_time)
+
+
+class ReplayClock:
+    '''
+    Paces a tick loop and measures its simulation to wall time ratio.
+
+    In real-time mode every tick is scheduled against a monotonic clock at
+    start + ticks*timestep, so sleeping only for the remaining time of each
+    tick compensates for the time spent working and does not accumulate
+    drift. Otherwise ticks are not paced at all.
+
+    Parameters
+    ----------
+    timestep : float
+        The simulation time, in seconds, of each tick.
+    realtime : bool, optional
+        Whether the ticks should be paced to the wall clock.
+    '''
+    def __init__(self, timestep, realtime=True):
+        self.timestep = timestep
+        self.realtime = realtime
+        self.start()
+
+    def start(self):
+        '''
+        Restarts the clock with no elapsed ticks.
+        '''
+        self.start_time = time.monotonic()
+        self.ticks = 0
+
+    def tick(self):
+        '''
+        Counts one tick and, in real-time mode, sleeps until it is due.
+        '''
+        self.ticks += 1
+
+        if self.realtime:
+            due = self.start_time + self.ticks*self.timestep
+            delay = due - time.monotonic()
+
+            if delay > 0.0:
+                time.sleep(delay)
+
+    def sim_time(self):
+        return self.ticks*self.timestep
+
+    def wall_time(self):
+        return time.monotonic() - self.start_time
+
+    def ratio(self):
+        '''
+        Returns the simulation time elapsed per second of wall time.
+        '''
+        wall_time = self.wall_time()
+
+        if wall_time <= 0.0:
+            return float('inf')
+
+        return self.sim_time()/wall_time
+
+    def report(self):
+        print(
+            'Replayed {} ticks ({:.2f} s of simulation) in {:.2f} s: '
+            '{:.2f}x real time'.format(
+                self.ticks,
+                self.sim_time(),
+                self.wall_time(),
+                self.ratio()
+            )
+        )
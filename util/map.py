@@ -0,0 +1,168 @@
+import numpy as np
+from scipy import spatial
+
+
+# Maps and waypoint indexes of the current session, keyed by world
+# (episode) id
+_maps = {}
+_indexes = {}
+
+
+class WaypointIndex:
+    '''
+    A local spatial index over the waypoints of a Carla map.
+
+    The waypoints are generated once at a fixed spacing and their
+    locations are stored in a KD-tree, so nearest-waypoint queries for
+    many locations at once are vectorized lookups instead of server or
+    per-location calls. The returned waypoint is the nearest generated
+    one, i.e. within about half the spacing of the exact lane center.
+
+    Parameters
+    ----------
+    carla_map : carla.Map
+        The Carla map whose waypoints are indexed.
+    distance : float, optional
+        The spacing, in meters, of the generated waypoints.
+    '''
+    def __init__(self, carla_map, distance=2.0):
+        self.distance = distance
+        self.waypoints = carla_map.generate_waypoints(distance)
+        self.locations = locations_to_array(
+            [waypoint.transform.location for waypoint in self.waypoints]
+        )
+        self.tree = spatial.cKDTree(self.locations)
+
+    def __len__(self):
+        return len(self.waypoints)
+
+    def nearest(self, locations):
+        '''
+        Finds the nearest waypoint of several locations at once.
+
+        Parameters
+        ----------
+        locations : numpy.ndarray
+            The (n, 3) x, y, z world-frame locations to look up.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            The distance to, and the index in self.waypoints of, the
+            nearest waypoint of every location.
+        '''
+        return self.tree.query(np.asarray(locations, dtype=np.float64))
+
+    def get_waypoint(self, location):
+        '''
+        Returns the nearest waypoint of a single carla.Location.
+        '''
+        distance, index = self.nearest([[location.x, location.y, location.z]])
+        return self.waypoints[index[0]]
+
+
+def get_waypoints(world, locations, distance=2.0):
+    '''
+    Returns the nearest waypoint of every location, using the session's
+    waypoint index of the world's map.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose map is looked up.
+    locations : list of carla.Location or numpy.ndarray
+        The locations, or their (n, 3) x, y, z coordinates.
+    distance : float, optional
+        The spacing, in meters, of the indexed waypoints.
+
+    Returns
+    -------
+    list of carla.Waypoint
+        The nearest waypoint of every location, in order.
+    '''
+    index = get_waypoint_index(world, distance)
+
+    if not isinstance(locations, np.ndarray):
+        locations = locations_to_array(locations)
+
+    distances, indices = index.nearest(locations)
+
+    return [index.waypoints[i] for i in indices]
+
+
+def locations_to_array(locations):
+    '''
+    Converts a list of carla.Location to a (n, 3) numpy array.
+    '''
+    return np.array(
+        [[location.x, location.y, location.z] for location in locations],
+        dtype=np.float64
+    ).reshape(-1, 3)
+
+
+def get_map(world):
+    '''
+    Returns the map of a world, fetching it from the server only the first
+    time the world (or a new episode, after a map change) is seen.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose map is needed.
+
+    Returns
+    -------
+    carla.Map
+        The map of the world.
+    '''
+    world_id = getattr(world, 'id', None)
+    carla_map = _maps.get(world_id)
+
+    if carla_map is None:
+        carla_map = world.get_map()
+        _maps[world_id] = carla_map
+
+    return carla_map
+
+
+def get_waypoint_index(world, distance=2.0):
+    '''
+    Returns the waypoint index of a world's map, building it only the first
+    time it is needed for that map and spacing.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world whose map is indexed.
+    distance : float, optional
+        The spacing, in meters, of the indexed waypoints.
+
+    Returns
+    -------
+    WaypointIndex
+        The spatial index of the map's waypoints.
+    '''
+    key = (getattr(world, 'id', None), distance)
+    index = _indexes.get(key)
+
+    if index is None:
+        index = WaypointIndex(get_map(world), distance)
+        _indexes[key] = index
+
+    return index
+
+
+def invalidate(world=None):
+    '''
+    Drops the cached map and waypoint indexes of a world, or of every world
+    if none is given.
+    '''
+    if world is None:
+        _maps.clear()
+        _indexes.clear()
+    else:
+        world_id = getattr(world, 'id', None)
+        _maps.pop(world_id, None)
+
+        for key in [key for key in _indexes if key[0] == world_id]:
+            del _indexes[key]
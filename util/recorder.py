@@ -0,0 +1,220 @@
+import os
+import threading
+
+
+def segment_filename(filename, segment):
+    '''
+    Returns the file name of a segment of a recording, e.g. Test01_002.log
+    for the third segment of Test01.log.
+    '''
+    root, extension = os.path.splitext(filename)
+
+    return '{}_{:03d}{}'.format(root, segment, extension or '.log')
+
+
+def snapshot_time(snapshot):
+    '''
+    Returns the elapsed simulation time, in seconds, of a world snapshot or
+    of a timestamp.
+    '''
+    timestamp = getattr(snapshot, 'timestamp', snapshot)
+
+    return timestamp.elapsed_seconds
+
+
+class RecorderSession:
+    '''
+    Records a Carla simulation for a number of ticks or of simulated
+    seconds, optionally rotating the recording into fixed-length segments.
+
+    The session follows the simulation through the world's tick events
+    instead of polling the wall clock: with world.on_tick, the callback
+    only counts ticks and wakes up the thread waiting in run, which starts
+    and stops the recorder; otherwise run blocks on world.wait_for_tick.
+    Either way no CPU is spent while waiting.
+
+    In synchronous mode the ticks come from whoever calls world.tick, so
+    run has to be called from another thread than the ticking loop.
+
+    Parameters
+    ----------
+    client : carla.Client
+        The Carla client connected to the server.
+    world : carla.World
+        The Carla world to record.
+    filename : str
+        The name of the recording. With segments, the segment number is
+        added to it, e.g. Test01_000.log.
+    max_ticks : int, optional
+        The number of ticks after which the recording stops.
+    duration : float, optional
+        The simulated time, in seconds, after which the recording stops.
+    segment_ticks : int, optional
+        The number of ticks of every segment file.
+    segment_duration : float, optional
+        The simulated time, in seconds, of every segment file.
+    on_tick : bool, optional
+        Whether to follow the ticks with world.on_tick callbacks rather
+        than blocking on world.wait_for_tick.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+    '''
+    def __init__(
+        self,
+        client,
+        world,
+        filename,
+        max_ticks=None,
+        duration=None,
+        segment_ticks=None,
+        segment_duration=None,
+        on_tick=True,
+        verbose=False
+    ):
+        if max_ticks is None and duration is None:
+            raise ValueError('Either max_ticks or duration must be given')
+
+        self.client = client
+        self.world = world
+        self.filename = filename
+        self.max_ticks = max_ticks
+        self.duration = duration
+        self.segment_ticks = segment_ticks
+        self.segment_duration = segment_duration
+        self.use_on_tick = on_tick
+        self.verbose = verbose
+        self.condition = threading.Condition()
+        self.ticks = 0
+        self.start_time = None
+        self.sim_time = 0.0
+        self.active = False
+        self.segments = []
+
+    def segmented(self):
+        return bool(self.segment_ticks or self.segment_duration)
+
+    def _on_tick(self, snapshot):
+        with self.condition:
+            if not self.active:
+                return
+
+            now = snapshot_time(snapshot)
+
+            if self.start_time is None:
+                self.start_time = now
+
+            self.ticks += 1
+            self.sim_time = now - self.start_time
+            self.condition.notify_all()
+
+    def finished(self):
+        '''
+        Checks if the number of ticks or the duration is reached.
+        '''
+        return (
+            (self.max_ticks is not None and self.ticks >= self.max_ticks) or
+            (self.duration is not None and self.sim_time >= self.duration)
+        )
+
+    def _segment_done(self, segment_start):
+        ticks, sim_time = segment_start
+
+        return (
+            (
+                self.segment_ticks is not None and
+                self.ticks - ticks >= self.segment_ticks
+            ) or
+            (
+                self.segment_duration is not None and
+                self.sim_time - sim_time >= self.segment_duration
+            )
+        )
+
+    def _start_segment(self):
+        if self.segmented():
+            filename = segment_filename(self.filename, len(self.segments))
+        else:
+            filename = self.filename
+
+        path = self.client.start_recorder(filename)
+        self.segments.append(path or filename)
+
+        if self.verbose:
+            print('Recording on file:', self.segments[-1])
+
+        return (self.ticks, self.sim_time)
+
+    def run(self, timeout=10.0):
+        '''
+        Records until the number of ticks or the duration is reached.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum time, in seconds, to wait for a tick before giving
+            up on the recording.
+
+        Returns
+        -------
+        list of str
+            The recorded (segment) files, in order.
+        '''
+        with self.condition:
+            self.active = True
+
+        callback_id = None
+
+        # Registered in the try, so the callback is removed even when the
+        # recorder fails to start
+        try:
+            if self.use_on_tick:
+                callback_id = self.world.on_tick(self._on_tick)
+
+            segment_start = self._start_segment()
+
+            while True:
+                if self.use_on_tick:
+                    with self.condition:
+                        ticks = self.ticks
+                        self.condition.wait_for(
+                            lambda: self.ticks > ticks,
+                            timeout
+                        )
+                        ticked = self.ticks > ticks
+                else:
+                    # Carla raises when no tick arrives within the timeout
+                    try:
+                        snapshot = self.world.wait_for_tick(timeout)
+                    except RuntimeError:
+                        ticked = False
+                    else:
+                        self._on_tick(snapshot)
+                        ticked = True
+
+                if not ticked:
+                    print('No tick received in', timeout, 's, stopping')
+                    break
+
+                if self.finished():
+                    break
+
+                if self.segmented() and self._segment_done(segment_start):
+                    self.client.stop_recorder()
+                    segment_start = self._start_segment()
+        finally:
+            with self.condition:
+                self.active = False
+
+            if callback_id is not None:
+                self.world.remove_on_tick(callback_id)
+
+            if self.segments:
+                self.client.stop_recorder()
+
+        if self.verbose:
+            print(
+                'Recorded', self.ticks, 'ticks,', round(self.sim_time, 3),
+                's in', len(self.segments), 'files'
+            )
+
+        return self.segments
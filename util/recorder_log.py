@@ -0,0 +1,513 @@
+'''
+Offline reader for the binary logs of the Carla recorder.
+
+A log starts with a header (format version, magic string, date and map)
+followed by packets, each a one byte id, a uint32 size and its data.
+Every frame is a FrameStart packet, the packets of the frame and a
+FrameEnd packet. Strings are a uint16 length followed by UTF-8 bytes and
+locations and rotations are three float32 each, in Unreal units
+(centimeters and degrees, rotations as roll, pitch, yaw).
+
+Scanning a log records the file offset of every frame, the spawn, destroy
+and collision events, and skips everything else by its size, so a log is
+read once and indexed without a server. The index is saved next to the
+log and reused while the log is unchanged.
+'''
+import numpy as np
+
+import fnmatch
+import json
+import mmap
+import os
+import struct
+
+
+MAGIC = 'CARLA_RECORDER'
+
+# The packet ids of the recorder format
+FRAME_START = 0
+FRAME_END = 1
+EVENT_ADD = 2
+EVENT_DEL = 3
+EVENT_PARENT = 4
+COLLISION = 5
+POSITION = 6
+STATE = 7
+
+# The actor types of spawn events
+ACTOR_TYPES = ['other', 'vehicle', 'walker', 'traffic_light', 'invalid']
+
+# Meters per Unreal unit
+LOCATION_SCALE = 0.01
+
+INDEX_SUFFIX = '.index.npz'
+INDEX_VERSION = 1
+
+PACKET_HEADER = struct.Struct('<BI')
+FRAME = struct.Struct('<Qdd')
+COUNT = struct.Struct('<H')
+EVENT_ADD_HEAD = struct.Struct('<IB6fI')
+EVENT_DEL_RECORD = struct.Struct('<I')
+COLLISION_RECORD = struct.Struct('<III??')
+STRING_LENGTH = struct.Struct('<H')
+
+POSITION_DTYPE = np.dtype([
+    ('id', '<u4'),
+    ('location', '<f4', 3),
+    ('rotation', '<f4', 3)
+])
+
+SPAWN_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('id', '<u4'),
+    ('type', 'u1'),
+    ('location', '<f4', 3),
+    ('rotation', '<f4', 3)
+])
+
+DESTROY_DTYPE = np.dtype([('frame', '<i8'), ('id', '<u4')])
+
+COLLISION_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('id', '<u4'),
+    ('actor1', '<u4'),
+    ('actor2', '<u4'),
+    ('hero1', '?'),
+    ('hero2', '?')
+])
+
+
+def read_string(buffer, offset):
+    '''
+    Reads a recorder string.
+
+    Returns
+    -------
+    tuple
+        The string and the offset following it.
+    '''
+    length, = STRING_LENGTH.unpack_from(buffer, offset)
+    offset += STRING_LENGTH.size
+    data = bytes(buffer[offset:offset + length])
+
+    return (data.decode('utf-8', 'replace'), offset + length)
+
+
+def read_header(buffer):
+    '''
+    Reads the header of a recorder log.
+
+    Returns
+    -------
+    tuple
+        The header, a dict with the version, magic, date and map of the
+        log, and the offset of the first packet.
+    '''
+    version, = struct.unpack_from('<H', buffer, 0)
+    magic, offset = read_string(buffer, 2)
+
+    if magic != MAGIC:
+        raise ValueError('Not a Carla recorder log, magic: ' + repr(magic))
+
+    date, = struct.unpack_from('<q', buffer, offset)
+    map_name, offset = read_string(buffer, offset + 8)
+
+    return (
+        {'version': version, 'magic': magic, 'date': date, 'map': map_name},
+        offset
+    )
+
+
+def read_spawns(buffer, offset, frame, spawns, type_ids, attributes):
+    '''
+    Reads the events of an EventAdd packet.
+    '''
+    count, = COUNT.unpack_from(buffer, offset)
+    offset += COUNT.size
+
+    for _ in range(count):
+        values = EVENT_ADD_HEAD.unpack_from(buffer, offset)
+        offset += EVENT_ADD_HEAD.size
+        type_id, offset = read_string(buffer, offset)
+        total, = COUNT.unpack_from(buffer, offset)
+        offset += COUNT.size
+        actor_attributes = {}
+
+        for _ in range(total):
+            offset += 1
+            name, offset = read_string(buffer, offset)
+            value, offset = read_string(buffer, offset)
+            actor_attributes[name] = value
+
+        spawns.append(
+            (frame, values[0], values[1], values[2:5], values[5:8])
+        )
+        type_ids.append(type_id)
+        attributes.append(actor_attributes)
+
+
+def read_records(buffer, offset, record):
+    '''
+    Reads the fixed-size records of a counted packet.
+    '''
+    count, = COUNT.unpack_from(buffer, offset)
+    offset += COUNT.size
+
+    return [
+        record.unpack_from(buffer, offset + i*record.size)
+        for i in range(count)
+    ]
+
+
+def scan(filename):
+    '''
+    Scans a recorder log once and indexes its frames and events.
+
+    Returns
+    -------
+    dict
+        The header, the frame ids, elapsed times and file offsets, and the
+        spawn, destroy and collision events of the log.
+    '''
+    frame_ids = []
+    elapsed = []
+    offsets = []
+    spawns = []
+    type_ids = []
+    attributes = []
+    destroys = []
+    collisions = []
+
+    with open(filename, 'rb') as f, mmap.mmap(
+        f.fileno(),
+        0,
+        access=mmap.ACCESS_READ
+    ) as buffer:
+        header, offset = read_header(buffer)
+        size = len(buffer)
+        frame = -1
+
+        while offset + PACKET_HEADER.size <= size:
+            packet, length = PACKET_HEADER.unpack_from(buffer, offset)
+            data = offset + PACKET_HEADER.size
+
+            if data + length > size:
+                # A packet being written by a running recorder
+                break
+
+            if packet == FRAME_START:
+                frame += 1
+                frame_id, duration, time = FRAME.unpack_from(buffer, data)
+                frame_ids.append(frame_id)
+                elapsed.append(time)
+                offsets.append(offset)
+            elif packet == EVENT_ADD:
+                read_spawns(buffer, data, frame, spawns, type_ids, attributes)
+            elif packet == EVENT_DEL:
+                destroys.extend(
+                    (frame,) + record
+                    for record in read_records(buffer, data, EVENT_DEL_RECORD)
+                )
+            elif packet == COLLISION:
+                collisions.extend(
+                    (frame,) + record
+                    for record in read_records(buffer, data, COLLISION_RECORD)
+                )
+
+            offset = data + length
+
+    return {
+        'header': header,
+        'frame_ids': np.array(frame_ids, dtype=np.uint64),
+        'elapsed': np.array(elapsed, dtype=np.float64),
+        'offsets': np.array(offsets, dtype=np.int64),
+        'spawns': np.array(spawns, dtype=SPAWN_DTYPE),
+        'type_ids': np.array(type_ids, dtype=str),
+        'attributes': attributes,
+        'destroys': np.array(destroys, dtype=DESTROY_DTYPE),
+        'collisions': np.array(collisions, dtype=COLLISION_DTYPE)
+    }
+
+
+def index_path(filename):
+    '''
+    Returns the path of the sidecar index of a recorder log.
+    '''
+    return filename + INDEX_SUFFIX
+
+
+def write_index(filename, index):
+    '''
+    Saves the index of a log next to it, stamped with the log's size and
+    modification time.
+    '''
+    status = os.stat(filename)
+    meta = dict(
+        version=INDEX_VERSION,
+        size=status.st_size,
+        mtime_ns=status.st_mtime_ns,
+        header=index['header'],
+        attributes=index['attributes']
+    )
+    path = index_path(filename)
+    arrays = {
+        key: value
+        for key, value in index.items()
+        if isinstance(value, np.ndarray)
+    }
+
+    try:
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+        os.replace(path + '.tmp', path)
+    except OSError as error:
+        print('Unable to write the recorder log index', path, ':', error)
+
+
+def read_index(filename):
+    '''
+    Loads the sidecar index of a log if it matches the log, else None.
+    '''
+    path = index_path(filename)
+
+    if not os.path.exists(path):
+        return None
+
+    status = os.stat(filename)
+
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+
+        if (
+            meta['version'] != INDEX_VERSION or
+            meta['size'] != status.st_size or
+            meta['mtime_ns'] != status.st_mtime_ns
+        ):
+            return None
+
+        index = {key: data[key] for key in data.files if key != 'meta'}
+
+    index['header'] = meta['header']
+    index['attributes'] = meta['attributes']
+
+    return index
+
+
+class RecorderLog:
+    '''
+    The index of a Carla recorder log, with random access to its frames.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the recorder log.
+    cache : bool, optional
+        Whether the sidecar index is used, and written when missing or
+        stale.
+    '''
+    def __init__(self, filename, cache=True):
+        self.filename = filename
+        index = read_index(filename) if cache else None
+
+        if index is None:
+            index = scan(filename)
+
+            if cache:
+                write_index(filename, index)
+
+        self.header = index['header']
+        self.frame_ids = index['frame_ids']
+        self.elapsed = index['elapsed']
+        self.offsets = index['offsets']
+        self.spawns = index['spawns']
+        self.type_ids = index['type_ids']
+        self.attributes = index['attributes']
+        self.destroys = index['destroys']
+        self.collisions = index['collisions']
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def frame_at(self, time):
+        '''
+        Returns the index of the last frame at or before an elapsed time.
+        '''
+        return max(int(np.searchsorted(self.elapsed, time, 'right')) - 1, 0)
+
+    def type_id(self, actor_id):
+        '''
+        Returns the blueprint id of an actor, e.g. 'vehicle.audi.tt'.
+        '''
+        matches = np.flatnonzero(self.spawns['id'] == actor_id)
+
+        return str(self.type_ids[matches[-1]]) if len(matches) else ''
+
+    def actors(self, pattern='*'):
+        '''
+        Returns the ids of the actors whose blueprint id matches a pattern.
+        '''
+        return [
+            int(actor_id)
+            for actor_id, type_id in zip(self.spawns['id'], self.type_ids)
+            if fnmatch.fnmatchcase(str(type_id), pattern)
+        ]
+
+    def iter_positions(self, start=0, stop=None):
+        '''
+        Yields the frame index and the Position records of every frame in
+        a range, seeking directly to the first frame.
+        '''
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        if start >= stop:
+            return
+
+        with open(self.filename, 'rb') as f, mmap.mmap(
+            f.fileno(),
+            0,
+            access=mmap.ACCESS_READ
+        ) as buffer:
+            end = self.offsets[stop] if stop < len(self) else len(buffer)
+            offset = int(self.offsets[start])
+            frame = start - 1
+
+            while offset < end:
+                packet, length = PACKET_HEADER.unpack_from(buffer, offset)
+                data = offset + PACKET_HEADER.size
+
+                if data + length > len(buffer):
+                    break
+
+                if packet == FRAME_START:
+                    frame += 1
+                elif packet == POSITION:
+                    count, = COUNT.unpack_from(buffer, data)
+                    yield (
+                        frame,
+                        np.frombuffer(
+                            buffer,
+                            dtype=POSITION_DTYPE,
+                            count=count,
+                            offset=data + COUNT.size
+                        ).copy()
+                    )
+
+                offset = data + length
+
+    def read_frame(self, frame):
+        '''
+        Reads the positions of all actors in one frame.
+
+        Returns
+        -------
+        numpy.ndarray
+            The Position records (id, location, rotation) of the frame.
+        '''
+        for _, positions in self.iter_positions(frame, frame + 1):
+            return positions
+
+        return np.zeros(0, dtype=POSITION_DTYPE)
+
+    def tracks(self, actor_ids=None, start=0, stop=None):
+        '''
+        Extracts the tracks of actors in a range of frames.
+
+        Parameters
+        ----------
+        actor_ids : list of int, optional
+            The actors to extract, by default all of them.
+        start : int, optional
+            The index of the first frame.
+        stop : int, optional
+            The index after the last frame, by default the end of the log.
+
+        Returns
+        -------
+        dict
+            For every actor, an (n, 7) array of the elapsed time, location,
+            in meters, and rotation (roll, pitch, yaw), in degrees, of the
+            n frames in which it appears.
+        '''
+        frames = []
+        records = []
+
+        for frame, positions in self.iter_positions(start, stop):
+            if actor_ids is not None:
+                positions = positions[np.isin(positions['id'], actor_ids)]
+
+            frames.append(np.full(len(positions), frame))
+            records.append(positions)
+
+        if not records:
+            return {}
+
+        frames = np.concatenate(frames)
+        records = np.concatenate(records)
+
+        # Group the records by actor, keeping them in frame order
+        order = np.argsort(records['id'], kind='stable')
+        ids, starts = np.unique(records['id'][order], return_index=True)
+        tracks = np.empty((len(records), 7))
+        tracks[:, 0] = self.elapsed[frames[order]]
+        tracks[:, 1:4] = records['location'][order]*LOCATION_SCALE
+        tracks[:, 4:7] = records['rotation'][order]
+
+        return {
+            int(actor_id): track
+            for actor_id, track in zip(ids, np.split(tracks, starts[1:]))
+        }
+
+    def find_collisions(self, pattern1='*', pattern2='*'):
+        '''
+        Returns the collisions between actors matching two blueprint id
+        patterns, in either order.
+
+        Returns
+        -------
+        list of tuple
+            The frame index, elapsed time and the two actor ids and blueprint
+            ids of every collision.
+        '''
+        found = []
+
+        for collision in self.collisions:
+            ids = (int(collision['actor1']), int(collision['actor2']))
+            types = (self.type_id(ids[0]), self.type_id(ids[1]))
+
+            if (
+                fnmatch.fnmatchcase(types[0], pattern1) and
+                fnmatch.fnmatchcase(types[1], pattern2)
+            ) or (
+                fnmatch.fnmatchcase(types[1], pattern1) and
+                fnmatch.fnmatchcase(types[0], pattern2)
+            ):
+                frame = int(collision['frame'])
+                found.append(
+                    (frame, float(self.elapsed[frame])) + ids + types
+                )
+
+        return found
+
+
+def find_collisions(filenames, pattern1='*', pattern2='*', cache=True):
+    '''
+    Finds the collisions between actors matching two blueprint id patterns
+    across many recorder logs, using their sidecar indexes.
+
+    Returns
+    -------
+    list of tuple
+        The log file name followed by the collision, as returned by
+        RecorderLog.find_collisions.
+    '''
+    found = []
+
+    for filename in filenames:
+        log = RecorderLog(filename, cache)
+
+        for collision in log.find_collisions(pattern1, pattern2):
+            found.append((filename,) + collision)
+
+    return found
+
@@ -0,0 +1,971 @@
+import numpy as np
+import pandas
+
+import hashlib
+import json
+import os
+import re
+
+
+CAR_COLUMNS = ['x_car', 'y_car', 'v_x_car', 'v_y_car']
+PED_COLUMNS = [
+    'x_ped_0',
+    'y_ped_0',
+    'v_x_ped_0',
+    'v_y_ped_0',
+    'noise_x_0',
+    'noise_y_0'
+]
+
+STATE_FIELDS = ['x', 'y', 'v_x', 'v_y']
+NOISE_FIELDS = ['noise_x', 'noise_y']
+STATE_CHANNELS = len(STATE_FIELDS) + len(NOISE_FIELDS)
+ACTOR_KINDS = ['car', 'ped']
+
+# Matches x_car, v_x_ped_2, noise_x_0, noise_y_car_1, ...
+ACTOR_COLUMN = re.compile(
+    r'^(?P<field>x|y|v_x|v_y|noise_x|noise_y)'
+    r'(?:_(?P<kind>car|ped))?'
+    r'(?:_(?P<index>\d+))?$'
+)
+
+CACHE_SUFFIX = '.cache'
+CACHE_VERSION = 1
+
+
+def clean_columns(columns):
+    '''
+    Normalizes the column names of an AST csv file.
+
+    Parameters
+    ----------
+    columns : pandas.Index
+        The raw column names read from the csv header.
+
+    Returns
+    -------
+    pandas.Index
+        The column names stripped, lowercased, with spaces replaced by
+        underscores and parentheses removed.
+    '''
+    return columns.str.strip().str.lower().str.replace(
+        ' ',
+        '_'
+    ).str.replace(
+        '(',
+        ''
+    ).str.replace(
+        ')',
+        ''
+    )
+
+
+def cache_paths(filename):
+    '''
+    Returns the sidecar paths used to cache a parsed csv file.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the source csv file.
+
+    Returns
+    -------
+    tuple of str
+        The path of the binary table (.npy) and of its metadata (.json).
+    '''
+    base = filename + CACHE_SUFFIX
+    return (base + '.npy', base + '.json')
+
+
+def file_digest(filename, block_size=1 << 20):
+    '''
+    Computes the SHA-1 digest of a file's content.
+    '''
+    digest = hashlib.sha1()
+
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def discover_actors(columns):
+    '''
+    Discovers the actors described by the columns of an AST csv file.
+
+    Every actor is a group of x, y, v_x and v_y columns suffixed with its
+    kind and an optional index, e.g. x_car or v_y_ped_1. A missing index
+    means index 0. The optional noise_x and noise_y columns of an actor
+    may omit the kind, in which case they belong to the pedestrian with
+    that index (e.g. noise_x_0).
+
+    Parameters
+    ----------
+    columns : list of str
+        The cleaned column names.
+
+    Returns
+    -------
+    list of tuple
+        The (kind, index, column names) of every actor with complete state
+        columns, cars first, ordered by index. The column names are ordered
+        like STATE_FIELDS followed by NOISE_FIELDS, when present.
+    '''
+    found = {}
+
+    for name in columns:
+        match = ACTOR_COLUMN.match(name)
+
+        if not match:
+            continue
+
+        field = match.group('field')
+        kind = match.group('kind')
+        index = int(match.group('index') or 0)
+
+        if kind is None:
+            if field not in NOISE_FIELDS:
+                continue
+            kind = 'ped'
+
+        found.setdefault((kind, index), {})[field] = name
+
+    actors = []
+
+    for kind, index in sorted(
+        found,
+        key=lambda key: (ACTOR_KINDS.index(key[0]), key[1])
+    ):
+        fields = found[(kind, index)]
+
+        if not all(field in fields for field in STATE_FIELDS):
+            continue
+
+        names = [fields[field] for field in STATE_FIELDS]
+
+        if all(field in fields for field in NOISE_FIELDS):
+            names += [fields[field] for field in NOISE_FIELDS]
+
+        actors.append((kind, index, names))
+
+    return actors
+
+
+def read_csv_table(filename, index_column, verbose=False):
+    '''
+    Reads an AST csv file into a numeric table.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the csv file.
+    index_column : str
+        The name of the column used as the index of the dataframe.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    tuple
+        The table as a (rows, columns) float64 numpy array and the list of
+        the cleaned column names. Non-numeric columns, such as labels, are
+        left out.
+    '''
+    df = pandas.read_csv(filename, index_col=index_column)
+    df.columns = clean_columns(df.columns)
+    numeric = df.select_dtypes(include=[np.number, np.bool_])
+
+    if verbose and numeric.shape[1] < df.shape[1]:
+        print(
+            'Ignoring non-numeric columns:',
+            [name for name in df.columns if name not in numeric.columns]
+        )
+
+    df = numeric
+
+    if verbose:
+        print('Parsed dataframe information:')
+        print('-----------------------------')
+        print('First 5 rows (head)\n', df.head())
+        print('Dataframe keys:\n', df.keys())
+
+    return (df.to_numpy(dtype=np.float64), list(df.columns))
+
+
+def order_columns(columns, groups):
+    '''
+    Orders the columns so that each group of columns is contiguous.
+
+    Columns belonging to a group are placed first, in group order, followed
+    by the remaining columns in their original order. Contiguous groups can
+    be sliced out of the cached table without copying.
+    '''
+    ordered = [name for group in groups for name in group if name in columns]
+    ordered += [name for name in columns if name not in ordered]
+
+    return ordered
+
+
+def write_cache(filename, index_column, table, columns, groups=()):
+    '''
+    Writes the binary sidecar of a parsed csv file.
+
+    The table is stored as a plain .npy file so later reads can memory-map
+    it. The metadata stores the column order and the size, modification
+    time and content digest of the source file used to validate the cache.
+    The files are written to temporary paths and moved into place, so a
+    concurrent reader never sees a partial cache.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the source csv file.
+    index_column : str
+        The name of the column used as the index of the dataframe.
+    table : numpy.ndarray
+        The (rows, columns) table read from the csv file.
+    columns : list of str
+        The cleaned column names of the table.
+    groups : sequence of list of str, optional
+        Groups of columns that should be stored contiguously.
+
+    Returns
+    -------
+    tuple
+        The reordered table and its column names.
+    '''
+    ordered = order_columns(columns, groups)
+
+    if ordered != columns:
+        table = table[:, [columns.index(name) for name in ordered]]
+
+    table = np.ascontiguousarray(table)
+    table_path, meta_path = cache_paths(filename)
+    stat = os.stat(filename)
+    meta = {
+        'version': CACHE_VERSION,
+        'index_column': index_column,
+        'columns': ordered,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha1': file_digest(filename)
+    }
+
+    try:
+        tmp_table = table_path + '.tmp.%d' % os.getpid()
+        tmp_meta = meta_path + '.tmp.%d' % os.getpid()
+
+        with open(tmp_table, 'wb') as f:
+            np.save(f, table)
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+
+        os.replace(tmp_table, table_path)
+        os.replace(tmp_meta, meta_path)
+    except OSError as error:
+        # A read-only data directory only costs us the cache
+        print('Unable to write trajectory cache:', error)
+
+    return (table, ordered)
+
+
+def read_cache(filename, index_column, verbose=False):
+    '''
+    Memory-maps the binary sidecar of a csv file if it is still valid.
+
+    The cache is valid when the source file has the same size and
+    modification time as when the cache was written. When only the
+    modification time differs, the content digest is compared instead and
+    the metadata is refreshed if the content is unchanged.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the source csv file.
+    index_column : str
+        The name of the column used as the index of the dataframe.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    tuple or None
+        The read-only memory-mapped table and its column names, or None if
+        there is no valid cache.
+    '''
+    table_path, meta_path = cache_paths(filename)
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        stat = os.stat(filename)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        meta.get('version') != CACHE_VERSION or
+        meta.get('index_column') != index_column or
+        meta.get('size') != stat.st_size
+    ):
+        return None
+
+    if meta.get('mtime_ns') != stat.st_mtime_ns:
+        if meta.get('sha1') != file_digest(filename):
+            return None
+
+        meta['mtime_ns'] = stat.st_mtime_ns
+
+        try:
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+        except OSError:
+            pass
+
+    try:
+        table = np.load(table_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if table.ndim != 2 or table.shape[1] != len(meta['columns']):
+        return None
+
+    if verbose:
+        print('Loaded cached table:', table_path)
+        print('Table shape:', table.shape)
+        print('Table keys:\n', meta['columns'])
+
+    return (table, meta['columns'])
+
+
+def load_table(filename, index_column, groups=(), cache=True, verbose=False):
+    '''
+    Loads an AST csv file as a numeric table, using the binary cache.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the csv file.
+    index_column : str
+        The name of the column used as the index of the dataframe.
+    groups : sequence of list of str, optional
+        Groups of columns that should be stored contiguously in the cache.
+    cache : bool, optional
+        Whether the binary sidecar should be read and written.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    tuple
+        The (rows, columns) table and its column names.
+    '''
+    if cache:
+        cached = read_cache(filename, index_column, verbose)
+
+        if cached is not None:
+            return cached
+
+    table, columns = read_csv_table(filename, index_column, verbose)
+
+    if cache:
+        table, columns = write_cache(
+            filename,
+            index_column,
+            table,
+            columns,
+            groups
+        )
+
+    return (table, columns)
+
+
+def select_columns(table, columns, names):
+    '''
+    Selects the named columns out of a table.
+
+    A view is returned when the columns are stored contiguously and in
+    order, which keeps memory-mapped tables zero-copy. Otherwise the
+    columns are gathered into a new array.
+
+    Parameters
+    ----------
+    table : numpy.ndarray
+        The (rows, columns) table.
+    columns : list of str
+        The column names of the table.
+    names : list of str
+        The names of the columns to select.
+
+    Returns
+    -------
+    numpy.ndarray
+        A (rows, len(names)) array.
+    '''
+    missing = [name for name in names if name not in columns]
+
+    if missing:
+        raise KeyError('Columns not found: {}'.format(missing))
+
+    indices = [columns.index(name) for name in names]
+    start = indices[0]
+
+    if indices == list(range(start, start + len(indices))):
+        return table[:, start:start + len(indices)]
+
+    return table[:, indices]
+
+
+def iter_chunks(
+    filename,
+    index_column,
+    groups,
+    chunk_size=10000,
+    cache=True,
+    verbose=False
+):
+    '''
+    Streams an AST csv file as fixed-size chunks of grouped state arrays.
+
+    When a valid binary cache exists the chunks are slices of the
+    memory-mapped table. Otherwise the csv file is parsed chunk by chunk,
+    reading only the columns of the requested groups, so memory stays
+    bounded by the chunk size regardless of the length of the file. No
+    cache is written while streaming.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the csv file.
+    index_column : str
+        The name of the column used as the index of the dataframe.
+    groups : dict of str to list of str
+        The column names of each state array, keyed by the array name.
+    chunk_size : int, optional
+        The maximum number of rows of each chunk.
+    cache : bool, optional
+        Whether an existing binary sidecar should be read.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Yields
+    ------
+    dict of str to numpy.ndarray
+        The (rows, columns) state arrays of the chunk, keyed like groups.
+    '''
+    cached = read_cache(filename, index_column, verbose) if cache else None
+
+    if cached is not None:
+        table, columns = cached
+
+        for start in range(0, len(table), chunk_size):
+            rows = table[start:start + chunk_size]
+            yield {
+                key: select_columns(rows, columns, names)
+                for key, names in groups.items()
+            }
+        return
+
+    header = pandas.read_csv(filename, index_col=index_column, nrows=0)
+    raw = dict(zip(clean_columns(header.columns), header.columns))
+    names = [name for group in groups.values() for name in group]
+    missing = [name for name in names if name not in raw]
+
+    if missing:
+        raise KeyError('Columns not found: {}'.format(missing))
+
+    if verbose:
+        print('Streaming', filename, 'in chunks of', chunk_size, 'rows')
+        print('Dataframe keys:\n', list(raw))
+
+    reader = pandas.read_csv(
+        filename,
+        index_col=index_column,
+        usecols=[index_column] + [raw[name] for name in names],
+        chunksize=chunk_size
+    )
+
+    with reader:
+        for df in reader:
+            df.columns = clean_columns(df.columns)
+            yield {
+                key: df[group].to_numpy(dtype=np.float64)
+                for key, group in groups.items()
+            }
+
+
+def stack_states(arrays, channels=STATE_CHANNELS, out=None):
+    '''
+    Stacks the state arrays of several actors into a single array.
+
+    Actors with fewer columns than channels, such as cars without sensor
+    noise columns, are padded with zeros.
+
+    Parameters
+    ----------
+    arrays : sequence of numpy.ndarray
+        The (steps, columns) state array of each actor, all with the same
+        number of steps.
+    channels : int, optional
+        The number of channels of the stacked array.
+    out : numpy.ndarray, optional
+        A preallocated (actors, steps, channels) array to write into.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (actors, steps, channels) state array.
+    '''
+    steps = len(arrays[0]) if arrays else 0
+
+    if out is None:
+        out = np.empty((len(arrays), steps, channels))
+
+    for actor, values in enumerate(arrays):
+        columns = values.shape[1]
+        out[actor, :, :columns] = values[:steps]
+        out[actor, :, columns:] = 0.0
+
+    return out
+
+
+def actor_samples(
+    table,
+    columns,
+    names,
+    time_column=None,
+    orig_step=0.1,
+    actor=None
+):
+    '''
+    Selects the samples of one actor and their times.
+
+    Rows where the time or any state column of the actor is missing (NaN)
+    are dropped, so an actor logged at a lower rate than the others, or
+    with dropped steps, only keeps its own samples. The samples are sorted
+    by time and, of several samples at the same time, the last one is kept.
+
+    Parameters
+    ----------
+    table : numpy.ndarray
+        The (rows, columns) table.
+    columns : list of str
+        The column names of the table.
+    names : list of str
+        The state columns of the actor.
+    time_column : str, optional
+        The column holding the time, in seconds, of every row. Without it,
+        the rows are orig_step seconds apart.
+    orig_step : float, optional
+        The timestep, in seconds, of the rows when there is no time column.
+    actor : str, optional
+        The name of the actor in error messages, by default its columns.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The increasing times and the (samples, len(names)) states.
+
+    Raises
+    ------
+    ValueError
+        If the actor has fewer than two valid samples to interpolate.
+    '''
+    states = select_columns(table, columns, names)
+
+    if time_column is None:
+        times = np.arange(len(states))*orig_step
+    else:
+        times = select_columns(table, columns, [time_column])[:, 0]
+
+    valid = ~(np.isnan(times) | np.isnan(states).any(axis=1))
+
+    if not (valid.all() and np.all(np.diff(times) > 0.0)):
+        times = times[valid]
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        keep = np.diff(times, append=np.inf) > 0.0
+        times = times[keep]
+        states = states[valid][order[keep]]
+
+    if len(times) < 2:
+        raise ValueError(
+            'Actor {} has {} valid samples, at least two are needed to '
+            'interpolate'.format(actor or ', '.join(names), len(times))
+        )
+
+    return (times, states)
+
+
+def align_clocks(clocks, arrays, channels=STATE_CHANNELS):
+    '''
+    Aligns actors sampled on different clocks onto a common clock.
+
+    The common clock is the union of the sample times of every actor, so
+    linearly interpolating the aligned states gives the same result as
+    interpolating every actor on its own clock. Each actor is evaluated at
+    the common times with a single searchsorted; before its first sample
+    and after its last one it holds its first or last state.
+
+    Parameters
+    ----------
+    clocks : sequence of numpy.ndarray
+        The increasing sample times of each actor, e.g. from actor_samples.
+    arrays : sequence of numpy.ndarray
+        The (samples, columns) state array of each actor.
+    channels : int, optional
+        The number of channels of the aligned array, see stack_states.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The common clock and the (actors, len(clock), channels) states.
+    '''
+    clock = np.unique(np.concatenate(clocks))
+    out = np.empty((len(arrays), len(clock), channels))
+
+    for actor, (times, values) in enumerate(zip(clocks, arrays)):
+        index, weight = resample_weights(
+            times,
+            np.clip(clock, times[0], times[-1])
+        )
+        columns = values.shape[1]
+        out[actor, :, :columns] = resample(values, index, weight)
+        out[actor, :, columns:] = 0.0
+
+    return (clock, out)
+
+
+def step_count(span, step):
+    '''
+    Returns the number of samples, at multiples of step from zero, strictly
+    before span.
+
+    The ratio of span and step is rounded to the nearest integer when within
+    a relative 1e-9 of it, so a sample that should land on span, but is
+    rounded just before it, is excluded too. Every resampling path derives
+    its number of samples from this count, so they all agree.
+    '''
+    ratio = span/step
+    count = int(np.ceil(ratio - 1e-9*max(abs(ratio), 1.0)))
+
+    return max(count, 0)
+
+
+def resample_times(length, orig_step=0.1, new_step=1.0/60.0, times=None):
+    '''
+    Returns the input and output sample times of a trajectory.
+
+    The output times are multiples of new_step up to, but excluding, the
+    time of the last input sample, see step_count. The input samples are
+    orig_step seconds apart, unless their possibly irregular times are
+    given, in which case the output times start at the first of them.
+    '''
+    if times is not None:
+        count = step_count(times[-1] - times[0], new_step)
+
+        return (times, times[0] + np.arange(count)*new_step)
+
+    t = np.arange(length)*orig_step
+    new_t = np.arange(step_count((length - 1)*orig_step, new_step))*new_step
+
+    return (t, new_t)
+
+
+def resample_weights(t, new_t):
+    '''
+    Computes the linear interpolation indices and weights of new sample
+    times, to be shared by every actor and channel.
+
+    Parameters
+    ----------
+    t : numpy.ndarray
+        The increasing times of the input samples.
+    new_t : numpy.ndarray
+        The times at which to evaluate the trajectory.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        For every new time, the index of the input sample before it and the
+        weight of the input sample after it.
+    '''
+    if len(t) < 2:
+        raise ValueError('At least two samples are needed to interpolate')
+
+    index = np.searchsorted(t, new_t, side='right') - 1
+    np.clip(index, 0, len(t) - 2, out=index)
+
+    lower = t[index]
+    weight = (new_t - lower)/(t[index + 1] - lower)
+
+    return (index, weight)
+
+
+def resample(states, index, weight, out=None, scratch=None):
+    '''
+    Linearly resamples a stack of actor states in a single pass.
+
+    The same indices and weights are applied to every actor and channel and
+    the result is written into preallocated buffers, so no per-actor or
+    per-column interpolators are built.
+
+    Parameters
+    ----------
+    states : numpy.ndarray
+        The (actors, steps, channels) state array.
+    index : numpy.ndarray
+        The input sample index before each output sample, from
+        resample_weights.
+    weight : numpy.ndarray
+        The weight of the following input sample, from resample_weights.
+    out : numpy.ndarray, optional
+        A preallocated (actors, len(index), channels) output array.
+    scratch : numpy.ndarray, optional
+        A preallocated work array of the same shape as out.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (actors, len(index), channels) resampled state array.
+    '''
+    shape = states.shape[:-2] + (len(index), states.shape[-1])
+
+    if out is None:
+        out = np.empty(shape)
+    if scratch is None:
+        scratch = np.empty(shape)
+
+    np.take(states, index + 1, axis=-2, out=scratch)
+    np.take(states, index, axis=-2, out=out)
+    scratch -= out
+    scratch *= weight[:, np.newaxis]
+    out += scratch
+
+    return out
+
+
+def resample_chunks(chunks, orig_step=0.1, new_step=1.0/60.0):
+    '''
+    Linearly resamples a stream of state chunks to a new timestep.
+
+    The last sample of each chunk is carried over to the next one, so the
+    output is the same as resampling the whole trajectory at once: samples
+    at multiples of new_step up to, but excluding, the time of the last
+    input sample, see step_count. Only one chunk and its output are held
+    in memory.
+
+    Parameters
+    ----------
+    chunks : iterable of dict of str to numpy.ndarray
+        The (rows, columns) state arrays of each chunk, sampled every
+        orig_step seconds.
+    orig_step : float, optional
+        The timestep, in seconds, of the input samples.
+    new_step : float, optional
+        The timestep, in seconds, of the output samples.
+
+    Yields
+    ------
+    dict of str to numpy.ndarray
+        The resampled (rows, 6) state arrays, with zero sensor noise
+        columns added to arrays that have none.
+    '''
+    previous = None
+    first_sample = 0
+    next_step = 0
+
+    for chunk in chunks:
+        if previous is not None:
+            chunk = {
+                key: np.concatenate((previous[key], values))
+                for key, values in chunk.items()
+            }
+
+        length = min(len(values) for values in chunk.values())
+
+        if length == 0:
+            continue
+
+        last_sample = first_sample + length - 1
+        t = (first_sample + np.arange(length))*orig_step
+        new_t = np.arange(
+            next_step,
+            step_count(last_sample*orig_step, new_step)
+        )*new_step
+
+        if len(new_t) > 0:
+            keys = list(chunk)
+            states = stack_states([chunk[key][:length] for key in keys])
+            index, weight = resample_weights(t, new_t)
+            output = resample(states, index, weight)
+
+            yield {key: output[actor] for actor, key in enumerate(keys)}
+
+        previous = {
+            key: values[length - 1:length]
+            for key, values in chunk.items()
+        }
+        first_sample += length - 1
+        next_step += len(new_t)
+
+
+class Trajectory:
+    '''
+    Evaluates a stack of actor states at any time, on demand.
+
+    Only the original samples and their times are held, so the memory does
+    not depend on the replay timestep and changing it needs no
+    recomputation. Every evaluation looks up the samples around the
+    requested times with a binary search, in O(log n), so the trajectory
+    can be sought, scrubbed forwards and backwards and replayed at any
+    rate. Times outside of the samples hold the first or last state.
+
+    Parameters
+    ----------
+    states : numpy.ndarray
+        The (actors, steps, channels) state array, e.g. from stack_states.
+    orig_step : float, optional
+        The timestep, in seconds, of the samples, used when times is not
+        given.
+    times : numpy.ndarray, optional
+        The increasing time, in seconds, of every sample.
+    '''
+    def __init__(self, states, orig_step=0.1, times=None):
+        if times is None:
+            times = np.arange(states.shape[-2])*orig_step
+
+        times = np.asarray(times, dtype=np.float64)
+
+        if len(times) != states.shape[-2]:
+            raise ValueError(
+                'Got {} times for {} samples'.format(
+                    len(times),
+                    states.shape[-2]
+                )
+            )
+        if len(times) < 2:
+            raise ValueError('At least two samples are needed to interpolate')
+
+        self.states = states
+        self.times = times
+        self.time = times[0]
+
+    def start_time(self):
+        return self.times[0]
+
+    def stop_time(self):
+        return self.times[-1]
+
+    def evaluate(self, times, out=None, scratch=None):
+        '''
+        Returns the (actors, len(times), channels) states at some times.
+
+        See resample for the optional preallocated out and scratch arrays.
+        '''
+        times = np.clip(times, self.times[0], self.times[-1])
+        index, weight = resample_weights(self.times, times)
+
+        return resample(self.states, index, weight, out, scratch)
+
+    def at(self, time):
+        '''
+        Returns the (actors, channels) states at a single time.
+        '''
+        return self.evaluate(np.array([time]))[..., 0, :]
+
+    def seek(self, time):
+        '''
+        Moves the current time of the trajectory, within its samples, and
+        returns the (actors, channels) states there.
+        '''
+        self.time = min(max(time, self.times[0]), self.times[-1])
+
+        return self.at(self.time)
+
+    def advance(self, delta):
+        '''
+        Moves the current time by delta seconds, backwards if negative, and
+        returns the (actors, channels) states there.
+        '''
+        return self.seek(self.time + delta)
+
+    def sample_times(self, new_step, start=None, stop=None, rate=1.0):
+        '''
+        Returns the times of a replay with a new timestep.
+
+        Parameters
+        ----------
+        new_step : float
+            The timestep, in seconds, of the replay.
+        start : float, optional
+            The time at which the replay starts; the first sample time, or
+            the last one when replaying backwards.
+        stop : float, optional
+            The time, excluded, at which the replay stops; the last sample
+            time, or the first one when replaying backwards.
+        rate : float, optional
+            The trajectory time elapsed per replay second, negative to
+            replay backwards.
+
+        Returns
+        -------
+        numpy.ndarray
+            The trajectory time of every replay step. With the defaults,
+            the same times as resample_times, as both count the steps
+            with step_count.
+
+        Raises
+        ------
+        ValueError
+            If new_step or rate is zero.
+        '''
+        start, step, count = self._replay_steps(new_step, start, stop, rate)
+
+        return start + np.arange(count)*step
+
+    def _replay_steps(self, new_step, start, stop, rate):
+        if new_step == 0.0 or rate == 0.0:
+            raise ValueError(
+                'The replay timestep and rate must not be zero, got {} and '
+                '{}'.format(new_step, rate)
+            )
+
+        step = new_step*rate
+        first, last = (self.times[0], self.times[-1])
+
+        if step < 0.0:
+            first, last = (last, first)
+        if start is None:
+            start = first
+        if stop is None:
+            stop = last
+
+        return (start, step, step_count(stop - start, step))
+
+    def chunks(
+        self,
+        new_step,
+        start=None,
+        stop=None,
+        rate=1.0,
+        chunk_steps=1000
+    ):
+        '''
+        Lazily evaluates a replay with a new timestep, see sample_times, as
+        (actors, chunk_steps, channels) state arrays, so only one chunk of
+        the replay is held in memory at a time.
+
+        The timestep and rate are checked when called, before the first
+        chunk is requested.
+        '''
+        start, step, count = self._replay_steps(new_step, start, stop, rate)
+
+        return self._evaluate_chunks(start, step, count, chunk_steps)
+
+    def _evaluate_chunks(self, start, step, count, chunk_steps):
+        for first in range(0, count, chunk_steps):
+            steps = np.arange(first, min(first + chunk_steps, count))
+
+            yield self.evaluate(start + steps*step)
@@ -1,6 +1,11 @@
 import util.actor
+import util.client
+import util.map
 
 import carla
+import numpy as np
+
+import random
 
 
 def draw_spawn_points(world, timeout=-1.0):
@@ -16,8 +21,7 @@ def draw_spawn_points(world, timeout=-1.0):
         environment. (Default is -1.0, which leaves the label in the 
         environment indefinitely.)
     '''
-    map = world.get_map()
-    spawn_points = map.get_spawn_points()
+    spawn_points = util.map.get_map(world).get_spawn_points()
 
     for num, spawn_point in enumerate(spawn_points):
         world.debug.draw_string(
@@ -43,51 +47,164 @@ def move_spectator(
     spectator.set_transform(transform)
 
 
+def get_snapshot(world):
+    '''
+    Returns the latest snapshot of a Carla world, which holds the transform
+    of every actor at the same frame.
+
+    Raises
+    ------
+    RuntimeError
+        If the world has no get_snapshot, as before Carla 0.9.6. Waiting
+        for the next tick instead would block forever in synchronous mode
+        and does not return a snapshot on older versions.
+    '''
+    if not hasattr(world, 'get_snapshot'):
+        raise RuntimeError(
+            'The world has no get_snapshot to read the actor locations '
+            'from, Carla 0.9.6 or later is needed'
+        )
+
+    return world.get_snapshot()
+
+
+def actor_locations(world, actors, snapshot=None):
+    '''
+    Reads the locations of several actors from a single world snapshot.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world of the actors.
+    actors : list of carla.Actor
+        The actors whose locations are needed.
+    snapshot : carla.WorldSnapshot, optional
+        The snapshot to read, by default the latest one of the world.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (n, 3) x, y, z locations of the actors, in order. Actors that
+        are not in the snapshot, e.g. spawned after it was taken, are
+        located with their own get_location call.
+    '''
+    if snapshot is None:
+        snapshot = get_snapshot(world)
+
+    locations = np.empty((len(actors), 3))
+
+    for row, actor in enumerate(actors):
+        entry = snapshot.find(actor.id)
+
+        if entry is None:
+            location = actor.get_location()
+        else:
+            location = entry.get_transform().location
+
+        locations[row] = (location.x, location.y, location.z)
+
+    return locations
+
+
+def in_range_mask(locations, centers, max_distances):
+    '''
+    Checks which locations are within range of at least one center.
+
+    Parameters
+    ----------
+    locations : numpy.ndarray
+        The (n, 3) locations to check.
+    centers : numpy.ndarray
+        The (m, 3) centers of the areas.
+    max_distances : numpy.ndarray
+        The (m,) radius of every area.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (n,) boolean mask of the locations in range.
+    '''
+    locations = np.asarray(locations, dtype=np.float64).reshape(-1, 1, 3)
+    centers = np.asarray(centers, dtype=np.float64).reshape(1, -1, 3)
+    max_distances = np.broadcast_to(
+        np.asarray(max_distances, dtype=np.float64),
+        (centers.shape[1],)
+    )
+
+    squared = np.square(locations - centers).sum(axis=2)
+
+    return (squared <= np.square(max_distances)).any(axis=1)
+
+
 def remove_distant_actors(
     world,
     location=carla.Location(0, 0, 0),
     max_distance=100.0,
     actor_filter='vehicle.*',
-    verbose=False
+    verbose=False,
+    client=None
 ):
     '''
     Removes actors from the Carla world when outside a given area.
 
+    The actor locations are read from a single world snapshot and their
+    distances to every center are computed at once. With a client, the
+    actors out of range are destroyed in a single batch.
+
     Parameters:
     world : carla.World
         The Carla world in which to remove actors.
-    location : carla.Location, optional
-        The location used for determining the center of the area.
-    max_distance : float, optional
-        The maximum distance an actor can be from the location center.
+    location : carla.Location or list of carla.Location, optional
+        The location used for determining the center of the area, or the
+        centers of several areas.
+    max_distance : float or list of float, optional
+        The maximum distance an actor can be from the location center, or
+        from the center of each area. An actor is kept when it is in range
+        of any of the areas.
     actor_filter : str, optional
         A string containing the filter to apply to the world's actor list.
         Only actors with this filter will be removed.
     verbose : bool, optional
         Used to determine whether some information should be displayed.
+    client : carla.Client, optional
+        The Carla client used to destroy the actors in a single batch. When
+        not given, the actors are destroyed one by one.
+
+    Returns
+    -------
+    list of int
+        The ids of the removed actors.
     '''
-    to_remove = [
-        actor
-        for actor in world.get_actors().filter(actor_filter)
-        if not util.actor.in_range(
-            actor,
-            location,
-            max_distance,
+    if not isinstance(location, (list, tuple)):
+        location = [location]
+
+    actors = list(world.get_actors().filter(actor_filter))
+    centers = [(center.x, center.y, center.z) for center in location]
+
+    if not actors:
+        return []
+
+    locations = actor_locations(world, actors)
+    keep = in_range_mask(locations, centers, max_distance)
+    to_remove = [actor for actor, kept in zip(actors, keep) if not kept]
+
+    if client is not None:
+        util.client.apply_batch(
+            client,
+            [carla.command.DestroyActor(actor.id) for actor in to_remove],
             verbose
         )
-    ]
-
-    for actor in to_remove:
-        actor.destroy()
+    else:
+        for actor in to_remove:
+            actor.destroy()
 
-        if verbose:
+    if verbose:
+        for actor in to_remove:
             print("Actor", actor.id, "removed from scenario.")
 
-    if verbose:
-        print(
-            'Total actors remaining:',
-            len(world.get_actors().filter('vehicle.*'))
-        )
+        print('Total actors remaining:', len(actors) - len(to_remove))
+
+    return [actor.id for actor in to_remove]
 
 
 def spawn_actor(world, blueprints, transform, verbose=False):
@@ -124,3 +241,125 @@ def spawn_actor(world, blueprints, transform, verbose=False):
             actor.set_autopilot(True)
 
     return actor
+
+
+def spawn_actors(
+    world,
+    client,
+    blueprints,
+    spawn_points=None,
+    count=None,
+    autopilot=True,
+    refill=False,
+    verbose=False
+):
+    '''
+    Spawns many actors in the Carla world with one command batch.
+
+    Every actor is spawned with a SpawnActor command, followed for vehicles
+    by a SetAutopilot command on the same (future) actor, and all commands
+    are applied in a single round trip. Spawns that fail, usually because
+    of a collision at the spawn point, can be retried at spawn points of
+    the map that were not used yet.
+
+    Parameters
+    ----------
+    world : carla.World
+        The Carla world in which to spawn actors.
+    client : carla.Client
+        The Carla client used to apply the command batches.
+    blueprints : carla.BlueprintLibrary
+        A set of Carla blueprint templates, one of which is picked at random
+        for every actor.
+    spawn_points : list of carla.Transform, optional
+        The transforms used to spawn the actors. By default the spawn points
+        of the world's map, shuffled.
+    count : int, optional
+        The number of actors to spawn, by default one per spawn point.
+    autopilot : bool, optional
+        Whether the autopilot of the spawned vehicles should be enabled.
+    refill : bool, optional
+        Whether unused spawn points of the map should be used for the
+        actors beyond the given spawn points and for the retries of failed
+        spawns, until the count is reached or the points run out.
+    verbose : bool, optional
+        Used to determine whether some information should be displayed.
+
+    Returns
+    -------
+    tuple
+        The list of spawned actor ids and the list of (transform, error)
+        of every failed spawn. Every actor of the count left without a
+        spawn point to spawn or retry at is a failure with a None
+        transform, so fewer actors than the count are never spawned
+        silently.
+    '''
+    map_points = util.map.get_map(world).get_spawn_points()
+
+    if spawn_points is None:
+        spawn_points = random.sample(map_points, len(map_points))
+    else:
+        spawn_points = list(spawn_points)
+
+    if count is None:
+        count = len(spawn_points)
+
+    def key(transform):
+        location = transform.location
+        return (round(location.x, 2), round(location.y, 2))
+
+    used = set(key(transform) for transform in spawn_points)
+    spare = [point for point in map_points if key(point) not in used]
+    random.shuffle(spare)
+
+    if refill:
+        spawn_points += spare
+
+    pending = spawn_points[:count]
+    spare = spawn_points[count:]
+    actor_ids = []
+    failures = []
+
+    def no_spawn_point(actors):
+        failures.extend([(None, 'No spawn point left')]*actors)
+
+    no_spawn_point(count - len(pending))
+
+    while pending:
+        commands = []
+
+        for transform in pending:
+            blueprint = util.actor.create_random_blueprint(blueprints)
+            command = carla.command.SpawnActor(blueprint, transform)
+
+            if autopilot and blueprint.id.startswith('vehicle'):
+                command = command.then(
+                    carla.command.SetAutopilot(carla.command.FutureActor, True)
+                )
+
+            commands.append(command)
+
+        responses = util.client.apply_batch(client, commands)
+        failed = 0
+
+        for transform, response in zip(pending, responses):
+            if response.has_error():
+                failures.append((transform, response.error))
+                failed += 1
+            else:
+                actor_ids.append(response.actor_id)
+
+        if verbose:
+            print(
+                'Spawned', len(pending) - failed, 'of', len(pending),
+                'actors in one batch'
+            )
+
+        if not refill:
+            break
+
+        pending = spare[:failed]
+        spare = spare[failed:]
+        no_spawn_point(failed - len(pending))
+
+    return (actor_ids, failures)
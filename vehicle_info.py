@@ -10,13 +10,12 @@ Modified By:
 Copyright (c) 2019 Stanford Intelligent Systems Lab - Stanford University
 License: MIT License
 '''
-import util.actor
+import util.catalog
 import util.client
 
 import carla
 
 import math
-import random
 
 
 def get_transform(vehicle_location, angle, d=6.4):
@@ -34,23 +33,22 @@ def get_transform(vehicle_location, angle, d=6.4):
 
 def main():
     client = util.client.create(map_name="Town02")
-    world = client.get_world()
-    spectator = world.get_spectator()
-    vehicle_blueprints = world.get_blueprint_library().filter('vehicle')
-
-    location = random.choice(world.get_map().get_spawn_points()).location
+    catalog = util.catalog.build_catalog(
+        client,
+        util.catalog.CATALOG_FILE,
+        verbose=True
+    )
 
-    f = open('vehicleInfo.txt', 'w')
-    f.write(
-        '{:35}{:^13}{:^13}{:^13}\n'.format(
+    print(
+        '{:35}{:^13}{:^13}{:^13}'.format(
             'Filter String',
             'Length[m]',
             'Width[m]',
             'Height[m]'
         )
     )
-    f.write(
-        '{:35}{:^13}{:^13}{:^13}\n'.format(
+    print(
+        '{:35}{:^13}{:^13}{:^13}'.format(
             '----------------',
             '---------',
             '--------',
@@ -58,36 +56,15 @@ def main():
         )
     )
 
-    for blueprint in vehicle_blueprints:
-        transform = carla.Transform(location, carla.Rotation(yaw=-45.0))
-        vehicle = world.spawn_actor(blueprint, transform)
-
-        try:
-
-            util.actor.print_info(vehicle)
-
-            f.write(
-                '{:35}{:^13.6f}{:^13.6f}{:^13.6f}\n'.format(
-                    vehicle.type_id,
-                    vehicle.bounding_box.extent.x,
-                    vehicle.bounding_box.extent.y,
-                    vehicle.bounding_box.extent.z
-                )
+    for type_id, vehicle in sorted(catalog['vehicles'].items()):
+        print(
+            '{:35}{:^13.6f}{:^13.6f}{:^13.6f}'.format(
+                type_id,
+                vehicle['length'],
+                vehicle['width'],
+                vehicle['height']
             )
-
-            # angle = 0
-            # while angle < 356:
-            #     timestamp = world.wait_for_tick()
-            #     angle += timestamp.delta_seconds * 60.0
-            #     spectator.set_transform(
-            #         get_transform(vehicle.get_location(), angle - 90)
-            #     )
-
-        finally:
-
-            vehicle.destroy()
-
-    f.close()
+        )
 
 
 if __name__ == '__main__':